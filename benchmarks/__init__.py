@@ -0,0 +1,4 @@
+"""
+Benchmarks of the Trend Strength pipeline using synthetic market data
+
+"""
@@ -0,0 +1,208 @@
+"""
+Time importing TrendStrength, and the modules each data source and chart
+type loads on first use, in fresh interpreters, writing the results as JSON
+which can be compared between runs.
+
+Run from the repository root, eg:
+
+    python -m benchmarks.bench_import --repeat 5 --output new.json \
+        --compare old.json
+
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from benchmarks.bench_pipeline import environment
+
+# Code run in each interpreter, by scenario. 'eager' imports everything the
+# trend module loaded at import time before the imports were deferred, for
+# comparison with 'trend'
+SCENARIOS = {
+    'trend': "from trendvisualizer.trend import TrendStrength",
+    'chart_api': (
+        "from trendvisualizer.trend import TrendStrength\n"
+        "from trendvisualizer.chart_api import ChartData"),
+    'norgate': (
+        "from trendvisualizer.trend import TrendStrength\n"
+        "from trendvisdata.market_data import NorgateExtract"),
+    'fields': (
+        "from trendvisualizer.trend import TrendStrength\n"
+        "from trendvisdata.trend_data import Fields"),
+    'charts': (
+        "from trendvisualizer.trend import TrendStrength\n"
+        "from trendvisualizer.chart_display import Graphs\n"
+        "from trendvisualizer.pie_charts import PieCharts"),
+    'eager': (
+        "from trendvisdata.chart_data import Data\n"
+        "from trendvisdata.trend_data import Fields, TrendRank\n"
+        "from trendvisdata.market_data import NorgateExtract, YahooExtract\n"
+        "from trendvisualizer.trend import TrendStrength\n"
+        "from trendvisualizer.chart_display import Graphs\n"
+        "from trendvisualizer.pie_charts import PieCharts"),
+    }
+
+# Modules reported as loaded or not after each scenario
+HEAVY_MODULES = [
+    'norgatedata', 'yfinance', 'technicalmethods', 'scipy', 'matplotlib',
+    'seaborn']
+
+# Times the scenario's imports and reports which heavy modules they loaded
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec({code!r})
+wall = time.perf_counter() - start
+print(json.dumps({{
+    'wall': wall,
+    'loaded': [name for name in {modules!r} if name in sys.modules]}}))
+"""
+
+
+class ImportBenchmark():
+    """
+    Run each import scenario in a new interpreter so that no module is
+    already loaded, recording the fastest wall time and the heavy modules
+    it loaded
+
+    """
+    @classmethod
+    def run(
+        cls,
+        scenarios: list | None = None,
+        repeat: int = 3) -> dict:
+        """
+        Benchmark the import scenarios.
+
+        Parameters
+        ----------
+        scenarios : List, optional
+            Names of the scenarios to time. The default is None which times
+            every scenario.
+        repeat : Int, optional
+            Number of interpreters started for each scenario, the fastest of
+            which is reported. The default is 3.
+
+        Returns
+        -------
+        results : Dict
+            Timings and loaded modules for each scenario.
+
+        """
+        if scenarios is None:
+            scenarios = list(SCENARIOS)
+
+        results = {}
+        for name in scenarios:
+            runs = [cls._run_once(SCENARIOS[name]) for _ in range(repeat)]
+            results[name] = min(runs, key=lambda entry: entry['wall'])
+
+        return results
+
+
+    @staticmethod
+    def _run_once(code: str) -> dict:
+
+        # Import from the source tree being benchmarked
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        probe = PROBE.format(code=code, modules=HEAVY_MODULES)
+        output = subprocess.run(
+            [sys.executable, '-c', probe], cwd=root, check=True,
+            capture_output=True, text=True).stdout
+
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(
+    new: dict,
+    old: dict,
+    threshold: float = 1.1) -> list:
+    """
+    Compare the import times of two benchmark runs, printing the ratio for
+    each scenario present in both.
+
+    Parameters
+    ----------
+    new : Dict
+        The latest results.
+    old : Dict
+        The results to compare against.
+    threshold : Float, optional
+        Ratio of new to old wall time above which a timing is reported as a
+        regression. The default is 1.1.
+
+    Returns
+    -------
+    regressions : List
+        List of (scenario, ratio) tuples.
+
+    """
+    regressions = []
+    print(f"{'scenario':<12} {'old':>9} {'new':>9} {'ratio':>7}")
+    for name, entry in new['results'].items():
+        old_entry = old['results'].get(name)
+        if old_entry is None or old_entry['wall'] == 0:
+            continue
+        ratio = entry['wall'] / old_entry['wall']
+        flag = ''
+        if ratio > threshold:
+            flag = ' slower'
+            regressions.append((name, ratio))
+        print(f"{name:<12} {old_entry['wall']:>9.3f} {entry['wall']:>9.3f} "
+              f"{ratio:>7.2f}{flag}")
+
+    return regressions
+
+
+def main(argv: list | None = None) -> int:
+    """
+    Run the benchmarks from the command line.
+
+    Parameters
+    ----------
+    argv : List, optional
+        Command line arguments. The default is None which uses sys.argv.
+
+    Returns
+    -------
+    Int
+        Exit status, 1 if a comparison found a regression.
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS),
+                        choices=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--compare', help='JSON file of earlier results')
+    parser.add_argument('--threshold', type=float, default=1.1)
+    args = parser.parse_args(argv)
+
+    results = {
+        'environment': environment(),
+        'results': ImportBenchmark.run(
+            scenarios=args.scenarios, repeat=args.repeat),
+        }
+    for name, entry in results['results'].items():
+        print(f"{name}: {entry['wall']:.3f}s, loads "
+              f"{', '.join(entry['loaded']) or 'no heavy modules'}",
+              file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=1)
+    else:
+        print(json.dumps(results, indent=1))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as compare_file:
+            old = json.load(compare_file)
+        if compare(results, old, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
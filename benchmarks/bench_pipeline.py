@@ -0,0 +1,301 @@
+"""
+Time each stage of the TrendStrength pipeline and each chart type on
+synthetic universes, writing the results as JSON which can be compared
+between runs.
+
+Run from the repository root, eg:
+
+    python -m benchmarks.bench_pipeline --tickers 50 500 --days 250 2500 \
+        --output new.json --compare old.json
+
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt # pylint: disable=wrong-import-position
+import trendvisualizer # pylint: disable=wrong-import-position
+from benchmarks.synthetic import ( # pylint: disable=wrong-import-position
+    SyntheticMarket, SyntheticTrendStrength)
+
+# The universe sizes run by default
+DEFAULT_TICKERS = [50, 500, 5000]
+DEFAULT_DAYS = [250, 2500]
+
+CHART_TYPES = [
+    'bar', 'returns', 'market', 'summary', 'pie_summary', 'pie_breakdown']
+
+PACKAGES = [
+    'trendvisualizer', 'trendvisdata', 'technicalmethods', 'pandas',
+    'numpy', 'matplotlib', 'seaborn']
+
+
+class PipelineBenchmark():
+    """
+    Run the TrendStrength pipeline stage by stage on a synthetic universe,
+    recording wall time, CPU time and, optionally, peak traced memory for
+    each stage and chart
+
+    """
+    @classmethod
+    def run(
+        cls,
+        num_tickers: int,
+        num_days: int,
+        seed: int = 0,
+        repeat: int = 1,
+        memory: bool = False,
+        charts: list | None = None,
+        **kwargs) -> dict:
+        """
+        Benchmark one universe size.
+
+        Parameters
+        ----------
+        num_tickers : Int
+            Number of tickers in the universe.
+        num_days : Int
+            Number of business days of price history.
+        seed : Int, optional
+            Seed of the synthetic prices. The default is 0.
+        repeat : Int, optional
+            Number of runs, the fastest of which is reported. The default
+            is 1.
+        memory : Bool, optional
+            Whether to trace peak memory, which slows the pipeline. The
+            default is False.
+        charts : List, optional
+            Chart types to time. The default is None which times every
+            chart type.
+        **kwargs : Dict
+            Parameters passed to TrendStrength.
+
+        Returns
+        -------
+        result : Dict
+            Timings for each stage and chart.
+
+        """
+        if charts is None:
+            charts = CHART_TYPES
+
+        market = SyntheticMarket(
+            num_tickers=num_tickers, num_days=num_days, seed=seed)
+
+        runs = [cls._run_once(market, memory, charts, kwargs)
+                for _ in range(repeat)]
+
+        # Keep the fastest run of each stage and chart
+        result = {
+            'tickers': num_tickers,
+            'days': num_days,
+            'seed': seed,
+            'repeat': repeat,
+            'params': {key: repr(value) for key, value in kwargs.items()},
+            'stages': {},
+            'charts': {},
+            }
+        for section in ('stages', 'charts'):
+            for name in runs[0][section]:
+                result[section][name] = min(
+                    (run[section][name] for run in runs),
+                    key=lambda entry: entry['wall'])
+
+        return result
+
+
+    @classmethod
+    def _run_once(
+        cls,
+        market: SyntheticMarket,
+        memory: bool,
+        charts: list,
+        kwargs: dict) -> dict:
+
+        result = {'stages': {}, 'charts': {}}
+        trend = SyntheticTrendStrength(market=market, lazy=True, **kwargs)
+
+        for stage in trend.STAGES:
+            result['stages'][stage] = cls._measure(
+                lambda stage=stage: trend.run_stage(stage), memory)
+
+        for chart_type in charts:
+            result['charts'][chart_type] = cls._measure(
+                lambda chart_type=chart_type: trend.chart(chart_type),
+                memory)
+            plt.close('all')
+
+        return result
+
+
+    @staticmethod
+    def _measure(func, memory: bool) -> dict:
+
+        if memory:
+            tracemalloc.start()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        entry = {'error': None}
+
+        # Record a failure rather than stopping the benchmark
+        try:
+            func()
+        except Exception as err: # pylint: disable=broad-except
+            entry['error'] = repr(err)
+
+        entry['wall'] = time.perf_counter() - wall
+        entry['cpu'] = time.process_time() - cpu
+        if memory:
+            entry['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+        return entry
+
+
+def environment() -> dict:
+    """
+    Describe the interpreter, platform and package versions.
+
+    Returns
+    -------
+    Dict
+        Dictionary of environment details.
+
+    """
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    # Use the version of the source tree being benchmarked
+    versions['trendvisualizer'] = trendvisualizer.__version__
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'versions': versions,
+        }
+
+
+def compare(
+    new: dict,
+    old: dict,
+    threshold: float = 1.1) -> list:
+    """
+    Compare the wall times of two benchmark runs, printing the ratio for
+    each universe size, stage and chart present in both.
+
+    Parameters
+    ----------
+    new : Dict
+        The latest results.
+    old : Dict
+        The results to compare against.
+    threshold : Float, optional
+        Ratio of new to old wall time above which a timing is reported as a
+        regression. The default is 1.1.
+
+    Returns
+    -------
+    regressions : List
+        List of (tickers, days, section, name, ratio) tuples.
+
+    """
+    old_results = {
+        (result['tickers'], result['days']): result
+        for result in old['results']}
+
+    regressions = []
+    print(f"{'size':>12} {'timing':<26} {'old':>9} {'new':>9} {'ratio':>7}")
+    for result in new['results']:
+        size = (result['tickers'], result['days'])
+        if size not in old_results:
+            continue
+        for section in ('stages', 'charts'):
+            for name, entry in result[section].items():
+                old_entry = old_results[size][section].get(name)
+                if old_entry is None or old_entry['wall'] == 0:
+                    continue
+                ratio = entry['wall'] / old_entry['wall']
+                flag = ''
+                if ratio > threshold:
+                    flag = ' slower'
+                    regressions.append((*size, section, name, ratio))
+                print(f"{size[0]:>5}x{size[1]:<6} {section+'.'+name:<26} "
+                      f"{old_entry['wall']:>9.3f} {entry['wall']:>9.3f} "
+                      f"{ratio:>7.2f}{flag}")
+
+    return regressions
+
+
+def main(argv: list | None = None) -> int:
+    """
+    Run the benchmarks from the command line.
+
+    Parameters
+    ----------
+    argv : List, optional
+        Command line arguments. The default is None which uses sys.argv.
+
+    Returns
+    -------
+    Int
+        Exit status, 1 if a comparison found a regression.
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tickers', type=int, nargs='+',
+                        default=DEFAULT_TICKERS)
+    parser.add_argument('--days', type=int, nargs='+', default=DEFAULT_DAYS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--memory', action='store_true',
+                        help='trace peak memory of each stage')
+    parser.add_argument('--charts', nargs='*', default=CHART_TYPES,
+                        choices=CHART_TYPES)
+    parser.add_argument('--panel', action='store_true',
+                        help='calculate the indicators on a price panel')
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--compare', help='JSON file of earlier results')
+    parser.add_argument('--threshold', type=float, default=1.1)
+    args = parser.parse_args(argv)
+
+    results = {'environment': environment(), 'results': []}
+    for num_tickers in args.tickers:
+        for num_days in args.days:
+            result = PipelineBenchmark.run(
+                num_tickers=num_tickers, num_days=num_days, seed=args.seed,
+                repeat=args.repeat, memory=args.memory, charts=args.charts,
+                panel=args.panel, n_jobs=args.n_jobs)
+            results['results'].append(result)
+            total = sum(entry['wall'] for entry in result['stages'].values())
+            print(f"{num_tickers} tickers x {num_days} days: "
+                  f"pipeline {total:.2f}s", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=1)
+    else:
+        print(json.dumps(results, indent=1))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as compare_file:
+            old = json.load(compare_file)
+        if compare(results, old, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
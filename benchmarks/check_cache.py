@@ -0,0 +1,97 @@
+"""
+Check that TrendStrength results are written to the result cache and read
+back, for Yahoo Finance shaped runs whose prices end the trading day before
+the end date, including across an exchange holiday.
+
+Run from the repository root, eg:
+
+    python -m benchmarks.check_cache
+
+"""
+import sys
+import tempfile
+import pandas as pd
+from benchmarks.synthetic import SyntheticMarket, SyntheticTrendStrength
+
+# Last bar of the synthetic prices and the end date requested, by case.
+# 4 July 2024 was an exchange holiday.
+CASES = {
+    'weekend': ('2024-06-28', '2024-07-01'),
+    'holiday': ('2024-07-03', '2024-07-05'),
+    }
+
+
+def check(last_bar: str, end_date: str, num_tickers: int = 20) -> list:
+    """
+    Run the pipeline with a new result cache, then create a second
+    TrendStrength with the same parameters and check that it loads the
+    results rather than recalculating them.
+
+    Parameters
+    ----------
+    last_bar : Str
+        The last date of the synthetic prices.
+    end_date : Str
+        The end date supplied to TrendStrength.
+    num_tickers : Int, optional
+        Number of tickers in the universe. The default is 20.
+
+    Returns
+    -------
+    List
+        Descriptions of the failed checks, empty if they all passed.
+
+    """
+    market = SyntheticMarket(num_tickers, 300, end_date=last_bar)
+    failures = []
+    with tempfile.TemporaryDirectory() as path:
+        kwargs = {'source': 'yahoo', 'end_date': end_date,
+                  'result_cache': path, 'lazy': True}
+        first = SyntheticTrendStrength(market=market, **kwargs)
+        first.run_stage('chart_data')
+        if first._result_cache.get(first._cache_key) is None: # pylint: disable=protected-access
+            failures.append('the result was not written to the cache')
+            return failures
+
+        # The second object should complete every stage from the cache
+        # without importing any prices
+        second = SyntheticTrendStrength(market=market, **kwargs)
+        if second._completed != list(second.STAGES): # pylint: disable=protected-access
+            failures.append('the result was not read from the cache')
+            return failures
+        if 'prices' in second.timings['stages']:
+            failures.append('the prices were imported again')
+        try:
+            pd.testing.assert_frame_equal(
+                first.tables['barometer'], second.tables['barometer'])
+        except AssertionError as err:
+            failures.append('the cached barometer differs: ' + str(err))
+
+    return failures
+
+
+def main() -> int:
+    """
+    Run each case.
+
+    Returns
+    -------
+    Int
+        Exit status, 1 if any check failed.
+
+    """
+    status = 0
+    for case, (last_bar, end_date) in CASES.items():
+        failures = check(last_bar=last_bar, end_date=end_date)
+        for failure in failures:
+            print(case + ": " + failure, file=sys.stderr)
+        if failures:
+            status = 1
+        else:
+            print(case + ": ok")
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Deterministic synthetic futures universes with the same table shapes as
+TrendStrength.prep_norgate, so the pipeline can be run offline
+
+"""
+import copy
+import numpy as np
+import pandas as pd
+from trendvisdata.market_data import MktUtils
+from trendvisdata.sector_mappings import sectmap
+from trendvisdata.trend_params import trend_params_dict
+from trendvisualizer.trend import TrendStrength
+
+
+class SyntheticMarket():
+    """
+    Random walk OHLC price histories for a universe of futures tickers, each
+    mapped to the sectors of a real Norgate contract
+
+    Parameters
+    ----------
+    num_tickers : Int
+        Number of tickers in the universe.
+    num_days : Int
+        Number of business days of price history.
+    seed : Int, optional
+        Seed of the random number generator. The default is 0.
+    end_date : Str, optional
+        The last date of the price history. The default is '2024-06-28'.
+    ragged : Int, optional
+        Every n-th ticker has some dates missing, as happens with futures
+        that trade on different holiday calendars. The default is 7.
+
+    """
+    def __init__(
+        self,
+        num_tickers: int,
+        num_days: int,
+        seed: int = 0,
+        end_date: str = '2024-06-28',
+        ragged: int = 7) -> None:
+
+        self.num_tickers = num_tickers
+        self.num_days = num_days
+        self.seed = seed
+        self.dates = pd.bdate_range(
+            end=end_date, periods=num_days, name='Date')
+        self.ragged = ragged
+
+        # Last date of the prices returned, set by truncate
+        self.cutoff = self.dates[-1]
+
+        # Cycle through the Norgate contracts, adding a suffix once the list
+        # is exhausted so that every ticker is unique
+        ticker_types = trend_params_dict['df_params']['ticker_types']
+        contracts = [
+            key for key in sectmap['commodity_sector_mappings']
+            if key[0] in ticker_types]
+        self.tickers = []
+        self.sectors = {}
+        self.names = {}
+        for num in range(num_tickers):
+            contract = contracts[num % len(contracts)]
+            ticker = (ticker_types[contract[0]] + contract[1:]).lower()
+            if num >= len(contracts):
+                ticker = ticker + '_' + str(num // len(contracts))
+            self.tickers.append(ticker)
+            self.sectors[ticker] = sectmap[
+                'commodity_sector_mappings'][contract]
+            self.names[ticker] = 'Synthetic ' + ticker.upper() + ' Continuous'
+
+
+    def prices(self) -> dict:
+        """
+        Generate the price histories.
+
+        Returns
+        -------
+        raw_ticker_dict : Dict
+            Dictionary of OHLC DataFrames indexed by date, one for each
+            ticker.
+
+        """
+        rng = np.random.default_rng(self.seed)
+        shape = (self.num_days, self.num_tickers)
+
+        # Log random walks with a different drift for each ticker, so that
+        # the universe has a spread of up, down and neutral trends
+        drift = rng.normal(0, 0.001, self.num_tickers)
+        close = 100 * np.exp(np.cumsum(
+            rng.normal(drift, 0.015, shape), axis=0))
+        opens = close * (1 + rng.normal(0, 0.003, shape))
+        spread = np.abs(rng.normal(0, 0.01, shape)) * close
+        high = np.maximum(opens, close) + spread
+        low = np.minimum(opens, close) - spread
+
+        raw_ticker_dict = {}
+        for num, ticker in enumerate(self.tickers):
+            rows = np.arange(self.num_days)
+
+            # Drop a few dates from some tickers
+            if self.ragged and num % self.ragged == self.ragged // 2:
+                num_rows = self.num_days - min(10, self.num_days // 20)
+                rows = np.sort(rng.choice(
+                    self.num_days, num_rows, replace=False))
+
+            raw_ticker_dict[ticker] = pd.DataFrame(
+                {'Open': opens[rows, num],
+                 'High': high[rows, num],
+                 'Low': low[rows, num],
+                 'Close': close[rows, num]},
+                index=self.dates[rows]).loc[:self.cutoff]
+
+        return raw_ticker_dict
+
+
+    def truncate(self, cutoff: str) -> 'SyntheticMarket':
+        """
+        The same universe with the prices after a date removed, eg to seed
+        an incremental update or a stream with the earlier bars.
+
+        Parameters
+        ----------
+        cutoff : Str
+            The last date of the prices.
+
+        Returns
+        -------
+        SyntheticMarket
+            A copy of the universe whose prices end at the cutoff.
+
+        """
+        market = copy.copy(self)
+        market.cutoff = pd.Timestamp(cutoff)
+
+        return market
+
+
+    def prep_norgate(
+        self,
+        params: dict,
+        mappings: dict) -> tuple[dict, dict, dict]:
+        """
+        Create the same params, tables and mappings as
+        TrendStrength.prep_norgate, using the synthetic prices.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+        mappings : Dict
+            Dictionary of sector mappings.
+
+        Returns
+        -------
+        params : Dict
+            Dictionary of key parameters.
+        tables : Dict
+            Dictionary of key tables.
+        mappings : Dict
+            Dictionary of sector mappings.
+
+        """
+        params['asset_type'] = 'CTA'
+        params['tickers'] = list(self.tickers)
+        params['start_date'] = str(self.dates[0].date())
+        params['end_date'] = str(self.cutoff.date())
+        params['ticker_name_dict'] = dict(self.names)
+        params['ticker_short_name_dict'] = {
+            ticker: name.partition(" Continuous")[0]
+            for ticker, name in self.names.items()}
+
+        tables = {'raw_ticker_dict': self.prices()}
+
+        # Set the window from the price histories and remove tickers with
+        # short history, as the Norgate import does
+        params['window'] = None
+        for frame in tables['raw_ticker_dict'].values():
+            params = MktUtils.window_set(frame=frame, params=params)
+        tables = MktUtils.ticker_clean(params=params, tables=tables)
+
+        mappings['sector_mappings_df'] = pd.DataFrame.from_dict(
+            self.sectors, orient='index',
+            columns=params['commodity_sector_levels'])
+
+        return params, tables, mappings
+
+
+class SyntheticTrendStrength(TrendStrength):
+    """
+    TrendStrength which takes its prices from a SyntheticMarket rather than
+    Norgate Data or Yahoo Finance. With source='yahoo' the end date is the
+    business day after the last bar, as Yahoo Finance excludes it, unless
+    a later end date is supplied.
+
+    Parameters
+    ----------
+    market : SyntheticMarket
+        The synthetic universe.
+    **kwargs : Dict
+        Parameters supplied to override the defaults.
+
+    """
+    def __init__(self, market: SyntheticMarket, **kwargs) -> None:
+        self.market = market
+        super().__init__(**kwargs)
+
+
+    def prep_norgate( # pylint: disable=arguments-differ
+        self,
+        params: dict,
+        mappings: dict) -> tuple[dict, dict, dict]:
+
+        return self.market.prep_norgate(params=params, mappings=mappings)
+
+
+    def prep_yahoo( # pylint: disable=arguments-differ
+        self,
+        params: dict,
+        mappings: dict) -> tuple[dict, dict, dict]:
+
+        end_date = params['end_date']
+        params, tables, mappings = self.market.prep_norgate(
+            params=params, mappings=mappings)
+
+        # Label the sectors with the equity levels, as the Yahoo Finance
+        # import does
+        params['asset_type'] = 'Equity'
+        params['ticker_short_name_dict'] = params['ticker_name_dict']
+        mappings['sector_mappings_df'].columns = params[
+            'equity_sector_levels']
+
+        # Yahoo Finance excludes the end date from the history
+        if end_date is None:
+            end_date = str((self.market.cutoff + pd.offsets.BDay(1)).date())
+        params['end_date'] = end_date
+
+        return params, tables, mappings
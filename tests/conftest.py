@@ -0,0 +1,35 @@
+"""
+Synthetic universes shared by the tests
+
+"""
+import pytest
+from benchmarks.synthetic import SyntheticMarket, SyntheticTrendStrength
+
+# Number of tickers and business days of the synthetic universe, enough for
+# the 200 day indicators to be initialised
+NUM_TICKERS = 12
+NUM_DAYS = 300
+
+
+@pytest.fixture(name='market', scope='session')
+def fixture_market() -> SyntheticMarket:
+    """
+    Synthetic futures universe ending on 2024-06-28, with some tickers
+    missing dates.
+
+    """
+    return SyntheticMarket(NUM_TICKERS, NUM_DAYS)
+
+
+@pytest.fixture(name='serial', scope='session')
+def fixture_serial(market) -> SyntheticTrendStrength:
+    """
+    TrendStrength of the synthetic universe calculated one ticker at a
+    time, which the other calculation paths are compared with. Tests must
+    not update it.
+
+    """
+    trend = SyntheticTrendStrength(market=market, lazy=True)
+    trend.run_stage('barometer')
+
+    return trend
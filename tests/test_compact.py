@@ -0,0 +1,31 @@
+"""
+Compact tables against the full precision tables
+
+"""
+import pandas as pd
+from benchmarks.synthetic import SyntheticTrendStrength
+from trendvisualizer.compact import CompactTables
+
+
+def test_compact_barometer_matches_serial(market, serial):
+    """
+    The compacted barometer and fields hold the same values as the full
+    precision tables, with the text columns stored as categories.
+
+    """
+    trend = SyntheticTrendStrength(
+        market=market, lazy=True, compact_tables=True)
+    barometer = trend.tables['barometer']
+
+    columns = [column for column in barometer.columns
+               if column in CompactTables.category_columns(trend.params)]
+    assert 'Short_name' in columns
+    for column in columns:
+        assert isinstance(barometer[column].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(
+        barometer, serial.tables['barometer'], check_dtype=False,
+        check_categorical=False)
+
+    for ticker, frame in serial.tables['ticker_dict'].items():
+        pd.testing.assert_frame_equal(
+            trend.tables['ticker_dict'][ticker], frame, check_dtype=False)
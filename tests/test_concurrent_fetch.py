@@ -0,0 +1,214 @@
+"""
+Concurrent download of price histories from a local stub HTTP server
+
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+import pandas as pd
+import pytest
+import requests
+from trendvisualizer.concurrent_fetch import ConcurrentFetch
+
+# Seconds the stub server holds each request open, so that concurrent
+# downloads overlap
+DELAY = 0.05
+
+
+class StubServer():
+    """
+    HTTP server returning a CSV price history for /<symbol>, failing the
+    first requests for some symbols with a 503 and returning a 404 for
+    symbols without data
+
+    Parameters
+    ----------
+    failures : Dict
+        Number of requests which fail for each symbol.
+    missing : List
+        Symbols which return a 404.
+
+    """
+    def __init__(self, failures: dict, missing: list) -> None:
+        self.failures = failures
+        self.missing = missing
+        self.requests = {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Request handler of the stub server
+
+            """
+            def do_GET(self): # pylint: disable=invalid-name
+                """
+                Return the prices of the symbol in the path.
+
+                """
+                symbol = self.path.strip('/')
+                with stub.lock:
+                    stub.requests[symbol] = stub.requests.get(symbol, 0) + 1
+                    attempt = stub.requests[symbol]
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    time.sleep(DELAY)
+                    if symbol in stub.missing:
+                        self.send_error(404)
+                    elif attempt <= stub.failures.get(symbol, 0):
+                        self.send_error(503)
+                    else:
+                        body = StubServer.prices().to_csv().encode('utf-8')
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'text/csv')
+                        self.send_header('Content-Length', str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+
+            def log_message(self, *args): # pylint: disable=arguments-differ
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:' + str(self.server.server_port) + '/'
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+
+    @staticmethod
+    def prices() -> pd.DataFrame:
+        """
+        Price history returned for every symbol.
+
+        """
+        dates = pd.bdate_range('2024-06-03', '2024-06-28', name='Date')
+
+        return pd.DataFrame({'Open': 100.0, 'High': 101.0, 'Low': 99.0,
+                             'Close': 100.5, 'Volume': 1000}, index=dates)
+
+
+    def fetch(self, symbol: str) -> pd.DataFrame:
+        """
+        Download the prices of a symbol, raising a KeyError if it has no
+        data as the Yahoo Finance import does.
+
+        """
+        response = requests.get(self.url + symbol, timeout=10)
+        if response.status_code == 404:
+            raise KeyError(symbol)
+        response.raise_for_status()
+
+        return pd.read_csv(
+            StringIO(response.text), index_col='Date', parse_dates=True)
+
+
+    def close(self) -> None:
+        """
+        Stop the server.
+
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+@pytest.fixture(name='stub')
+def fixture_stub():
+    """
+    Stub server where AAA fails twice, CCC always fails and BRK.B only has
+    data as BRK-B.
+
+    """
+    stub = StubServer(failures={'AAA': 2, 'CCC': 100}, missing=['BRK.B'])
+    yield stub
+    stub.close()
+
+
+def test_retries_and_report(stub):
+    """
+    Failed requests are retried up to max_retries times with backoff, and
+    each ticker's outcome is reported.
+
+    """
+    backoff = 0.02
+    frames, report = ConcurrentFetch.download(
+        tickers=['AAA', 'BBB', 'CCC', 'BRK.B'], fetch=stub.fetch,
+        max_workers=4, max_retries=3, retry_backoff=backoff)
+
+    assert list(frames) == ['AAA', 'BBB', 'BRK.B']
+    assert list(report) == ['AAA', 'BBB', 'CCC', 'BRK.B']
+    pd.testing.assert_frame_equal(
+        frames['AAA'], StubServer.prices(), check_freq=False)
+
+    # AAA succeeds on the third attempt after waiting for two backoffs
+    assert report['AAA']['status'] == 'ok'
+    assert report['AAA']['attempts'] == 3
+    assert report['AAA']['error'] is None
+    assert report['AAA']['seconds'] >= 3 * DELAY + backoff * (1 + 2)
+    assert stub.requests['AAA'] == 3
+
+    assert report['BBB']['status'] == 'ok'
+    assert report['BBB']['attempts'] == 1
+
+    # CCC fails on the first attempt and every retry
+    assert report['CCC']['status'] == 'failed'
+    assert report['CCC']['attempts'] == 4
+    assert '503' in report['CCC']['error']
+    assert stub.requests['CCC'] == 4
+
+    # BRK.B has no data, so BRK-B is tried without a retry
+    assert report['BRK.B']['status'] == 'ok'
+    assert report['BRK.B']['symbol'] == 'BRK-B'
+    assert report['BRK.B']['attempts'] == 2
+    assert stub.requests['BRK.B'] == 1
+
+
+def test_concurrency_limit(stub):
+    """
+    No more than max_workers downloads run at once, and the total time
+    scales with the concurrency limit rather than the number of tickers.
+
+    """
+    tickers = ['T' + str(num) for num in range(12)]
+    start = time.perf_counter()
+    frames, _ = ConcurrentFetch.download(
+        tickers=tickers, fetch=stub.fetch, max_workers=4, max_retries=0)
+    elapsed = time.perf_counter() - start
+
+    assert list(frames) == tickers
+    assert 1 < stub.max_active <= 4
+    assert elapsed < len(tickers) * DELAY
+
+
+def test_import_yahoo_params(stub):
+    """
+    The download report, failed tickers and window are stored in params.
+
+    """
+    params = {
+        'tickers': ['AAA', 'BBB', 'CCC'], 'ticker_limit': None,
+        'max_workers': 2, 'max_retries': 2, 'retry_backoff': 0.01,
+        'start_date': '2024-06-03', 'window': None}
+    params, tables = ConcurrentFetch.import_yahoo(
+        params=params, tables={}, fetch=stub.fetch)
+
+    assert list(tables['raw_ticker_dict']) == ['AAA', 'BBB']
+    assert params['exceptions'] == ['CCC']
+    assert params['window'] == len(StubServer.prices())
+
+    report = params['download_report']
+    assert [report[ticker]['status'] for ticker in ['AAA', 'BBB', 'CCC']] \
+        == ['ok', 'ok', 'failed']
+    assert [report[ticker]['attempts'] for ticker in ['AAA', 'BBB', 'CCC']] \
+        == [3, 1, 3]
+    for entry in report.values():
+        assert entry['seconds'] >= DELAY
@@ -0,0 +1,59 @@
+"""
+Charts rendered concurrently in threads match those rendered one at a time
+
+"""
+import io
+import matplotlib.image
+import numpy as np
+import pytest
+from benchmarks.synthetic import SyntheticTrendStrength
+
+# Each chart type, with the summary as a swarm plot as the strip plot jitter
+# is drawn from NumPy's global random state
+SPECS = [
+    {'chart_type': 'bar', 'kwargs': {'mkts': 10, 'trend': 'up'}},
+    {'chart_type': 'returns', 'kwargs': {'mkts': 5}},
+    {'chart_type': 'market', 'kwargs': {'chart_mkts': 8}},
+    {'chart_type': 'summary', 'kwargs': {'summary_type': 'swarm'}},
+    {'chart_type': 'pie_summary', 'kwargs': {'indicator_type': 'adx'}},
+    {'chart_type': 'pie_breakdown', 'kwargs': {'sector_level': 2}},
+    ]
+
+
+@pytest.fixture(name='trend', scope='module')
+def fixture_trend(market):
+    """
+    TrendStrength of the synthetic universe with its chart data generated.
+
+    """
+    trend = SyntheticTrendStrength(market=market, lazy=True)
+    trend.run_stage('chart_data')
+
+    return trend
+
+
+def pixels(result: dict) -> np.ndarray:
+    """
+    Decode the PNG image of a render result.
+
+    """
+    assert result['error'] is None
+
+    return matplotlib.image.imread(io.BytesIO(result['data']), format='png')
+
+
+def test_threaded_render_matches_serial(trend):
+    """
+    Every chart type renders to the same pixels in a pool of threads, with
+    each chart built several times at once, as one at a time.
+
+    """
+    serial = trend.render(SPECS)
+    threaded = trend.render(SPECS * 3, n_jobs=6, threads=True)
+
+    for num, result in enumerate(threaded):
+        expected = serial[num % len(SPECS)]
+        assert result['chart_type'] == expected['chart_type']
+        np.testing.assert_array_equal(
+            pixels(result), pixels(expected),
+            err_msg=result['chart_type'])
@@ -0,0 +1,36 @@
+"""
+Trend Strength history against the barometers of truncated runs
+
+"""
+import pandas as pd
+import pytest
+from benchmarks.synthetic import SyntheticTrendStrength
+
+# Dates checked, counted back from the end of the history
+OFFSETS = [1, 5, 20]
+
+
+@pytest.mark.parametrize('chunk_days', [None, 7])
+def test_history_matches_truncated_barometers(market, serial, chunk_days):
+    """
+    Each row of the history, forward filled over the dates a ticker has no
+    bar, equals the Trend Strength and flags of a run ending on that date.
+
+    """
+    history = serial.history(flags=True, chunk_days=chunk_days)
+    strength = history['trend_strength'].ffill()
+
+    for offset in OFFSETS:
+        date = market.dates[-offset]
+        barometer = SyntheticTrendStrength(
+            market=market.truncate(date), lazy=True).tables[
+                'barometer'].set_index('Ticker')
+
+        pd.testing.assert_series_equal(
+            strength.loc[date, barometer.index],
+            barometer['Trend Strength'],
+            check_dtype=False, check_names=False)
+        for flag, table in history['flags'].items():
+            pd.testing.assert_series_equal(
+                table.ffill().loc[date, barometer.index], barometer[flag],
+                check_dtype=False, check_names=False)
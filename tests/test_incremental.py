@@ -0,0 +1,33 @@
+"""
+Incremental update of the latest bars against a full rebuild
+
+"""
+import pandas as pd
+from benchmarks.synthetic import SyntheticTrendStrength
+
+# Number of bars added at the end of the history
+NUM_NEW = 2
+
+
+def test_update_matches_full_rebuild(market, serial):
+    """
+    Adding the last bars of each ticker to a run ending before them gives
+    the indicator fields and barometer of a run over the full history.
+
+    """
+    dates = market.dates[-NUM_NEW:]
+    trend = SyntheticTrendStrength(
+        market=market.truncate(market.dates[-NUM_NEW-1]), lazy=True)
+    trend.run_stage('barometer')
+
+    new_bars = {ticker: frame.loc[dates[0]:]
+                for ticker, frame in market.prices().items()
+                if len(frame.loc[dates[0]:])}
+    trend.update(new_bars)
+
+    for ticker, frame in serial.tables['ticker_dict'].items():
+        pd.testing.assert_frame_equal(
+            trend.tables['ticker_dict'][ticker][frame.columns], frame,
+            check_freq=False)
+    pd.testing.assert_frame_equal(
+        trend.tables['barometer'], serial.tables['barometer'])
@@ -0,0 +1,90 @@
+"""
+Peak memory of nested and overlapping measurements
+
+"""
+import threading
+import tracemalloc
+from trendvisualizer.instrument import StageTimer
+
+# Size of the allocations measured, in bytes and MB
+SIZE = 8 * 2**20
+SIZE_MB = SIZE / 2**20
+
+
+def test_nested_peaks():
+    """
+    The peak of an enclosing block includes the memory allocated before a
+    nested block resets the tracemalloc peak.
+
+    """
+    timer = StageTimer(trace_memory=True)
+    with timer.measure('outer') as outer:
+        data = bytearray(SIZE)
+        del data
+        with timer.measure('inner') as inner:
+            data = bytearray(SIZE // 8)
+            del data
+
+    assert outer['peak_mb'] >= SIZE_MB
+    assert SIZE_MB / 8 <= inner['peak_mb'] < SIZE_MB
+    assert not tracemalloc.is_tracing()
+
+
+def test_overlapping_threads():
+    """
+    A block which finishes while another thread's block is open does not
+    stop tracing or take the other block's peak.
+
+    """
+    timer = StageTimer(trace_memory=True)
+    first_open = threading.Event()
+    second_open = threading.Event()
+    first_closed = threading.Event()
+    records = {}
+
+    def first() -> None:
+        with timer.measure('first', kind='chart') as record:
+            first_open.set()
+            second_open.wait()
+        records['first'] = record
+        first_closed.set()
+
+    def second() -> None:
+        first_open.wait()
+        with timer.measure('second', kind='chart') as record:
+            second_open.set()
+            first_closed.wait()
+            records['tracing'] = tracemalloc.is_tracing()
+            data = bytearray(SIZE)
+            del data
+        records['second'] = record
+
+    threads = [threading.Thread(target=second),
+               threading.Thread(target=first)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert records['tracing']
+    assert records['first']['peak_mb'] < SIZE_MB
+    assert records['second']['peak_mb'] >= SIZE_MB
+    assert sorted(timer.timings['charts']) == ['first', 'second']
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_started_by_caller():
+    """
+    Tracing started outside the timer is left running.
+
+    """
+    tracemalloc.start()
+    try:
+        timer = StageTimer(trace_memory=True)
+        with timer.measure('stage') as record:
+            data = bytearray(SIZE)
+            del data
+        assert tracemalloc.is_tracing()
+        assert record['peak_mb'] >= SIZE_MB
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,26 @@
+"""
+Indicators calculated on the aligned price panel against the per-ticker
+calculation
+
+"""
+import pandas as pd
+from benchmarks.synthetic import SyntheticTrendStrength
+
+
+def test_panel_matches_serial(market, serial):
+    """
+    The ticker_dict view over the panel holds the fields of the per-ticker
+    calculation, and the barometer is the same. The panel also keeps the
+    columns of indicators with too little history, which the per-ticker
+    calculation drops.
+
+    """
+    trend = SyntheticTrendStrength(market=market, lazy=True, panel=True)
+    ticker_dict = trend.tables['ticker_dict']
+
+    assert list(ticker_dict) == list(serial.tables['ticker_dict'])
+    for ticker, frame in serial.tables['ticker_dict'].items():
+        pd.testing.assert_frame_equal(
+            ticker_dict[ticker][frame.columns], frame, check_freq=False)
+    pd.testing.assert_frame_equal(
+        trend.tables['barometer'], serial.tables['barometer'])
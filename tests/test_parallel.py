@@ -0,0 +1,22 @@
+"""
+Indicators calculated in a process pool against the serial calculation
+
+"""
+import pandas as pd
+from benchmarks.synthetic import SyntheticTrendStrength
+
+
+def test_process_pool_matches_serial(market, serial):
+    """
+    The indicator fields and barometer calculated across processes equal
+    those calculated one ticker at a time.
+
+    """
+    trend = SyntheticTrendStrength(market=market, lazy=True, n_jobs=2)
+    ticker_dict = trend.tables['ticker_dict']
+
+    assert list(ticker_dict) == list(serial.tables['ticker_dict'])
+    for ticker, frame in serial.tables['ticker_dict'].items():
+        pd.testing.assert_frame_equal(ticker_dict[ticker], frame)
+    pd.testing.assert_frame_equal(
+        trend.tables['barometer'], serial.tables['barometer'])
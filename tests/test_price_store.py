@@ -0,0 +1,92 @@
+"""
+Price store shared by several refreshes
+
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+from trendvisualizer.price_store import PriceStore
+
+
+def prices(end_date: str) -> pd.DataFrame:
+    """
+    Price history from 2024-06-03 to the end date.
+
+    """
+    dates = pd.bdate_range('2024-06-03', end_date, name='Date')
+
+    return pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5},
+                        index=dates)
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'feather'])
+def test_write_is_visible_once_saved(tmp_path, file_format):
+    """
+    A history is read back by the refresh which wrote it, and by other
+    stores once saved, with no temporary files left behind.
+
+    """
+    store = PriceStore(str(tmp_path), 'yahoo', file_format=file_format)
+    store.write('AAA', prices('2024-06-14'), '2024-06-03', '2024-06-17',
+                name='Triple A')
+    pd.testing.assert_frame_equal(
+        store.read('AAA'), prices('2024-06-14'), check_freq=False)
+    assert PriceStore(str(tmp_path), 'yahoo', file_format).read('AAA') is None
+
+    store.save()
+    other = PriceStore(str(tmp_path), 'yahoo', file_format=file_format)
+    pd.testing.assert_frame_equal(
+        other.read('AAA'), prices('2024-06-14'), check_freq=False)
+    assert other.meta['AAA'] == {
+        'start': '2024-06-03', 'checked': '2024-06-17', 'name': 'Triple A'}
+    assert not [name for name in os.listdir(store.path)
+                if name.endswith('.tmp')]
+
+
+def test_save_merges_metadata(tmp_path):
+    """
+    Stores opened at the same time keep each other's metadata, and an
+    older history does not replace a newer one saved in the meantime.
+
+    """
+    first = PriceStore(str(tmp_path), 'yahoo')
+    second = PriceStore(str(tmp_path), 'yahoo')
+
+    first.write('AAA', prices('2024-06-14'), '2024-06-03', '2024-06-17')
+    first.write('BBB', prices('2024-06-14'), '2024-06-03', '2024-06-17')
+    second.write('BBB', prices('2024-06-21'), '2024-06-03', '2024-06-24')
+    second.write('CCC', prices('2024-06-21'), '2024-06-03', '2024-06-24')
+    second.save()
+    first.save()
+
+    with open(first.meta_path, encoding='utf-8') as meta_file:
+        meta = json.load(meta_file)
+    assert sorted(meta) == ['AAA', 'BBB', 'CCC']
+    assert meta['BBB']['checked'] == '2024-06-24'
+    assert first.meta == meta
+
+    pd.testing.assert_frame_equal(
+        PriceStore(str(tmp_path), 'yahoo').read('BBB'),
+        prices('2024-06-21'), check_freq=False)
+
+
+def test_concurrent_saves(tmp_path):
+    """
+    Refreshes saving from many threads at once lose no entries.
+
+    """
+    def refresh(num: int) -> None:
+        store = PriceStore(str(tmp_path), 'yahoo')
+        ticker = 'T' + str(num)
+        store.write(ticker, prices('2024-06-14'), '2024-06-03', '2024-06-17')
+        store.save()
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(refresh, range(32)))
+
+    store = PriceStore(str(tmp_path), 'yahoo')
+    assert sorted(store.meta) == sorted('T' + str(num) for num in range(32))
+    for ticker in store.meta:
+        assert len(store.read(ticker)) == len(prices('2024-06-14'))
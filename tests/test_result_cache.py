@@ -0,0 +1,24 @@
+"""
+Result cache entries which can no longer be read
+
+"""
+import os
+import pytest
+from trendvisualizer.result_cache import ResultCache
+
+
+def test_unreadable_entry_is_removed_with_warning(tmp_path):
+    """
+    A corrupted entry is a cache miss, removed with a warning rather than
+    printed.
+
+    """
+    cache = ResultCache(str(tmp_path))
+    cache.put('good', {'tables': {}})
+    with open(os.path.join(cache.path, 'bad.pkl'), 'wb') as cache_file:
+        cache_file.write(b'not a pickle')
+
+    with pytest.warns(RuntimeWarning, match='bad'):
+        assert cache.get('bad') is None
+    assert not os.path.exists(os.path.join(cache.path, 'bad.pkl'))
+    assert cache.get('good') == {'tables': {}}
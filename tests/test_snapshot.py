@@ -0,0 +1,56 @@
+"""
+Saving a computed session and loading it back
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import SyntheticTrendStrength
+from trendvisualizer.trend import TrendStrength
+
+
+@pytest.fixture(name='trend', scope='module')
+def fixture_trend(market):
+    """
+    TrendStrength of the synthetic universe with every stage run.
+
+    """
+    trend = SyntheticTrendStrength(market=market, lazy=True)
+    trend.run_stage('chart_data')
+
+    return trend
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_round_trip(trend, tmp_path, lazy):
+    """
+    A loaded session has the tables, top trends and chart data of the saved
+    one, whether the chart data is regenerated when loaded or when first
+    needed.
+
+    """
+    trend.save(str(tmp_path))
+    loaded = TrendStrength.load(str(tmp_path), lazy=lazy)
+
+    assert loaded.params['lazy'] == lazy
+    assert loaded.params['result_cache'] is None
+    assert sorted(loaded.tables) == sorted(trend.tables)
+    pd.testing.assert_frame_equal(
+        loaded.tables['barometer'], trend.tables['barometer'])
+    for ticker, frame in trend.tables['ticker_dict'].items():
+        pd.testing.assert_frame_equal(
+            loaded.tables['ticker_dict'][ticker], frame, check_freq=False)
+
+    # The top trends are pairs of ticker and price history
+    top_ticker_dict = loaded.top_trends['top_ticker_dict']
+    assert list(top_ticker_dict) == list(trend.top_trends['top_ticker_dict'])
+    pairs = list(zip(
+        loaded.top_trends['top_ticker_list'] + list(top_ticker_dict.values()),
+        trend.top_trends['top_ticker_list']
+        + list(trend.top_trends['top_ticker_dict'].values())))
+    assert len(pairs) == len(trend.top_trends['top_ticker_list']) * 2
+    for (ticker, frame), (expected_ticker, expected) in pairs:
+        assert ticker == expected_ticker
+        pd.testing.assert_frame_equal(frame, expected, check_freq=False)
+
+    np.testing.assert_equal(loaded.data_dict, trend.data_dict)
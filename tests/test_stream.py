@@ -0,0 +1,86 @@
+"""
+Replaying a csv file of bars through the stream
+
+"""
+import pandas as pd
+from benchmarks.synthetic import SyntheticTrendStrength
+from trendvisualizer.stream import TrendStream
+
+# Number of bars replayed at the end of the history
+NUM_REPLAYED = 3
+
+
+def rebuild(market, cutoff: pd.Timestamp) -> pd.DataFrame:
+    """
+    Barometer of a full run with the prices up to the cutoff.
+
+    """
+    trend = SyntheticTrendStrength(market=market.truncate(cutoff), lazy=True)
+
+    return trend.tables['barometer']
+
+
+def test_replay_matches_full_calculation(market, tmp_path):
+    """
+    The deltas published for each replayed date, applied to the seed
+    barometer, give the Trend Strength of Fields.generate_trend_strength
+    on the prices up to that date, and so does the final barometer.
+
+    """
+    dates = market.dates[-NUM_REPLAYED:]
+    seed = SyntheticTrendStrength(
+        market=market.truncate(market.dates[-NUM_REPLAYED-1]), lazy=True)
+
+    # Write the replayed bars to a csv file in date order
+    bars = pd.concat(
+        {ticker: frame.loc[dates[0]:]
+         for ticker, frame in market.prices().items()},
+        names=['Ticker', 'Date']).reset_index().sort_values(
+            ['Date', 'Ticker'], kind='stable')
+    path = tmp_path / 'bars.csv'
+    bars.to_csv(path, index=False)
+
+    stream = TrendStream(seed)
+    deltas = []
+    published = []
+    stream.subscribe(deltas.append)
+    stream.subscribe(published.append)
+    strength = seed.tables['barometer'].set_index('Ticker')[
+        'Trend Strength'].to_dict()
+
+    events = list(TrendStream.csv_events(str(path)))
+    assert len(events) == len(bars)
+
+    for date in dates:
+        deltas.clear()
+        stream.run(event for event in events if event[1]['Date'] == date)
+        expected = rebuild(market, date).set_index('Ticker')
+
+        # Each delta carries the Trend Strength before and after its bar
+        for delta in deltas:
+            assert delta['date'] == date
+            assert delta['previous_trend_strength'] == strength[
+                delta['ticker']]
+            strength[delta['ticker']] = delta['trend_strength']
+            for flag, value in delta['flags'].items():
+                assert value == expected.loc[delta['ticker'], flag]
+
+        assert strength == expected['Trend Strength'].to_dict()
+
+    assert published
+    assert stream.processed == len(bars)
+    assert stream.skipped == 0
+
+    # The barometer built from the stream matches the full calculation
+    barometer = stream.barometer()
+    expected = rebuild(market, dates[-1])
+    columns = ['Ticker', 'Trend Strength', 'Trend'] + list(
+        seed.params['trend_flags'])
+    pd.testing.assert_frame_equal(
+        barometer[columns].reset_index(drop=True),
+        expected[columns].reset_index(drop=True),
+        check_dtype=False)
+    pd.testing.assert_series_equal(
+        barometer['largest_change'].reset_index(drop=True),
+        expected['largest_change'].reset_index(drop=True),
+        check_dtype=False)
@@ -0,0 +1,38 @@
+"""
+Barometers of swept combinations against full runs with the same parameters
+
+"""
+import pandas as pd
+import pytest
+from benchmarks.synthetic import SyntheticTrendStrength
+
+# A combination with fewer than 29 trend flags, where the full calculation
+# also sums largest_change, and one adding a flag after the 29th
+COMBINATIONS = [
+    {'adx_list': [10, 30],
+     'trend_flags': ['PX_MA_10_flag', 'ADX_10_flag', 'ADX_30_flag',
+                     'RSI_20_flag', 'MACD_flag']},
+    {'price_cross_list': [10, 20, 30, 50, 100, 200, 5]},
+    ]
+
+
+@pytest.mark.parametrize('combination', COMBINATIONS)
+def test_combination_matches_full_run(market, combination):
+    """
+    The barometer of a combination equals that of a TrendStrength built
+    with the combination's parameters.
+
+    """
+    trend = SyntheticTrendStrength(market=market, lazy=True)
+    result = trend.sweep([combination])[0]
+
+    expected = SyntheticTrendStrength(
+        market=market, lazy=True,
+        **dict(combination, trend_flags=result['trend_flags'])).tables[
+            'barometer']
+    barometer = result['barometer']
+
+    assert list(barometer.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(
+        barometer.reset_index(drop=True), expected.reset_index(drop=True),
+        check_dtype=False)
@@ -0,0 +1,364 @@
+"""
+Precomputed orderings and aggregates of the Trend Strength table, built
+once and shared by the charts
+
+"""
+import numpy as np
+import pandas as pd
+
+
+class BarometerIndex():
+    """
+    Rank orderings of the barometer by 'Trend Strength %' and
+    'Absolute Trend Strength %', so that the most or least trending rows can
+    be selected without sorting the table again.
+
+    Parameters
+    ----------
+    barometer : DataFrame
+        DataFrame showing trend strength for each ticker.
+
+    """
+    # Column and sort direction of each ordering
+    orderings = {
+        'up': ('Trend Strength %', True),
+        'down': ('Trend Strength %', False),
+        'absolute': ('Absolute Trend Strength %', True),
+        }
+
+    def __init__(self, barometer: pd.DataFrame) -> None:
+
+        self.index = barometer.index
+        self.positions = {}
+
+        # Use the same sort as the charts did so that ties keep their order
+        for name, (column, ascending) in self.orderings.items():
+            order = barometer.sort_values(
+                by=[column], ascending=ascending).index
+            self.positions[name] = barometer.index.get_indexer(order)
+
+
+    @classmethod
+    def for_barometer(
+        cls,
+        barometer: pd.DataFrame,
+        rank_index: 'BarometerIndex | None' = None) -> 'BarometerIndex':
+        """
+        Return the rank index if it matches the barometer, otherwise build a
+        new one, eg if rows have since been dropped from the barometer.
+
+        Parameters
+        ----------
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker.
+        rank_index : BarometerIndex, optional
+            A previously built index. The default is None.
+
+        Returns
+        -------
+        BarometerIndex
+            Index matching the barometer.
+
+        """
+        if rank_index is not None and rank_index.matches(barometer):
+            return rank_index
+
+        return cls(barometer)
+
+
+    def matches(self, barometer: pd.DataFrame) -> bool:
+        """
+        Whether the index was built for the rows of the barometer.
+
+        Parameters
+        ----------
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker.
+
+        Returns
+        -------
+        Bool
+            True if the barometer has the same rows.
+
+        """
+        return (barometer.index is self.index
+                or barometer.index.equals(self.index))
+
+
+    def select(
+        self,
+        barometer: pd.DataFrame,
+        ordering: str,
+        num: int,
+        last: bool = True) -> pd.DataFrame:
+        """
+        Select rows of the barometer in rank order.
+
+        Parameters
+        ----------
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker.
+        ordering : Str
+            'up' (ascending Trend Strength %), 'down' (descending Trend
+            Strength %) or 'absolute' (ascending Absolute Trend
+            Strength %).
+        num : Int
+            Number of rows.
+        last : Bool, optional
+            Whether to take the last rows of the ordering rather than the
+            first. The default is True.
+
+        Returns
+        -------
+        DataFrame
+            The selected rows, in rank order.
+
+        """
+        positions = self.positions[ordering]
+        if last:
+            positions = positions[-num:]
+        else:
+            positions = positions[:num]
+
+        return barometer.iloc[positions]
+
+
+
+class FlagTallies():
+    """
+    Proportions of tickers that are long, short or neutral for every
+    indicator flag column of the barometer, counted in one pass.
+
+    Parameters
+    ----------
+    barometer : DataFrame
+        DataFrame showing trend strength for each ticker.
+
+    """
+    def __init__(self, barometer: pd.DataFrame) -> None:
+
+        self.index = barometer.index
+        flags = [column for column in barometer.columns
+                 if column.endswith('_flag')]
+        values = barometer[flags].to_numpy()
+        num_rows = len(barometer)
+
+        # Count each direction down every column at once
+        self.proportions = pd.DataFrame(
+            {'long': (values == 1).sum(axis=0) / num_rows,
+             'short': (values == -1).sum(axis=0) / num_rows,
+             'neutral': (values == 0).sum(axis=0) / num_rows},
+            index=[column[:-len('_flag')] for column in flags])
+
+
+    @classmethod
+    def for_barometer(
+        cls,
+        barometer: pd.DataFrame,
+        tallies: 'FlagTallies | None' = None) -> 'FlagTallies':
+        """
+        Return the tallies if they match the barometer, otherwise count
+        them again.
+
+        Parameters
+        ----------
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker.
+        tallies : FlagTallies, optional
+            Previously counted tallies. The default is None.
+
+        Returns
+        -------
+        FlagTallies
+            Tallies matching the barometer.
+
+        """
+        if tallies is not None and (
+            barometer.index is tallies.index
+            or barometer.index.equals(tallies.index)):
+            return tallies
+
+        return cls(barometer)
+
+
+    def direction(self, indicator: str) -> tuple[float, float, float]:
+        """
+        Proportions for a single indicator.
+
+        Parameters
+        ----------
+        indicator : Str
+            The indicator and tenor, eg 'ADX_20' or 'MA_10_30'.
+
+        Returns
+        -------
+        Tuple
+            The long, short and neutral proportions.
+
+        """
+        row = self.proportions.loc[indicator]
+
+        return row['long'], row['short'], row['neutral']
+
+
+class SectorCube():
+    """
+    Counts of the long, neutral and short flags of every indicator and the
+    mean Trend Strength of each sector, at every sector level. Each level is
+    aggregated in one groupby when the barometer is created, so that the
+    sector charts and queries are lookups.
+
+    Parameters
+    ----------
+    barometer : DataFrame
+        DataFrame showing trend strength for each ticker.
+    sector_names : List
+        The sector column of each level, 1 being the broadest.
+
+    """
+    # Flag value of each direction
+    directions = {'long': 1, 'neutral': 0, 'short': -1}
+
+    # Columns averaged over the markets of each sector
+    strength_columns = ['Trend Strength %', 'Absolute Trend Strength %']
+
+    def __init__(
+        self,
+        barometer: pd.DataFrame,
+        sector_names: list) -> None:
+
+        self.index = barometer.index
+        self.sector_names = list(sector_names)
+        flags = [column for column in barometer.columns
+                 if column.endswith('_flag')]
+        values = barometer[flags].to_numpy()
+
+        # One column for each indicator and direction, counting 1 for the
+        # markets with that flag value, followed by the trend strength
+        columns = {}
+        for num, flag in enumerate(flags):
+            for direction, value in self.directions.items():
+                columns[(flag[:-len('_flag')], direction)] = (
+                    values[:, num] == value).astype(np.int64)
+        for column in self.strength_columns:
+            columns[(column, 'mean')] = barometer[column].to_numpy(
+                dtype=float)
+        frame = pd.DataFrame(columns, index=barometer.index)
+
+        # Sum every column by sector in one pass for each level, dividing
+        # the trend strength by the number of markets for the mean
+        self.levels = {}
+        for level, sector_name in enumerate(self.sector_names, start=1):
+            if sector_name not in barometer.columns:
+                continue
+            grouped = frame.groupby(
+                barometer[sector_name].to_numpy(dtype=object))
+            table = grouped.sum()
+            markets = grouped.size()
+            for column in self.strength_columns:
+                table[(column, 'mean')] = table[(column, 'mean')] / markets
+            table[('markets', 'count')] = markets
+            table.index.name = sector_name
+            self.levels[level] = table
+
+
+    @classmethod
+    def for_barometer(
+        cls,
+        barometer: pd.DataFrame,
+        sector_names: list,
+        cube: 'SectorCube | None' = None) -> 'SectorCube':
+        """
+        Return the cube if it matches the barometer, otherwise aggregate it
+        again.
+
+        Parameters
+        ----------
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker.
+        sector_names : List
+            The sector column of each level, 1 being the broadest.
+        cube : SectorCube, optional
+            A previously built cube. The default is None.
+
+        Returns
+        -------
+        SectorCube
+            Cube matching the barometer.
+
+        """
+        if (cube is not None
+            and cube.sector_names == list(sector_names)
+            and (barometer.index is cube.index
+                 or barometer.index.equals(cube.index))):
+            return cube
+
+        return cls(barometer, sector_names)
+
+
+    @staticmethod
+    def sector_names(params: dict) -> list:
+        """
+        The sector column of each level for the asset type.
+
+        Parameters
+        ----------
+        params : Dict
+            asset_type : Str
+                'CTA' or 'Equity'.
+
+        Returns
+        -------
+        List
+            The sector columns, 1 being the broadest.
+
+        """
+        if params['asset_type'] == 'CTA':
+            return list(params['commodity_sector_levels'])
+
+        return list(params['equity_sector_levels'])
+
+
+    def counts(self, sector_level: int, indicator: str) -> pd.DataFrame:
+        """
+        Number of markets in each sector with each flag value of an
+        indicator.
+
+        Parameters
+        ----------
+        sector_level : Int
+            Level of sector grouping, 1 being the broadest.
+        indicator : Str
+            The indicator and tenor, eg 'ADX_20' or 'MA_10_30'.
+
+        Returns
+        -------
+        DataFrame
+            Sectors x 'long', 'neutral' and 'short', in sorted sector order.
+
+        """
+        return self.levels[sector_level][indicator][list(self.directions)]
+
+
+    def strength(self, sector_level: int) -> pd.DataFrame:
+        """
+        Number of markets and mean Trend Strength % and Absolute Trend
+        Strength % of each sector.
+
+        Parameters
+        ----------
+        sector_level : Int
+            Level of sector grouping, 1 being the broadest.
+
+        Returns
+        -------
+        DataFrame
+            Sectors x 'markets' and the strength columns.
+
+        """
+        table = self.levels[sector_level]
+        strength = table[[('markets', 'count')] + [
+            (column, 'mean') for column in self.strength_columns]]
+        strength.columns = ['markets'] + self.strength_columns
+
+        return strength
@@ -0,0 +1,178 @@
+"""
+Trend Strength for several overlapping universes, loading the prices and
+calculating the indicator fields of each distinct ticker once
+
+"""
+from trendvisualizer.trend import TrendStrength
+
+
+class UniverseBatch():
+    """
+    Barometers and top trends for several universes drawn from one shared
+    TrendStrength, whose prices and indicator fields cover the union of the
+    universes. The cost of loading and calculating the fields scales with
+    the number of distinct tickers rather than the sum of the universes.
+
+    Tickers with a short history are removed once, against the history of
+    the union rather than of each universe.
+
+    Parameters
+    ----------
+    universes : Dict
+        Dictionary of universe definitions keyed by name. Each is a
+        dictionary with any of the following keys, applied in this order:
+            tickers : List
+                Tickers in the form taken by the TrendStrength tickers
+                parameter, eg '&ES_CCB'. The default is None which takes
+                every ticker loaded.
+            ticker_types : List
+                Ticker types to keep, eg ['c', 's'] for continuous futures
+                and spot cash commodities. Norgate Data only.
+            sectors : Dict
+                Sector column and the value or list of values to keep, eg
+                {'Asset Class': ['Energy']}.
+            ticker_limit : Int
+                Maximum number of tickers, taking the first in the order
+                selected.
+    trend : TrendStrength, optional
+        The shared object, which must cover the union of the universes. The
+        default is None which creates one from kwargs.
+    **kwargs : Dict
+        Parameters supplied to every universe, and to the shared object
+        when it is created here, eg the indicator parameters and dates. A
+        result_cache is only used by the shared object.
+
+    """
+    def __init__(
+        self,
+        universes: dict,
+        trend: TrendStrength | None = None,
+        **kwargs) -> None:
+
+        self.definitions = universes
+
+        # Load the union of the universes once, leaving the stages to run
+        # when the universes are created
+        if trend is None:
+            trend = TrendStrength(**dict(
+                kwargs, lazy=True,
+                tickers=self.union_tickers(universes),
+                ticker_limit=None))
+        self.trend = trend
+
+        # Create each universe from the shared prices and fields. The
+        # universes are not cached, as their results are derived from the
+        # shared object rather than keyed by their own parameters.
+        kwargs.pop('result_cache', None)
+        self.universes = {}
+        for name, definition in universes.items():
+            self.universes[name] = trend.subset(
+                tickers=self.select(definition), **kwargs)
+
+
+    def __getitem__(self, name: str) -> TrendStrength:
+        return self.universes[name]
+
+
+    def barometers(self) -> dict:
+        """
+        Trend Strength table of each universe.
+
+        Returns
+        -------
+        Dict
+            Dictionary of barometer DataFrames keyed by universe name.
+
+        """
+        return {name: universe.tables['barometer']
+                for name, universe in self.universes.items()}
+
+
+    def top_trends(self) -> dict:
+        """
+        Top trending securities of each universe.
+
+        Returns
+        -------
+        Dict
+            Dictionary of top trends keyed by universe name.
+
+        """
+        return {name: universe.top_trends
+                for name, universe in self.universes.items()}
+
+
+    @staticmethod
+    def union_tickers(universes: dict) -> list | None:
+        """
+        Tickers to load for the union of the universes.
+
+        Parameters
+        ----------
+        universes : Dict
+            Dictionary of universe definitions.
+
+        Returns
+        -------
+        List or None
+            The distinct tickers in the order first listed, or None if any
+            universe takes every ticker.
+
+        """
+        tickers = {}
+        for definition in universes.values():
+            if definition.get('tickers') is None:
+                return None
+            tickers.update(dict.fromkeys(definition['tickers']))
+
+        return list(tickers)
+
+
+    def select(self, definition: dict) -> list:
+        """
+        Keys of ticker_dict in a universe.
+
+        Parameters
+        ----------
+        definition : Dict
+            The universe definition.
+
+        Returns
+        -------
+        keys : List
+            The selected keys of the shared ticker_dict, eg 'c_es_ccb'.
+
+        """
+        params = self.trend.params
+        self.trend.run_stage('fields')
+        ticker_dict = self.trend.tables['ticker_dict']
+
+        # Map Norgate tickers to the lowercase keys of ticker_dict, eg
+        # '&ES_CCB' to 'c_es_ccb'
+        if definition.get('tickers') is None:
+            keys = list(ticker_dict)
+        elif params['source'] == 'norgate':
+            keys = [(params['ticker_types'][ticker[0]]+ticker[1:]).lower()
+                    if ticker[0] in params['ticker_types'] else ticker
+                    for ticker in definition['tickers']]
+        else:
+            keys = list(definition['tickers'])
+
+        if definition.get('ticker_types') is not None:
+            prefixes = tuple(ticker_type.rstrip('_')+'_'
+                             for ticker_type in definition['ticker_types'])
+            keys = [key for key in keys if key.startswith(prefixes)]
+
+        # Keep the tickers whose sector mapping matches every filter
+        sector_mappings = self.trend.mappings['sector_mappings_df']
+        for column, values in (definition.get('sectors') or {}).items():
+            if isinstance(values, str):
+                values = [values]
+            matches = set(sector_mappings.index[
+                sector_mappings[column].isin(values)])
+            keys = [key for key in keys if key in matches]
+
+        if definition.get('ticker_limit') is not None:
+            keys = keys[:definition['ticker_limit']]
+
+        return keys
@@ -0,0 +1,514 @@
+"""
+Data behind each chart type as plain lists and dictionaries, serializable as
+JSON or Arrow, for charts drawn by a frontend. Matplotlib and seaborn are
+not imported.
+
+"""
+import io
+import json
+import numpy as np
+import pandas as pd
+from trendvisdata.chart_prep import Formatting
+from trendvisualizer.barometer import (
+    BarometerIndex, FlagTallies, SectorCube)
+
+
+class ChartData():
+    """
+    Select the same markets, prices and proportions as each chart in
+    Graphs and PieCharts, returning them as a dictionary of labels and
+    column-oriented tables.
+
+    Every chart dictionary has the keys:
+        chart_type : Str
+            The type of chart.
+        chart_title : Str
+            The title shown on the chart.
+        tables : Dict
+            Dictionary of tables, each a dictionary mapping column name to
+            a list of values. Dates are 'YYYY-MM-DD' strings and missing
+            values are None.
+    along with the labels of the chart type.
+
+    """
+    chart_types = ('bar', 'returns', 'market', 'summary', 'pie_summary',
+                   'pie_breakdown')
+
+    # Ordering, whether to take its last rows and title of each bar chart
+    # trend, as in Graphs.trend_barchart
+    bar_trends = {
+        'up': ('up', True, 'Up'),
+        'down': ('down', True, 'Down'),
+        'neutral': ('absolute', False, 'Neutral'),
+        'strong': ('absolute', True, 'Strongly'),
+        }
+
+    @classmethod
+    def chart_dict(
+        cls,
+        chart_type: str,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Data for the selected chart type.
+
+        Parameters
+        ----------
+        chart_type : Str
+            The type of chart. Choose from 'bar', 'returns', 'market',
+            'summary', 'pie_summary', 'pie_breakdown'.
+        params : Dict
+            Dictionary of key parameters, as for the chart. It is not
+            changed.
+        tables : Dict
+            Dictionary of key tables, including the barometer. It is not
+            changed.
+
+        Returns
+        -------
+        Dict
+            The chart dictionary.
+
+        """
+        if chart_type not in cls.chart_types:
+            raise ValueError(
+                "Please select a valid chart type from "
+                + ", ".join(cls.chart_types))
+
+        return getattr(cls, chart_type)(params=dict(params), tables=tables)
+
+
+    @classmethod
+    def bar(
+        cls,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Most or least trending markets, as Graphs.trend_barchart.
+
+        Parameters
+        ----------
+        params : Dict
+            mkts : Int
+                Number of markets to chart.
+            trend : Str
+                'up', 'down', 'neutral' or 'strong'.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        Dict
+            Chart dictionary with the xaxis_label and a 'bars' table of
+            ticker, short_name, trend_strength and trend_color, in the
+            order of the bars.
+
+        """
+        if params['trend'] not in cls.bar_trends:
+            raise ValueError(
+                "Please select a valid trend from "
+                + ", ".join(cls.bar_trends))
+
+        barometer = tables['barometer']
+        rank_index = BarometerIndex.for_barometer(
+            barometer, tables.get('rank_index'))
+        ordering, last, titlestr = cls.bar_trends[params['trend']]
+        rows = rank_index.select(barometer, ordering, params['mkts'], last)
+
+        return {
+            'chart_type': 'bar',
+            'chart_title': (titlestr + ' Trending Markets' + ' - '
+                            + params['end_date']),
+            'xaxis_label': 'Trend Strength',
+            'tables': {
+                'bars': {
+                    'ticker': cls._column(rows['Ticker']),
+                    'short_name': cls._column(rows['Short_name']),
+                    'trend_strength': cls._column(rows['Trend Strength %']),
+                    'trend_color': cls._column(rows['Trend Color']),
+                    },
+                },
+            }
+
+
+    @classmethod
+    def returns(
+        cls,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Normalized price history of the selected markets, as
+        Graphs.returns_graph.
+
+        Parameters
+        ----------
+        params : Dict
+            mkts : Int
+                Number of markets to chart.
+            trend : Str
+                Flag to select most or least trending markets.
+            days : Int
+                Number of days of history.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        Dict
+            Chart dictionary with the xlabel, ylabel, line labels and a
+            'returns' table of date, label and value, one row per date
+            and line.
+
+        """
+        # Normalize the selected tickers as the line graph does
+        if 'panel' in tables:
+            tenor = tables['panel'].normalized(
+                tickers=Formatting.create_data_list(
+                    params=params, barometer=tables['barometer'],
+                    market_chart=False, num_charts=None),
+                days=params['days'],
+                names=params['ticker_short_name_dict'])
+
+        else:
+            tenor = Formatting.create_normalized_data(
+                params=params, tables=tables, flag='Unfiltered')
+
+        labels = list(tenor.columns)
+        num_dates = len(tenor)
+
+        return {
+            'chart_type': 'returns',
+            'chart_title': ('Relative Return Over Last ' + str(num_dates)
+                            + ' Trading Days' + ' - ' + params['end_date']),
+            'xlabel': 'Date',
+            'ylabel': 'Return %',
+            'labels': labels,
+            'tables': {
+                'returns': {
+                    'date': cls._column(
+                        np.repeat(tenor.index.to_numpy(), len(labels))),
+                    'label': labels * num_dates,
+                    'value': cls._column(tenor.to_numpy().ravel()),
+                    },
+                },
+            }
+
+
+    @classmethod
+    def market(
+        cls,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Closing prices of each market in the grid, as Graphs.market_chart.
+
+        Parameters
+        ----------
+        params : Dict
+            days : Int
+                Number of days of history.
+            trend : Str
+                Flag to select most or least trending markets.
+            norm : Bool
+                Whether to normalize values to start from 100.
+            chart_dimensions : Tuple
+                Number of tickers to chart expressed as a Tuple, n * m.
+            chart_mkts : Int
+                Number of markets, which sets chart_dimensions if supplied.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        Dict
+            Chart dictionary with the chart_dimensions, the tickers and
+            labels in grid order and a 'prices' table of ticker, label,
+            date and close.
+
+        """
+        if params['chart_mkts'] is not None:
+            params = Formatting.create_mkt_dims(params)
+
+        params['num_charts'] = int(
+            params['chart_dimensions'][0] * params['chart_dimensions'][1])
+
+        data_list = Formatting.create_data_list(
+            params=params, barometer=tables['barometer'], market_chart=True,
+            num_charts=params['num_charts'])
+
+        columns = {'ticker': [], 'label': [], 'date': [], 'close': []}
+        for ticker in data_list:
+            closes = tables['ticker_dict'][ticker]['Close'][-params['days']:]
+            if params['norm']:
+                closes = closes / closes.iloc[0] * 100
+            label = params['ticker_short_name_dict'][ticker]
+
+            columns['ticker'].extend([ticker] * len(closes))
+            columns['label'].extend([label] * len(closes))
+            columns['date'].extend(cls._column(closes.index))
+            columns['close'].extend(cls._column(closes))
+
+        return {
+            'chart_type': 'market',
+            'chart_title': Formatting.get_chart_title(params=params),
+            'chart_dimensions': list(params['chart_dimensions']),
+            'tickers': list(data_list),
+            'labels': [params['ticker_short_name_dict'][ticker]
+                       for ticker in data_list],
+            'tables': {'prices': columns},
+            }
+
+
+    @classmethod
+    def summary(
+        cls,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Trend strength of each market by sector, as Graphs.summary_plot.
+
+        Parameters
+        ----------
+        params : Dict
+            sector_level : Int
+                The level of granularity of the assets.
+            absolute : Bool
+                Whether to show absolute trend strength (from 0 - 100%) or
+                show positive and negative trends seperately.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        Dict
+            Chart dictionary with the trend_type, sector_name, sector_list
+            and axis_range, and a 'points' table of ticker, short_name,
+            sector and value.
+
+        """
+        # Configure the summary on a copy of the barometer, as
+        # summary_config may drop rows in place
+        params, chart_barometer = Formatting.summary_config(
+            params=params, barometer=tables['barometer'].copy(deep=False))
+
+        return {
+            'chart_type': 'summary',
+            'chart_title': ('Trend Strength by Sector' + ' - '
+                            + params['end_date']),
+            'trend_type': params['trend_type'],
+            'sector_name': params['sector_name'],
+            'sector_list': cls._column(params['sector_list']),
+            'axis_range': list(params['axis_range']),
+            'tables': {
+                'points': {
+                    'ticker': cls._column(chart_barometer['Ticker']),
+                    'short_name': cls._column(
+                        chart_barometer['Short_name']),
+                    'sector': cls._column(
+                        chart_barometer[params['sector_name']]),
+                    'value': cls._column(
+                        chart_barometer[params['trend_type']]),
+                    },
+                },
+            }
+
+
+    @classmethod
+    def pie_summary(
+        cls,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Proportions of long, short and neutral flags for each tenor of an
+        indicator, as PieCharts.pie_summary.
+
+        Parameters
+        ----------
+        params : Dict
+            indicator_type : Str
+                The indicator. Choose from 'adx', 'ma_cross',
+                'price_cross', 'rsi', 'breakout'.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        Dict
+            Chart dictionary with a 'pies' table of title, indicator, long,
+            short and neutral, one row per tenor.
+
+        """
+        tallies = FlagTallies.for_barometer(
+            tables['barometer'], tables.get('flag_tallies'))
+        reference, name = params['indicator_name_dict'][
+            params['indicator_type']]
+
+        columns = {'title': [], 'indicator': [], 'long': [], 'short': [],
+                   'neutral': []}
+        for tenor in params[params['indicator_type']+'_list']:
+            indicator = cls._indicator(reference, tenor)
+            long, short, neutral = tallies.direction(indicator)
+            columns['title'].append(
+                str(tenor) + ' day ' + reference.upper())
+            columns['indicator'].append(indicator)
+            columns['long'].append(float(long))
+            columns['short'].append(float(short))
+            columns['neutral'].append(float(neutral))
+
+        return {
+            'chart_type': 'pie_summary',
+            'chart_title': ('Trend direction of ' + name + ' indicators'
+                            + ' - ' + params['end_date']),
+            'tables': {'pies': columns},
+            }
+
+
+    @classmethod
+    def pie_breakdown(
+        cls,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Proportions of long, short and neutral flags for an indicator and
+        tenor and their split by sector, as PieCharts.pie_breakdown.
+
+        Parameters
+        ----------
+        params : Dict
+            indicator_type : Str
+                The indicator. Choose from 'adx', 'ma_cross',
+                'price_cross', 'rsi', 'breakout'.
+            pie_tenor : Int / Tuple
+                The time period of the indicator.
+            sector_level : Int
+                The level of granularity of the assets.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        Dict
+            Chart dictionary with the indicator, sector_name and the long,
+            short and neutral proportions, and a 'sectors' table of sector
+            and the count and proportion of each direction.
+
+        """
+        barometer = tables['barometer']
+        reference, name = params['indicator_name_dict'][
+            params['indicator_type']]
+        indicator = cls._indicator(reference, params['pie_tenor'])
+        tallies = FlagTallies.for_barometer(
+            barometer, tables.get('flag_tallies'))
+        long, short, neutral = tallies.direction(indicator)
+
+        # Look up the count of each direction in each sector and the share
+        # of each direction's markets that are in the sector
+        cube = SectorCube.for_barometer(
+            barometer=barometer,
+            sector_names=SectorCube.sector_names(params),
+            cube=tables.get('sector_cube'))
+        counts = cube.counts(params['sector_level'], indicator)
+        sector_name = cube.sector_names[params['sector_level']-1]
+        totals = counts.sum().replace(0, 1)
+
+        sectors = {'sector': cls._column(counts.index)}
+        for direction in counts.columns:
+            sectors[direction] = cls._column(counts[direction])
+        for direction in counts.columns:
+            sectors[direction+'_proportion'] = cls._column(
+                counts[direction] / totals[direction])
+
+        return {
+            'chart_type': 'pie_breakdown',
+            'chart_title': ('Trend direction of ' + str(params['pie_tenor'])
+                            + ' day ' + name + ' - ' + params['end_date']),
+            'indicator': indicator,
+            'sector_name': sector_name,
+            'long': float(long),
+            'short': float(short),
+            'neutral': float(neutral),
+            'tables': {'sectors': sectors},
+            }
+
+
+    @staticmethod
+    def to_json(chart: dict) -> str:
+        """
+        Serialize a chart dictionary as JSON.
+
+        Parameters
+        ----------
+        chart : Dict
+            The chart dictionary.
+
+        Returns
+        -------
+        Str
+            The JSON text.
+
+        """
+        return json.dumps(chart, allow_nan=False)
+
+
+    @staticmethod
+    def to_arrow(chart: dict) -> dict:
+        """
+        Serialize each table of a chart dictionary in the Arrow IPC stream
+        format, with the other keys stored as JSON in the schema metadata
+        under 'chart'. Requires pyarrow.
+
+        Parameters
+        ----------
+        chart : Dict
+            The chart dictionary.
+
+        Returns
+        -------
+        Dict
+            Dictionary mapping each table name to the Arrow stream bytes.
+
+        """
+        try:
+            import pyarrow as pa # pylint: disable=import-outside-toplevel
+        except ImportError as err:
+            raise ImportError(
+                "Arrow output requires pyarrow, eg "
+                "pip install trendvisualizer[store]") from err
+
+        metadata = {'chart': json.dumps(
+            {key: value for key, value in chart.items() if key != 'tables'})}
+
+        streams = {}
+        for name, columns in chart['tables'].items():
+            table = pa.table(columns).replace_schema_metadata(metadata)
+            sink = io.BytesIO()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            streams[name] = sink.getvalue()
+
+        return streams
+
+
+    @staticmethod
+    def _indicator(
+        reference: str,
+        tenor: int | tuple | list) -> str:
+
+        # The moving average crossover is named from a tuple of 2 tenors
+        if isinstance(tenor, (tuple, list)):
+            return reference + '_' + str(tenor[0]) + '_' + str(tenor[1])
+
+        return reference + '_' + str(tenor)
+
+
+    @staticmethod
+    def _column(values) -> list:
+
+        # Convert to Python values, with dates as strings and missing
+        # values as None
+        series = pd.Series(values)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return [None if pd.isna(value) else value.strftime('%Y-%m-%d')
+                    for value in series]
+
+        return series.astype(object).where(series.notna(), None).tolist()
@@ -3,15 +3,18 @@ Display various charts of Trend Strength
 
 """
 import warnings
+import matplotlib
 import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
-from matplotlib import axes, cm
+from matplotlib import axes
 from matplotlib.dates import MO, WeekdayLocator, MonthLocator
 from matplotlib.ticker import MaxNLocator, AutoMinorLocator, PercentFormatter
 from trendvisdata.chart_prep import Formatting
+from trendvisualizer.barometer import BarometerIndex
+from trendvisualizer.figures import ChartFigure, ChartStyle
+from trendvisualizer.templates import MarketChartTemplate
 
 
 class Graphs():
@@ -24,7 +27,8 @@ class Graphs():
     def trend_barchart(
         cls,
         params: dict,
-        barometer: pd.DataFrame) -> dict | None:
+        barometer: pd.DataFrame,
+        rank_index: BarometerIndex | None = None) -> dict | None:
         """
         Create a barchart of the most or least trending markets.
 
@@ -43,19 +47,44 @@ class Graphs():
                 and down-trending markets.
         barometer : DataFrame
             DataFrame showing trend strength for each ticker.
+        rank_index : BarometerIndex, optional
+            Precomputed rank orderings of the barometer. The default is None
+            which builds them, as does an index which no longer matches the
+            rows of the barometer.
 
         Returns
         -------
         Returns barchart of trend strength for selected markets / trend type.
 
         """
+        # Use the rank orderings to select the top markets without sorting
+        rank_index = BarometerIndex.for_barometer(barometer, rank_index)
+
+        data_dict = cls._draw_barchart(
+            params=params, barometer=barometer, rank_index=rank_index)
+
+        if data_dict is not None:
+            return data_dict
+
+        ChartFigure.show(params)
+
+        return None
+
+
+    @classmethod
+    def _draw_barchart(
+        cls,
+        params: dict,
+        barometer: pd.DataFrame,
+        rank_index: BarometerIndex) -> dict | None:
 
         # Initialize the figure
-        plt.style.use('seaborn-v0_8-darkgrid')
-        plt.rcParams.update(params['mpl_bar_params'])
         num_markets = min(params['mkts'], 20)
-        _, ax1 = plt.subplots(figsize=(6,int(num_markets/3)))
-        plt.tight_layout()
+        fig = ChartFigure.new(
+            params, ChartStyle(params['mpl_bar_params']),
+            figsize=(6,int(num_markets/3)))
+        ax1 = fig.subplots()
+        fig.tight_layout()
 
         # Set the xticks to be integer values
         ax1.xaxis.set_major_locator(MaxNLocator(6))#integer=True))
@@ -71,7 +100,7 @@ class Graphs():
         ax1.tick_params(axis='both', which='both', labelsize=font_scaler)
 
         # Set the yticks to be horizontal
-        plt.yticks(rotation=0)
+        ax1.tick_params(axis='y', labelrotation=0)
 
         trend_dict = {}
         # If the trend flag is set to 'up', show the markets with
@@ -81,6 +110,7 @@ class Graphs():
                 ax1=ax1, 
                 params=params, 
                 barometer=barometer,
+                rank_index=rank_index,
                 trend_dict=trend_dict)
 
         # If the trend flag is set to 'down', show the markets with
@@ -90,6 +120,7 @@ class Graphs():
                 ax1=ax1, 
                 params=params, 
                 barometer=barometer,
+                rank_index=rank_index,
                 trend_dict=trend_dict)
 
         # If the trend flag is set to 'neutral', show the markets with
@@ -99,6 +130,7 @@ class Graphs():
                 ax1=ax1, 
                 params=params, 
                 barometer=barometer,
+                rank_index=rank_index,
                 trend_dict=trend_dict)
 
         # If the trend flag is set to 'strong', show the markets with
@@ -108,6 +140,7 @@ class Graphs():
                 ax1=ax1, 
                 params=params, 
                 barometer=barometer,
+                rank_index=rank_index,
                 trend_dict=trend_dict)
 
         trend_dict['xaxis_label'] = "Trend Strength"
@@ -128,17 +161,19 @@ class Graphs():
             return data_dict
 
         # Label xaxis
-        plt.xlabel(trend_dict['xaxis_label'], fontsize=font_scaler*1.2, labelpad=10)
+        ax1.set_xlabel(trend_dict['xaxis_label'], fontsize=font_scaler*1.2, labelpad=10)
 
         # Set title
-        plt.suptitle(trend_dict['chart_title'],
+        fig.suptitle(trend_dict['chart_title'],
                      fontsize=18,
                      fontweight=0,
                      color='black',
                      style='italic',
                      y=1.04)
 
-        plt.show()
+        ChartFigure.finish(params, fig)
+
+        return None
 
 
     @staticmethod
@@ -146,20 +181,22 @@ class Graphs():
         ax1: axes.Axes,
         params: dict,
         barometer: pd.DataFrame,
+        rank_index: BarometerIndex,
         trend_dict: dict) -> tuple[axes.Axes, dict]:
 
         # Set the x-axis range
         ax1.set_xlim(left=0, right=1)
 
-        # Sort by Trend Strength
-        barometer = barometer.sort_values(
-            by=['Trend Strength %'], ascending=True)
+        # Select the most trending rows using the precomputed ordering by
+        # Trend Strength
+        barometer = rank_index.select(
+            barometer, 'up', params['mkts'])
 
-        short_name = barometer['Short_name'].iloc[-params['mkts']:]
-        trend_strength = barometer['Trend Strength %'].iloc[-params['mkts']:]
-        trend_color = list(barometer['Trend Color'].iloc[-params['mkts']:])
+        short_name = barometer['Short_name']
+        trend_strength = barometer['Trend Strength %']
+        trend_color = list(barometer['Trend Color'])
 
-        plt.barh(short_name,
+        ax1.barh(short_name,
                  trend_strength,
                  color=trend_color)
         titlestr = 'Up'
@@ -179,20 +216,22 @@ class Graphs():
         ax1: axes.Axes,
         params: dict,
         barometer: pd.DataFrame,
+        rank_index: BarometerIndex,
         trend_dict: dict) -> tuple[axes.Axes, dict]:
 
         # Set the x-axis range
         ax1.set_xlim(left=-1, right=0)
 
-        # Sort by Trend Strength
-        barometer = barometer.sort_values(
-            by=['Trend Strength %'], ascending=False)
+        # Select the most trending rows using the precomputed ordering by
+        # Trend Strength
+        barometer = rank_index.select(
+            barometer, 'down', params['mkts'])
 
-        short_name = barometer['Short_name'].iloc[-params['mkts']:]
-        trend_strength = barometer['Trend Strength %'].iloc[-params['mkts']:]
-        trend_color = list(barometer['Trend Color'].iloc[-params['mkts']:])
+        short_name = barometer['Short_name']
+        trend_strength = barometer['Trend Strength %']
+        trend_color = list(barometer['Trend Color'])
 
-        plt.barh(short_name,
+        ax1.barh(short_name,
                  trend_strength,
                  color=trend_color)
         titlestr = 'Down'
@@ -212,20 +251,22 @@ class Graphs():
         ax1: axes.Axes,
         params: dict,
         barometer: pd.DataFrame,
+        rank_index: BarometerIndex,
         trend_dict: dict) -> tuple[axes.Axes, dict]:
 
         # Set the x-axis range
         ax1.set_xlim(left=-1, right=1)
 
-        # Sort by Absolute Trend Strength
-        barometer = barometer.sort_values(
-            by=['Absolute Trend Strength %'], ascending=True)
+        # Select the least trending rows using the precomputed ordering by
+        # Absolute Trend Strength
+        barometer = rank_index.select(
+            barometer, 'absolute', params['mkts'], last=False)
 
-        short_name = barometer['Short_name'].iloc[:params['mkts']]
-        trend_strength = barometer['Trend Strength %'].iloc[:params['mkts']]
-        trend_color = list(barometer['Trend Color'].iloc[:params['mkts']])
+        short_name = barometer['Short_name']
+        trend_strength = barometer['Trend Strength %']
+        trend_color = list(barometer['Trend Color'])
 
-        plt.barh(short_name,
+        ax1.barh(short_name,
                  trend_strength,
                  color=trend_color)
         titlestr = 'Neutral'
@@ -245,20 +286,22 @@ class Graphs():
         ax1: axes.Axes,
         params: dict,
         barometer: pd.DataFrame,
+        rank_index: BarometerIndex,
         trend_dict: dict) -> tuple[axes.Axes, dict]:
 
         # Set the x-axis range
         ax1.set_xlim(left=-1, right=1)
 
-        # Sort by Absolute Trend Strength
-        barometer = barometer.sort_values(
-            by=['Absolute Trend Strength %'], ascending=True)
+        # Select the most trending rows using the precomputed ordering by
+        # Absolute Trend Strength
+        barometer = rank_index.select(
+            barometer, 'absolute', params['mkts'])
 
-        short_name = barometer['Short_name'].iloc[-params['mkts']:]
-        trend_strength = barometer['Trend Strength %'].iloc[-params['mkts']:]
-        trend_color = list(barometer['Trend Color'].iloc[-params['mkts']:])
+        short_name = barometer['Short_name']
+        trend_strength = barometer['Trend Strength %']
+        trend_color = list(barometer['Trend Color'])
 
-        plt.barh(short_name,
+        ax1.barh(short_name,
                  trend_strength,
                  color=trend_color)
         titlestr = 'Strongly'
@@ -306,20 +349,41 @@ class Graphs():
 
         """
 
-        tenor = Formatting.create_normalized_data(
-            params=params, 
-            tables=tables,
-            flag='Unfiltered'
-            )
+        # Normalize all the selected tickers at once if the prices are held
+        # in a panel
+        if 'panel' in tables:
+            tenor = tables['panel'].normalized(
+                tickers=Formatting.create_data_list(
+                    params=params, barometer=tables['barometer'],
+                    market_chart=False, num_charts=None),
+                days=params['days'],
+                names=params['ticker_short_name_dict'])
+
+        else:
+            tenor = Formatting.create_normalized_data(
+                params=params, 
+                tables=tables,
+                flag='Unfiltered'
+                )
+
+        cls._draw_returns(params=params, tenor=tenor)
+
+        ChartFigure.show(params)
+
+
+    @classmethod
+    def _draw_returns(
+        cls,
+        params: dict,
+        tenor: pd.DataFrame) -> None:
 
         # Initialize the figure
-        plt.style.use('seaborn-v0_8-darkgrid')
-        plt.rcParams.update(params['mpl_line_params'])
-        plt.tight_layout()
-        _, ax1 = plt.subplots(figsize=(16,8))
+        style = ChartStyle(params['mpl_line_params'])
+        fig = ChartFigure.new(params, style, figsize=(16,8))
+        ax1 = fig.subplots()
 
         # Plot the lineplot
-        ax1.plot(tenor)
+        ax1.plot(tenor, linewidth=style.get('lines.linewidth'))
 
         # axis formatting
         ax1 = cls._returns_ticks(ax1, tenor)
@@ -341,7 +405,8 @@ class Graphs():
         # Set the legend
         upper_anchor = 1.15 + params['mkts']/250
         #plt.legend(loc='upper left', labels=tenor.columns)
-        plt.legend(
+        style.legend(
+            ax1,
             bbox_to_anchor=(0.5, upper_anchor), #1.21), #-0.4,1), #1.05, 1),
             #title_fontsize=15,
             #fontsize=10,
@@ -359,12 +424,12 @@ class Graphs():
 
         # Set xtick labels at 0 degrees and fontsize of x and y ticks
         # to 15
-        plt.xticks(rotation=0, fontsize=15)
-        plt.yticks(fontsize=15)
+        ax1.tick_params(axis='x', labelrotation=0, labelsize=15)
+        ax1.tick_params(axis='y', labelsize=15)
 
         # Set title
         dynamic_y = 1.05 + params['mkts']/500
-        plt.suptitle('Relative Return Over Last '
+        fig.suptitle('Relative Return Over Last '
                      +str(len(tenor))+' Trading Days'+' - '+params['end_date'],
                      fontsize=25,
                      fontweight=0,
@@ -372,7 +437,7 @@ class Graphs():
                      style='italic',
                      y=dynamic_y) #1.08) #0.98)
 
-        plt.show()
+        ChartFigure.finish(params, fig)
 
 
     @staticmethod
@@ -438,7 +503,8 @@ class Graphs():
     def market_chart(
         cls,
         params: dict,
-        tables: dict) -> dict:
+        tables: dict,
+        templates: dict | None = None) -> dict:
         """
         Create a chart showing the top and bottom 20 trending markets.
 
@@ -463,6 +529,11 @@ class Graphs():
                 The default is (8, 5).
         tables : Dict
             Dictionary of key tables.
+        templates : Dict, optional
+            Dictionary of MarketChartTemplate objects keyed by
+            chart_dimensions and days. If supplied, a matching template is
+            updated with the new data, or created and stored if there is
+            none. The default is None which draws a new figure.
 
         Returns
         -------
@@ -478,20 +549,43 @@ class Graphs():
         params['num_charts'] = int(
             params['chart_dimensions'][0] * params['chart_dimensions'][1])
 
+        # Reuse the figure and artists of a template if one is supplied.
+        # Templates are pyplot figures which are updated in place, so they
+        # are not used for standalone figures.
+        if templates is not None and params.get('pyplot', True):
+            key = (tuple(params['chart_dimensions']), params['days'])
+            if key not in templates or not templates[key].matches(params):
+                templates[key] = MarketChartTemplate(params)
+
+            return templates[key].update(params=params, tables=tables)
+
         data_list = Formatting.create_data_list(
             params=params, barometer=tables['barometer'], market_chart=True,
             num_charts=params['num_charts'])
 
-        # Set style
-        plt.style.use('seaborn-v0_8-darkgrid')
-        plt.rcParams.update(params['mpl_chart_params'])
+        params = cls._draw_market_chart(
+            params=params, tables=tables, data_list=data_list)
+
+        return params
+
+
+    @classmethod
+    def _draw_market_chart(
+        cls,
+        params: dict,
+        tables: dict,
+        data_list: list) -> dict:
 
         # create a color palette
-        palette = cm.get_cmap('tab20')
+        palette = matplotlib.colormaps['tab20']
 
         # Initialize the figure
-        fig, ax1 = plt.subplots(figsize=(int(params['chart_dimensions'][1]*3),
-                                        int(params['chart_dimensions'][0]*2)))
+        style = ChartStyle(params['mpl_chart_params'])
+        fig = ChartFigure.new(
+            params, style,
+            figsize=(int(params['chart_dimensions'][1]*3),
+                     int(params['chart_dimensions'][0]*2)))
+        ax1 = fig.subplots()
         fig.subplots_adjust(top=0.85)
         fig.tight_layout()
 
@@ -507,7 +601,7 @@ class Graphs():
             label = params['ticker_short_name_dict'][ticker]
 
             # Find the right spot on the plot
-            ax1 = plt.subplot(
+            ax1 = fig.add_subplot(
                 params['chart_dimensions'][0],
                 params['chart_dimensions'][1],
                 num)
@@ -539,20 +633,21 @@ class Graphs():
             # xticks only on bottom graphs
             if num in range(
                     params['num_charts'] - params['chart_dimensions'][1] + 1):
-                plt.tick_params(labelbottom=False)
+                ax1.tick_params(labelbottom=False)
 
             # Add title
-            plt.title(label,
-                      loc='left',
-                      fontsize=10,
-                      fontweight=0,
-                      color='black' )
+            style.title(ax1,
+                        label,
+                        loc='left',
+                        fontsize=10,
+                        fontweight=0,
+                        color='black' )
 
             # axis formatting
             ax1 = cls._set_market_ticks(ax1, params)
 
             # Set xtick labels at 70 degrees
-            plt.xticks(rotation=70)
+            ax1.tick_params(axis='x', labelrotation=70)
 
         # Create chart title label
         params['chart_title'] = Formatting.get_chart_title(params=params)
@@ -565,7 +660,7 @@ class Graphs():
                      style='italic',
                      y=1.05)
 
-        return params
+        return ChartFigure.finish(params, fig)
 
 
     @staticmethod
@@ -666,35 +761,41 @@ class Graphs():
         Seaborn Swarmplot  / Stripplot of the data.
 
         """
-        # Suppress userwarning warnings caused by overlapping data
-        warnings.filterwarnings("ignore", category=UserWarning)
-
         # Configure sector name, marker size, trend type and drop rows from
-        # barometer DataFrame as appropriate
-        params, tables['chart_barometer'] = Formatting.summary_config(
-                params=params, barometer=tables['barometer'])
-
-        # sns.set_style("darkgrid", {"axes.edgecolor": "black"})
-        plt.style.use('seaborn-v0_8-darkgrid')
-        plt.rcParams.update(params['mpl_summary_params'])
+        # a copy of the barometer DataFrame as appropriate, adding it to a
+        # copy of the tables so that neither is changed by the chart
+        params, chart_barometer = Formatting.summary_config(
+                params=params, barometer=tables['barometer'].copy(deep=False))
+        tables = dict(tables, chart_barometer=chart_barometer)
 
         if params['compact']:
             params['plot_height'] = params['plot_height'] / 4
 
-        # Create Seaborn swarm plot
-        if params['summary_type'] == 'swarm':
-            _, ax1 = plt.subplots(figsize=(8, params['plot_height']))
+        style = ChartStyle(params['mpl_summary_params'])
+
+        # Suppress userwarning warnings caused by overlapping data
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=UserWarning)
 
-            ax1 = cls._create_swarm(ax1=ax1, params=params, tables=tables)
+            # Create Seaborn swarm plot
+            if params['summary_type'] == 'swarm':
+                fig = ChartFigure.new(
+                    params, style, figsize=(8, params['plot_height']))
+                ax1 = fig.subplots()
 
-        # Create Seaborn strip plot
-        if params['summary_type'] == 'strip':
-            _, ax1 = plt.subplots(figsize=(8, params['plot_height']))
+                ax1 = cls._create_swarm(
+                    ax1=ax1, params=params, tables=tables, style=style)
+                ChartFigure.finish(params, fig)
 
-            ax1 = cls._create_strip(ax1=ax1, params=params, tables=tables)
+            # Create Seaborn strip plot
+            if params['summary_type'] == 'strip':
+                fig = ChartFigure.new(
+                    params, style, figsize=(8, params['plot_height']))
+                ax1 = fig.subplots()
 
-        # Return warnings to default setting
-        warnings.filterwarnings("default", category=UserWarning)
+                ax1 = cls._create_strip(
+                    ax1=ax1, params=params, tables=tables, style=style)
+                ChartFigure.finish(params, fig)
 
         return params, tables
 
@@ -703,9 +804,11 @@ class Graphs():
     def _create_swarm(
         ax1: axes.Axes,
         params: dict,
-        tables: dict) -> axes.Axes:
+        tables: dict,
+        style: ChartStyle) -> axes.Axes:
 
         ax1 = sns.swarmplot(
+            ax=ax1,
             data=tables['chart_barometer'],
             x=params['trend_type'],
             y="Trend",
@@ -722,17 +825,19 @@ class Graphs():
         ax1.xaxis.set_major_formatter(PercentFormatter(1))
         ax1.set_xlim(params['axis_range'])
         ax1.tick_params(axis='both', which='major', labelsize=12)
-        ax1.set_title('Trend Strength by Sector'
-                      +' - '
-                      +params['end_date'],
-                      fontsize=18, y=1)
-        ax1.legend(bbox_to_anchor= (1.1, 1),
-                  title_fontsize=10,
-                  fontsize=8,
-                  title='Sector',
-                  shadow=True,
-                  frameon=True,
-                  facecolor='white')
+        style.title(ax1,
+                    'Trend Strength by Sector'
+                    +' - '
+                    +params['end_date'],
+                    fontsize=18, y=1)
+        style.legend(ax1,
+                     bbox_to_anchor= (1.1, 1),
+                     title_fontsize=10,
+                     fontsize=8,
+                     title='Sector',
+                     shadow=True,
+                     frameon=True,
+                     facecolor='white')
 
         return ax1
 
@@ -741,10 +846,12 @@ class Graphs():
     def _create_strip(
         ax1: axes.Axes,
         params: dict,
-        tables: dict) -> axes.Axes:
+        tables: dict,
+        style: ChartStyle) -> axes.Axes:
 
         if params['violin']:
-            ax1 = sns.violinplot(x=params['trend_type'],
+            ax1 = sns.violinplot(ax=ax1,
+                                x=params['trend_type'],
                                 y=params['sector_name'],
                                 data=tables['chart_barometer'],
                                 inner='quartile',
@@ -753,7 +860,8 @@ class Graphs():
                                 palette="coolwarm",
                                 hue=params['sector_name'],
                                 scale='count')
-        ax1 = sns.stripplot(x=params['trend_type'],
+        ax1 = sns.stripplot(ax=ax1,
+                           x=params['trend_type'],
                            y=params['sector_name'],
                            data=tables['chart_barometer'],
                            dodge=True,
@@ -765,10 +873,11 @@ class Graphs():
                            hue=params['sector_name'],
                            s=params['marker_size'])
 
-        ax1.set_title('Trend Strength by Sector'
-                      +' - '
-                      +params['end_date'],
-                      fontsize=18, y=1)
+        style.title(ax1,
+                    'Trend Strength by Sector'
+                    +' - '
+                    +params['end_date'],
+                    fontsize=18, y=1)
         ax1.xaxis.set_major_formatter(PercentFormatter(1))
         ax1.set_xlim(params['axis_range'])
         ax1.tick_params(axis='both', which='major', labelsize=12)
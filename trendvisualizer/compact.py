@@ -0,0 +1,292 @@
+"""
+Compact storage of the per ticker and Trend Strength tables, and a report of
+the memory held by each table
+
+"""
+import sys
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from trendvisualizer.panel import PricePanel, PanelDict
+
+# Prices are kept at full precision, as the incremental update continues the
+# indicator calculations from them
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+# Barometer columns with few distinct values, stored as categoricals along
+# with the commodity and equity sector levels
+CATEGORY_COLUMNS = ['Short_name', 'Trend', 'Trend Color']
+
+# Barometer columns kept as int64 even when summed from int8 flags, as the
+# charts sort on them and NumPy breaks ties differently for each integer size
+INT64_COLUMNS = ['Trend Strength', 'Absolute Trend Strength']
+
+# Tables holding a barometer or a subset of its rows
+BAROMETER_TABLES = [
+    'barometer', 'futures_barometer', 'filtered_barometer',
+    'return_barometer']
+
+
+class CompactTables():
+    """
+    Store the indicator flags as int8, the other indicator fields as float32
+    and the sector columns of the barometer as categoricals. The flags only
+    take the values -1, 0 and 1 and float32 keeps about 7 significant
+    figures, ample for indicators used to rank and chart the markets.
+
+    """
+    @staticmethod
+    def ticker_frame(frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compact the indicator fields of a price history DataFrame.
+
+        Parameters
+        ----------
+        frame : DataFrame
+            Price history and indicator fields of one ticker.
+
+        Returns
+        -------
+        DataFrame
+            The frame with int8 flags and float32 indicator fields, or the
+            same frame if it is already compact.
+
+        """
+        dtypes = {}
+        for column, dtype in frame.dtypes.items():
+            if column.endswith('_flag'):
+                if dtype != np.int8:
+                    dtypes[column] = np.int8
+            elif (column not in PRICE_COLUMNS
+                  and dtype == np.float64):
+                dtypes[column] = np.float32
+
+        if not dtypes:
+            return frame
+
+        return frame.astype(dtypes)
+
+
+    @staticmethod
+    def category_columns(params: dict) -> list:
+        """
+        Barometer columns stored as categoricals.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+
+        Returns
+        -------
+        List
+            The sector levels of commodities and equities, the short name
+            and the trend columns.
+
+        """
+        return (params['commodity_sector_levels']
+                + params['equity_sector_levels']
+                + CATEGORY_COLUMNS)
+
+
+    @classmethod
+    def barometer(
+        cls,
+        barometer: pd.DataFrame,
+        params: dict) -> pd.DataFrame:
+        """
+        Compact the flags and sector columns of a Trend Strength table.
+
+        Parameters
+        ----------
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker.
+        params : Dict
+            Dictionary of key parameters.
+
+        Returns
+        -------
+        DataFrame
+            The table with int8 flags and categorical sector columns, or the
+            same table if it is already compact.
+
+        """
+        category_columns = cls.category_columns(params)
+        dtypes = {}
+        for column, dtype in barometer.dtypes.items():
+            if column.endswith('_flag'):
+                if dtype != np.int8:
+                    dtypes[column] = np.int8
+            elif (column in category_columns
+                  and not isinstance(dtype, pd.CategoricalDtype)):
+                dtypes[column] = 'category'
+            elif column in INT64_COLUMNS and dtype != np.int64:
+                dtypes[column] = np.int64
+
+        if not dtypes:
+            return barometer
+
+        return barometer.astype(dtypes)
+
+
+    @staticmethod
+    def panel(panel: PricePanel) -> PricePanel:
+        """
+        Compact the indicator fields of a price panel in place. Flags are
+        set to 0 where a ticker has no bar, as the frames of the panel only
+        take the rows where it does.
+
+        Parameters
+        ----------
+        panel : PricePanel
+            The panel of prices and indicator fields.
+
+        Returns
+        -------
+        panel : PricePanel
+            The same panel.
+
+        """
+        for field in panel.columns:
+            values = panel[field]
+            if field.endswith('_flag'):
+                if values.dtype != np.int8:
+                    panel[field] = np.nan_to_num(values).astype(np.int8)
+            elif field not in PRICE_COLUMNS and values.dtype == np.float64:
+                panel[field] = values.astype(np.float32)
+
+        return panel
+
+
+    @classmethod
+    def compact(cls, tables: dict, params: dict) -> dict:
+        """
+        Compact every per ticker DataFrame, panel and barometer in the
+        tables.
+
+        Parameters
+        ----------
+        tables : Dict
+            Dictionary of key tables.
+        params : Dict
+            Dictionary of key parameters.
+
+        Returns
+        -------
+        tables : Dict
+            Dictionary of key tables.
+
+        """
+        # The frames of a panel view are built from the panel as they are
+        # accessed, so compact the panel instead
+        if 'panel' in tables:
+            cls.panel(tables['panel'])
+
+        elif 'ticker_dict' in tables:
+            ticker_dict = tables['ticker_dict']
+            for ticker, frame in ticker_dict.items():
+                compact = cls.ticker_frame(frame)
+                if compact is frame:
+                    continue
+                ticker_dict[ticker] = compact
+
+                # Fields.generate_fields adds the fields to the price
+                # DataFrames, so raw_ticker_dict may hold the same frames
+                for name in ('raw_ticker_dict', 'futures_ticker_dict'):
+                    if tables.get(name, {}).get(ticker) is frame:
+                        tables[name][ticker] = compact
+
+        for name in BAROMETER_TABLES:
+            if name in tables:
+                tables[name] = cls.barometer(tables[name], params)
+
+        return tables
+
+
+    @classmethod
+    def memory_usage(cls, tables: dict) -> pd.DataFrame:
+        """
+        Memory held by each table, including the contents of strings.
+
+        Parameters
+        ----------
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        usage : DataFrame
+            Number of DataFrames and size in MB of each table, with a total
+            row which counts DataFrames shared between tables once.
+
+        """
+        seen = set()
+        rows = {}
+        for name, table in dict.items(tables):
+            frames, size = cls._size(table, set())
+            rows[name] = {'frames': frames, 'mb': size / 2**20}
+            cls._size(table, seen)
+
+        usage = pd.DataFrame.from_dict(
+            rows, orient='index', columns=['frames', 'mb'])
+        usage.loc['total'] = [
+            sum(1 for item in seen if item[1]),
+            sum(item[2] for item in seen) / 2**20]
+        usage['frames'] = usage['frames'].astype(np.int64)
+
+        return usage
+
+
+    @classmethod
+    def _size(cls, value, seen: set) -> tuple[int, int]:
+
+        # Record each object once, keyed by id, so shared frames are only
+        # counted once
+        if isinstance(value, pd.DataFrame):
+            size = int(value.memory_usage(deep=True).sum())
+            return cls._count(value, True, size, seen)
+
+        if isinstance(value, (pd.Series, pd.Index)):
+            size = int(value.memory_usage(deep=True))
+            return cls._count(value, False, size, seen)
+
+        if isinstance(value, np.ndarray):
+            return cls._count(value, False, value.nbytes, seen)
+
+        if isinstance(value, PanelDict):
+            value = value._frames # pylint: disable=protected-access
+
+        if isinstance(value, PricePanel):
+            value = {'fields': value.fields, 'mask': value.mask}
+
+        if isinstance(value, Mapping):
+            items = list(value.values())
+        elif isinstance(value, (list, tuple)):
+            items = list(value)
+        elif type(value).__module__.startswith('trendvisualizer'):
+            items = list(vars(value).values())
+        else:
+            return 0, sys.getsizeof(value)
+
+        frames = size = 0
+        for item in items:
+            item_frames, item_size = cls._size(item, seen)
+            frames += item_frames
+            size += item_size
+
+        return frames, size
+
+
+    @staticmethod
+    def _count(
+        value,
+        is_frame: bool,
+        size: int,
+        seen: set) -> tuple[int, int]:
+
+        key = (id(value), is_frame, size)
+        if key in seen:
+            return 0, 0
+        seen.add(key)
+
+        return int(is_frame), size
@@ -0,0 +1,200 @@
+"""
+Download price histories for many tickers concurrently
+
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+import pandas as pd
+
+
+class ConcurrentFetch():
+    """
+    Fetch price histories with a bounded pool of threads, retrying failed
+    requests with exponential backoff and recording the time taken and the
+    outcome for each ticker
+
+    """
+    @classmethod
+    def import_yahoo(
+        cls,
+        params: dict,
+        tables: dict,
+        fetch: Callable[[str], pd.DataFrame] | None = None
+        ) -> tuple[dict, dict]:
+        """
+        Return dictionary of price histories from Yahoo Finance, downloading
+        the tickers concurrently.
+
+        Parameters
+        ----------
+        params : Dict
+            max_workers : Int
+                Maximum number of concurrent downloads.
+            max_retries : Int
+                Number of times a failed download is retried.
+            retry_backoff : Float
+                Seconds to wait before the first retry, doubling with each
+                further retry.
+        tables : Dict
+            Dictionary of key tables.
+        fetch : Callable, optional
+            Function taking a ticker symbol and returning a DataFrame of
+            prices, as in download. The default is None which downloads
+            from Yahoo Finance.
+
+        Returns
+        -------
+        params : Dict
+            exceptions : List
+                List of tickers that could not be returned.
+            download_report : Dict
+                Dictionary of timing and outcome for each ticker.
+        tables : Dict
+            raw_ticker_dict : Dict
+                Dictionary of price history DataFrames, one for each
+                ticker.
+
+        """
+        from trendvisdata.market_data import YahooExtract, MktUtils # pylint: disable=import-outside-toplevel
+
+        if fetch is None:
+
+            # Fix the window in the copy used by the download threads so
+            # they only read from it
+            fetch_params = dict(params)
+            fetch_params['window'] = 0
+
+            def fetch(symbol: str) -> pd.DataFrame:
+                frame, _ = YahooExtract._return_data( # pylint: disable=protected-access
+                    ticker=symbol, params=fetch_params)
+                return frame
+
+        tickers = params['tickers'][:params['ticker_limit']]
+        tables['raw_ticker_dict'], params['download_report'] = cls.download(
+            tickers=tickers,
+            fetch=fetch,
+            max_workers=params['max_workers'],
+            max_retries=params['max_retries'],
+            retry_backoff=params['retry_backoff'])
+
+        params['exceptions'] = [
+            ticker for ticker, entry in params['download_report'].items()
+            if entry['status'] == 'failed']
+        for ticker in params['exceptions']:
+            print("Error with "+ticker)
+
+        # Set the proper length of DataFrame to help filter out missing data,
+        # taking the tickers in their original order
+        for frame in tables['raw_ticker_dict'].values():
+            params = MktUtils.window_set(frame=frame, params=params)
+
+        return params, tables
+
+
+    @classmethod
+    def download(
+        cls,
+        tickers: list,
+        fetch: Callable[[str], pd.DataFrame],
+        max_workers: int = 8,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5) -> tuple[dict, dict]:
+        """
+        Download the price history of each ticker using a pool of threads.
+
+        Parameters
+        ----------
+        tickers : List
+            List of tickers, represented as strings.
+        fetch : Callable
+            Function taking a ticker symbol and returning a DataFrame of
+            prices. A KeyError indicates there is no data for the symbol, in
+            which case the symbol with '.' replaced by '-' is tried. Any other
+            exception is retried.
+        max_workers : Int, optional
+            Maximum number of concurrent downloads. The default is 8.
+        max_retries : Int, optional
+            Number of times a failed download is retried. The default is 3.
+        retry_backoff : Float, optional
+            Seconds to wait before the first retry, doubling with each
+            further retry. The default is 0.5.
+
+        Returns
+        -------
+        frames : Dict
+            Dictionary of price history DataFrames for each ticker that was
+            downloaded, in the order of tickers.
+        report : Dict
+            Dictionary for each ticker of the symbol used, status ('ok' or
+            'failed'), number of attempts, seconds taken and last error.
+
+        """
+        frames = {}
+        report = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    cls._fetch_ticker, ticker, fetch, max_retries,
+                    retry_backoff): ticker
+                for ticker in tickers}
+
+            for future in as_completed(futures):
+                ticker = futures[future]
+                frames[ticker], report[ticker] = future.result()
+
+        # Restore the order of the tickers supplied
+        frames = {ticker: frames[ticker] for ticker in tickers
+                  if frames[ticker] is not None}
+        report = {ticker: report[ticker] for ticker in tickers}
+
+        return frames, report
+
+
+    @staticmethod
+    def _fetch_ticker(
+        ticker: str,
+        fetch: Callable[[str], pd.DataFrame],
+        max_retries: int,
+        retry_backoff: float) -> tuple[pd.DataFrame | None, dict]:
+
+        start = time.perf_counter()
+        entry = {
+            'symbol': ticker,
+            'status': 'failed',
+            'attempts': 0,
+            'seconds': 0.0,
+            'error': None
+            }
+
+        # Try the ticker and then the alternative with '.' replaced by '-'
+        symbols = list(dict.fromkeys([ticker, ticker.replace('.', '-')]))
+
+        for symbol in symbols:
+            for attempt in range(max_retries + 1):
+                entry['attempts'] += 1
+                try:
+                    frame = fetch(symbol)
+
+                # No data for this symbol so move to the alternative
+                except KeyError as err:
+                    entry['error'] = repr(err)
+                    break
+
+                # Otherwise wait and retry
+                except Exception as err: # pylint: disable=broad-except
+                    entry['error'] = repr(err)
+                    if attempt < max_retries:
+                        time.sleep(retry_backoff * 2 ** attempt)
+
+                else:
+                    entry['symbol'] = symbol
+                    entry['status'] = 'ok'
+                    entry['error'] = None
+                    entry['seconds'] = time.perf_counter() - start
+                    return frame, entry
+
+        entry['seconds'] = time.perf_counter() - start
+
+        return None, entry
@@ -0,0 +1,89 @@
+"""
+Read-only default parameters and sector mappings, built once and shared by
+every TrendStrength object
+
+"""
+from trendvisdata.sector_mappings import sectmap
+from trendvisdata.trend_params import trend_params_dict
+from trendvisualizer.vis_params import vis_params_dict
+
+
+class ReadOnlyDict(dict):
+    """
+    Dictionary which raises a TypeError on any change. Replace the value in
+    the parameter dictionary instead, eg
+    params['mpl_chart_params'] = dict(params['mpl_chart_params'], ...)
+
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(
+            "Default parameters are shared and cannot be changed in place. "
+            "Supply a new value instead.")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+    def __reduce__(self):
+
+        # Rebuild from a plain copy rather than by setting each item
+        return (self.__class__, (dict(self),))
+
+
+
+class ReadOnlyList(list):
+    """
+    List which raises a TypeError on any change. Replace the value in the
+    parameter dictionary instead, eg params['ma_list'] = [10, 20, 50].
+
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(
+            "Default parameters are shared and cannot be changed in place. "
+            "Supply a new value instead.")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = _read_only
+    reverse = sort = _read_only
+
+
+    def __reduce__(self):
+
+        # Rebuild from a plain copy rather than by appending each item
+        return (self.__class__, (list(self),))
+
+
+
+def freeze(value):
+    """
+    Read-only copy of a structure of dictionaries and lists.
+
+    Parameters
+    ----------
+    value : Any
+        The value to copy.
+
+    Returns
+    -------
+    Any
+        The value with every dictionary replaced by a ReadOnlyDict and
+        every list by a ReadOnlyList.
+
+    """
+    if isinstance(value, dict):
+        return ReadOnlyDict(
+            (key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return ReadOnlyList(freeze(item) for item in value)
+
+    return value
+
+
+# Dictionary of default parameters supplied by trendvisdata
+DEFAULT_DICT = freeze(trend_params_dict)
+
+# Default parameters with the trendvisualizer additions
+DEFAULT_PARAMS = freeze({**trend_params_dict['df_params'], **vis_params_dict})
+
+# Dictionary of sector mappings
+DEFAULT_MAPPINGS = freeze(sectmap)
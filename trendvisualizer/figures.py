@@ -0,0 +1,426 @@
+"""
+Create chart figures in a style which is applied explicitly to each figure,
+axes and artist rather than through Matplotlib's global rcParams, so that
+charts can be built in any thread
+
+"""
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.style
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from matplotlib.legend import Legend
+from matplotlib.lines import Line2D
+from matplotlib.text import Text
+
+# Style shared by every chart
+CHART_STYLE = 'seaborn-v0_8-darkgrid'
+
+# Font families which Matplotlib expands into a list of fonts
+GENERIC_FAMILIES = ['serif', 'sans-serif', 'cursive', 'fantasy', 'monospace']
+
+
+class ChartStyle():
+    """
+    The chart style combined with the rcParams of a chart type, validated
+    once. Each key set by the style or the chart is passed explicitly to
+    the figure, axes and artists which use it, including the tick marks and
+    labels Matplotlib creates as the figure is laid out and drawn, so the
+    global rcParams are never changed and charts can be built concurrently
+    without a lock. Every other key keeps its global value, as with
+    matplotlib.style.context.
+
+    Parameters
+    ----------
+    rc_params : Dict
+        Matplotlib rcParams used for the chart, eg mpl_chart_params.
+
+    """
+    def __init__(self, rc_params: dict) -> None:
+
+        # Validate the rcParams of the chart over those of the style, as
+        # matplotlib.rc_context does
+        resolved = matplotlib.RcParams(
+            matplotlib.style.library[CHART_STYLE])
+        resolved.update(rc_params)
+        self.rc = {key: resolved[key] for key in resolved}
+
+        self.font_family = self._font_family()
+
+
+    def get(self, key: str):
+        """
+        The value of an rcParam for the chart.
+
+        Parameters
+        ----------
+        key : Str
+            The rcParam, eg 'axes.facecolor'.
+
+        Returns
+        -------
+        The value from the chart or the style, or otherwise the global
+        rcParams.
+
+        """
+        if key in self.rc:
+            return self.rc[key]
+
+        return matplotlib.rcParams[key]
+
+
+    def _font_family(self) -> list | None:
+
+        # Expand generic families such as 'sans-serif' into the fonts listed
+        # for them, so that Matplotlib does not look up the global list
+        keys = ['font.family'] + [
+            'font.'+family for family in GENERIC_FAMILIES]
+        if not any(key in self.rc for key in keys):
+            return None
+
+        families = []
+        for family in self.get('font.family'):
+            if family in GENERIC_FAMILIES:
+                families.extend(self.get('font.'+family))
+            else:
+                families.append(family)
+
+        return families
+
+
+    def _set(self, kwargs: dict, arg: str, key: str) -> None:
+
+        # Add the value of a key set by the style or the chart to the
+        # arguments unless the caller has supplied it
+        if key in self.rc:
+            kwargs.setdefault(arg, self.rc[key])
+
+
+    def figure_kwargs(self) -> dict:
+        """
+        Arguments which style a new figure.
+
+        Returns
+        -------
+        Dict
+            facecolor and dpi of the figure, where set.
+
+        """
+        kwargs = {}
+        self._set(kwargs, 'facecolor', 'figure.facecolor')
+        self._set(kwargs, 'dpi', 'figure.dpi')
+
+        return kwargs
+
+
+    def axes(self, ax: Axes) -> Axes:
+        """
+        Style a new axes. Call before any other formatting of the axes, so
+        that the chart's own settings take precedence.
+
+        Parameters
+        ----------
+        ax : Axes
+            The axes.
+
+        Returns
+        -------
+        ax : Axes
+            The styled axes.
+
+        """
+        # Background and frame
+        if 'axes.facecolor' in self.rc:
+            ax.set_facecolor(self.rc['axes.facecolor'])
+        if 'axes.axisbelow' in self.rc:
+            ax.set_axisbelow(self.rc['axes.axisbelow'])
+        for spine in ax.spines.values():
+            if 'axes.edgecolor' in self.rc:
+                spine.set_edgecolor(self.rc['axes.edgecolor'])
+            if 'axes.linewidth' in self.rc:
+                spine.set_linewidth(self.rc['axes.linewidth'])
+
+        # Setting the margins requests an autoscale, so the limits of the
+        # empty axes are restored for layouts computed before any data is
+        # plotted
+        margins = {}
+        self._set(margins, 'x', 'axes.xmargin')
+        self._set(margins, 'y', 'axes.ymargin')
+        if margins:
+            limits = ax.viewLim.frozen()
+            ax.margins(**margins)
+            ax.set_xlim(limits.intervalx, auto=None)
+            ax.set_ylim(limits.intervaly, auto=None)
+
+        # Tick marks, tick labels and gridlines. These are stored on each
+        # axis and used for the ticks created as the figure is drawn.
+        for axis in (ax.xaxis, ax.yaxis):
+            for which in ('major', 'minor'):
+                kwargs = self._tick_kwargs(axis.axis_name+'tick', which)
+                if kwargs:
+                    axis.set_tick_params(which=which, **kwargs)
+            if 'axes.labelcolor' in self.rc:
+                axis.label.set_color(self.rc['axes.labelcolor'])
+
+        if 'axes.grid' in self.rc:
+            ax.grid(False, which='both')
+            if self.rc['axes.grid']:
+                ax.grid(True, which=self.get('axes.grid.which'),
+                        axis=self.get('axes.grid.axis'))
+
+        # Title offset and position, which are shared by the titles at each
+        # location
+        self.title(ax, '')
+
+        return ax
+
+
+    def _tick_kwargs(self, name: str, which: str) -> dict:
+
+        kwargs = {}
+        self._set(kwargs, 'length', name+'.'+which+'.size')
+        self._set(kwargs, 'pad', name+'.'+which+'.pad')
+        self._set(kwargs, 'direction', name+'.direction')
+        self._set(kwargs, 'labelsize', name+'.labelsize')
+        self._set(kwargs, 'color', name+'.color')
+        self._set(kwargs, 'grid_color', 'grid.color')
+        self._set(kwargs, 'grid_linestyle', 'grid.linestyle')
+        self._set(kwargs, 'grid_solid_capstyle', 'lines.solid_capstyle')
+
+        # Tick labels take the color of the tick marks unless they have
+        # their own
+        if 'color' in kwargs and self.get(name+'.labelcolor') == 'inherit':
+            kwargs['labelcolor'] = kwargs['color']
+        if self.font_family is not None:
+            kwargs['labelfontfamily'] = self.font_family
+
+        return kwargs
+
+
+    def title(self, ax: Axes, label: str, **kwargs) -> Text:
+        """
+        Set the title of an axes.
+
+        Parameters
+        ----------
+        ax : Axes
+            The axes.
+        label : Str
+            The title.
+        **kwargs : Dict
+            Arguments passed to Axes.set_title, overriding the style.
+
+        Returns
+        -------
+        Text
+            The title.
+
+        """
+        self._set(kwargs, 'fontsize', 'axes.titlesize')
+        self._set(kwargs, 'pad', 'axes.titlepad')
+        if self.rc.get('axes.titley') is not None:
+            kwargs.setdefault('y', self.rc['axes.titley'])
+        if self.get('axes.titlecolor') == 'auto':
+            self._set(kwargs, 'color', 'text.color')
+
+        return ax.set_title(label, **kwargs)
+
+
+    def legend(self, ax: Axes, *args, **kwargs) -> Legend:
+        """
+        Add a legend to an axes.
+
+        Parameters
+        ----------
+        ax : Axes
+            The axes.
+        *args : Tuple
+            Arguments passed to Axes.legend, eg the labels.
+        **kwargs : Dict
+            Arguments passed to Axes.legend, overriding the style.
+
+        Returns
+        -------
+        Legend
+            The legend.
+
+        """
+        for key in ['fontsize', 'title_fontsize', 'frameon', 'shadow',
+                    'numpoints', 'scatterpoints']:
+            self._set(kwargs, key, 'legend.'+key)
+
+        # A shadow makes the frame opaque unless an alpha is given
+        if not kwargs.get('shadow', self.get('legend.shadow')):
+            self._set(kwargs, 'framealpha', 'legend.framealpha')
+
+        # The frame colors may be inherited from the axes
+        for key in ['facecolor', 'edgecolor']:
+            if self.get('legend.'+key) == 'inherit':
+                self._set(kwargs, key, 'axes.'+key)
+            else:
+                self._set(kwargs, key, 'legend.'+key)
+
+        if self.get('legend.labelcolor') in (None, 'None'):
+            self._set(kwargs, 'labelcolor', 'text.color')
+
+        legend = ax.legend(*args, **kwargs)
+        if 'text.color' in self.rc:
+            legend.get_title().set_color(self.rc['text.color'])
+
+        return legend
+
+
+    def text_kwargs(self) -> dict:
+        """
+        Text properties of the style, eg for the textprops of a pie chart.
+
+        Returns
+        -------
+        Dict
+            color of the text, where set.
+
+        """
+        kwargs = {}
+        self._set(kwargs, 'color', 'text.color')
+
+        return kwargs
+
+
+    def artists(self, fig: Figure) -> None:
+        """
+        Apply the fonts and line cap style to the text and lines of a
+        figure, before it is laid out.
+
+        Parameters
+        ----------
+        fig : Figure
+            The figure.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.font_family is not None:
+            for text in fig.findobj(Text):
+                text.set_fontfamily(self.font_family)
+        if 'lines.solid_capstyle' in self.rc:
+            for line in fig.findobj(Line2D):
+                line.set_solid_capstyle(self.rc['lines.solid_capstyle'])
+
+
+class StyledFigure(Figure):
+    """
+    Figure whose axes take a chart style as they are added, including those
+    created with subplots() or by Seaborn
+
+    Parameters
+    ----------
+    chart_style : ChartStyle
+        The style of the chart.
+    **kwargs : Dict
+        Arguments passed to the Figure, eg figsize.
+
+    """
+    def __init__(self, *args, chart_style: ChartStyle, **kwargs) -> None:
+        self.chart_style = chart_style
+        super().__init__(*args, **kwargs)
+
+
+    def add_subplot(self, *args, **kwargs) -> Axes:
+        return self.chart_style.axes(super().add_subplot(*args, **kwargs))
+
+
+    def add_axes(self, *args, **kwargs) -> Axes:
+        return self.chart_style.axes(super().add_axes(*args, **kwargs))
+
+
+class ChartFigure():
+    """
+    Figures managed by pyplot for display, or standalone figures which do
+    not touch pyplot's global state and can be created, saved and discarded
+    in any thread.
+
+    """
+    @staticmethod
+    def new(
+        params: dict,
+        style: ChartStyle,
+        **kwargs) -> StyledFigure:
+        """
+        Create an empty figure in the chart style.
+
+        Parameters
+        ----------
+        params : Dict
+            pyplot : Bool
+                Whether to create the figure with pyplot so that it is
+                displayed, rather than as a standalone figure. The default
+                is True.
+        style : ChartStyle
+            The style of the chart.
+        **kwargs : Dict
+            Arguments passed to the Figure, eg figsize.
+
+        Returns
+        -------
+        StyledFigure
+            The figure.
+
+        """
+        kwargs = dict(style.figure_kwargs(), **kwargs)
+        if params.get('pyplot', True):
+            return plt.figure(
+                FigureClass=StyledFigure, chart_style=style, **kwargs)
+
+        return StyledFigure(chart_style=style, **kwargs)
+
+
+    @staticmethod
+    def finish(
+        params: dict,
+        fig: StyledFigure) -> dict:
+        """
+        Apply the style to the text and lines of the figure, lay it out and
+        store it in the chart parameters.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of chart parameters.
+        fig : StyledFigure
+            The figure.
+
+        Returns
+        -------
+        params : Dict
+            Dictionary of chart parameters with the figure stored under
+            'figure'.
+
+        """
+        fig.chart_style.artists(fig)
+        fig.draw_without_rendering()
+        params['figure'] = fig
+
+        return params
+
+
+    @staticmethod
+    def show(params: dict) -> None:
+        """
+        Show the pyplot figures.
+
+        Parameters
+        ----------
+        params : Dict
+            pyplot : Bool
+                Whether the chart was created with pyplot. Standalone
+                figures are not shown. The default is True.
+
+        Returns
+        -------
+        None.
+
+        """
+        if params.get('pyplot', True):
+            plt.show()
@@ -0,0 +1,299 @@
+"""
+Trend Strength for every date of the price history, calculated from the
+indicator fields in one pass rather than one barometer per end date
+
+"""
+from typing import Iterator
+import numpy as np
+import pandas as pd
+
+# Fields.generate_trend_strength sums the first 29 trend flags
+NUM_STRENGTH_FLAGS = 29
+
+
+class BarometerHistory():
+    """
+    Date x ticker tables of Trend Strength and of each trend flag. The row
+    for each date matches the barometer of a run ending on that date with
+    the same start date, as the indicators only use the prices up to each
+    date. Tickers are NaN on dates without a price bar, where the barometer
+    takes the last earlier bar, so forward fill to match it exactly.
+
+    """
+    @classmethod
+    def calculate(
+        cls,
+        params: dict,
+        tables: dict,
+        flags: bool = False,
+        chunk_days: int | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None) -> dict:
+        """
+        Calculate the Trend Strength history.
+
+        Parameters
+        ----------
+        params : Dict
+            trend_flags : List
+                The indicator flag columns.
+        tables : Dict
+            ticker_dict : Dict
+                Dictionary of DataFrames of each ticker with the indicator
+                fields.
+            panel : PricePanel, optional
+                The price panel, used in place of ticker_dict if present.
+        flags : Bool, optional
+            Whether to include a date x ticker table of each trend flag.
+            The default is False.
+        chunk_days : Int, optional
+            Number of dates calculated at a time. The default is None which
+            calculates every date at once. Use chunks to process histories
+            too long to hold in memory.
+        start_date : Str, optional
+            First date of the history, in the format 'YYYY-MM-DD'. The
+            default is None which starts from the first price bar.
+        end_date : Str, optional
+            Last date of the history, in the format 'YYYY-MM-DD'. The
+            default is None which ends at the last price bar.
+
+        Returns
+        -------
+        history : Dict
+            trend_strength : DataFrame
+                Sum of the trend flags, dates x tickers, as float32.
+            flags : Dict
+                Dictionary of date x ticker float32 DataFrames, one for
+                each trend flag, if selected.
+
+        """
+        chunks = list(cls.chunks(
+            params=params, tables=tables, flags=flags, chunk_days=chunk_days,
+            start_date=start_date, end_date=end_date))
+
+        history = {'trend_strength': pd.concat(
+            [chunk['trend_strength'] for chunk in chunks])}
+        if flags:
+            history['flags'] = {
+                flag: pd.concat([chunk['flags'][flag] for chunk in chunks])
+                for flag in params['trend_flags']}
+
+        return history
+
+
+    @classmethod
+    def chunks(
+        cls,
+        params: dict,
+        tables: dict,
+        flags: bool = False,
+        chunk_days: int | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None) -> Iterator[dict]:
+        """
+        Calculate the Trend Strength history a block of dates at a time, so
+        that long histories can be written out without holding every date
+        in memory.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+        tables : Dict
+            Dictionary of key tables.
+        flags : Bool, optional
+            Whether to include a table of each trend flag. The default is
+            False.
+        chunk_days : Int, optional
+            Number of dates in each block. The default is None which
+            returns every date in one block.
+        start_date : Str, optional
+            First date of the history. The default is None.
+        end_date : Str, optional
+            Last date of the history. The default is None.
+
+        Yields
+        ------
+        chunk : Dict
+            The history for a block of dates, in the layout returned by
+            calculate.
+
+        """
+        trend_flags = list(params['trend_flags'])
+        panel = tables.get('panel')
+        if panel is not None:
+            tickers = panel.tickers
+            dates = panel.dates
+        else:
+            ticker_dict = tables['ticker_dict']
+            tickers = list(ticker_dict)
+            dates = cls._dates(ticker_dict)
+
+        # Select the requested date range
+        dates = dates[(dates >= pd.Timestamp(start_date or dates[0]))
+                      & (dates <= pd.Timestamp(end_date or dates[-1]))]
+        if chunk_days is None:
+            chunk_days = max(len(dates), 1)
+
+        for start in range(0, len(dates), chunk_days):
+            chunk_dates = dates[start:start + chunk_days]
+
+            # Date x ticker arrays of the block, NaN where a ticker has no
+            # bar
+            if panel is not None:
+                strength, flag_values = cls._panel_values(
+                    panel, chunk_dates, trend_flags, flags)
+            else:
+                strength, flag_values = cls._frame_values(
+                    ticker_dict, tickers, chunk_dates, trend_flags, flags)
+
+            chunk = {
+                'trend_strength': cls._wide(strength, chunk_dates, tickers)}
+            if flags:
+                chunk['flags'] = {
+                    flag: cls._wide(values, chunk_dates, tickers)
+                    for flag, values in flag_values.items()}
+
+            yield chunk
+
+
+    @staticmethod
+    def sectors(
+        params: dict,
+        history: dict,
+        barometer: pd.DataFrame,
+        sector_level: int | None = None,
+        absolute: bool = False) -> pd.DataFrame:
+        """
+        Average Trend Strength % of each sector on each date.
+
+        Parameters
+        ----------
+        params : Dict
+            asset_type : Str
+                'CTA' or 'Equity', selecting the sector levels.
+            sector_level : Int
+                The default sector level.
+        history : Dict
+            The history returned by calculate.
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker, used for the
+            sector of each ticker.
+        sector_level : Int, optional
+            Level of sector grouping, 1 being the broadest. The default is
+            None which uses params['sector_level'].
+        absolute : Bool, optional
+            Whether to average the absolute Trend Strength % rather than
+            netting up and down trends. The default is False.
+
+        Returns
+        -------
+        DataFrame
+            Dates x sectors, ignoring tickers without a bar on each date.
+
+        """
+        if sector_level is None:
+            sector_level = params['sector_level']
+        if params['asset_type'] == 'CTA':
+            sector_name = params[
+                'commodity_sector_levels'][sector_level-1]
+        else:
+            sector_name = params[
+                'equity_sector_levels'][sector_level-1]
+
+        strength = history['trend_strength'] / len(params['trend_flags'])
+        if absolute:
+            strength = strength.abs()
+
+        # Map each ticker column to its sector and average across columns
+        sector = barometer.set_index('Ticker')[sector_name].astype(
+            object).reindex(strength.columns)
+
+        return strength.T.groupby(sector.to_numpy()).mean().T
+
+
+    @staticmethod
+    def _dates(ticker_dict: dict) -> pd.DatetimeIndex:
+
+        # Union of the dates of all tickers
+        indexes = [frame.index for frame in ticker_dict.values()]
+        dates = indexes[0]
+        for index in indexes[1:]:
+            if not index.equals(dates):
+                dates = dates.union(index)
+
+        return dates
+
+
+    @staticmethod
+    def _panel_values(
+        panel,
+        dates: pd.DatetimeIndex,
+        trend_flags: list,
+        flags: bool) -> tuple[np.ndarray, dict]:
+
+        rows = panel.dates.get_indexer(dates)
+        missing = ~panel.mask[rows]
+
+        # Sum the same flags as the barometer across every ticker at once
+        strength = np.zeros(missing.shape, dtype=np.float32)
+        for flag in trend_flags[:NUM_STRENGTH_FLAGS]:
+            strength += panel[flag][rows]
+
+        # Compacted panels hold 0 rather than NaN where there is no bar
+        strength[missing] = np.nan
+        flag_values = {}
+        if flags:
+            for flag in trend_flags:
+                flag_values[flag] = panel[flag][rows].astype(np.float32)
+                flag_values[flag][missing] = np.nan
+
+        return strength, flag_values
+
+
+    @staticmethod
+    def _frame_values(
+        ticker_dict: dict,
+        tickers: list,
+        dates: pd.DatetimeIndex,
+        trend_flags: list,
+        flags: bool) -> tuple[np.ndarray, dict]:
+
+        shape = (len(dates), len(tickers))
+        strength = np.full(shape, np.nan, dtype=np.float32)
+        flag_values = {}
+        if flags:
+            flag_values = {flag: np.full(shape, np.nan, dtype=np.float32)
+                           for flag in trend_flags}
+
+        for num, ticker in enumerate(tickers):
+            frame = ticker_dict[ticker]
+
+            # Take the bars within the block, with missing flags as 0 as in
+            # the barometer update
+            frame = frame.loc[dates[0]:dates[-1]]
+            if len(frame) == 0:
+                continue
+            rows = dates.get_indexer(frame.index)
+            values = frame.reindex(
+                columns=trend_flags, fill_value=0).to_numpy(
+                    dtype=np.float32)
+
+            # Sum the same flags as the barometer
+            strength[rows, num] = values[:, :NUM_STRENGTH_FLAGS].sum(axis=1)
+            for col, flag in enumerate(flag_values):
+                flag_values[flag][rows, num] = values[:, col]
+
+        return strength, flag_values
+
+
+    @staticmethod
+    def _wide(
+        values: np.ndarray,
+        dates: pd.DatetimeIndex,
+        tickers: list) -> pd.DataFrame:
+
+        frame = pd.DataFrame(values, index=dates, columns=tickers)
+        frame.index.name = 'Date'
+
+        return frame
@@ -0,0 +1,756 @@
+"""
+Advance the indicator fields and Trend Strength table by new price bars
+without recalculating the full price history
+
+"""
+import numpy as np
+import pandas as pd
+from trendvisualizer.barometer import (
+    BarometerIndex, FlagTallies, SectorCube)
+from trendvisualizer.panel import (
+    PanelDict, PanelFields, PanelIndicators, PricePanel)
+from trendvisualizer.snapshot import SnapshotDict
+
+# Nanoseconds in a calendar day, the unit of the moving average windows
+DAY = 86_400 * 10**9
+
+# Parameters used to calculate the indicators
+TENOR_KEYS = ['ma_list', 'price_cross_list', 'macd_params', 'adx_list',
+              'ma_cross_list', 'rsi_list', 'breakout_list', 'atr_list']
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+
+class IndicatorState():
+    """
+    The rolling state of every indicator for each ticker: the previous
+    bar, the smoothed averages behind MACD, ADX, RSI and ATR and windows of
+    recent prices for the moving averages and breakouts. Each item is an
+    array with one row per ticker so that a bar for many tickers is
+    processed with vectorized steps.
+
+    Parameters
+    ----------
+    params : Dict
+        Dictionary of key parameters, including the tenor lists
+        ma_list, price_cross_list, macd_params, adx_list, ma_cross_list,
+        rsi_list, breakout_list and atr_list.
+    tickers : List
+        List of tickers, represented as strings.
+
+    """
+    def __init__(
+        self,
+        params: dict,
+        tickers: list) -> None:
+
+        self.params = {key: params[key] for key in TENOR_KEYS}
+        self.tickers = list(tickers)
+        self.positions = {
+            ticker: num for num, ticker in enumerate(self.tickers)}
+
+        # Arrays keyed by name, each with one row per ticker
+        self.arrays = {}
+
+
+    @classmethod
+    def from_ticker_dict(
+        cls,
+        params: dict,
+        ticker_dict: dict) -> 'IndicatorState':
+        """
+        Calculate the state at the last bar of each ticker from the full
+        price history.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters, including the tenor lists.
+        ticker_dict : Dict
+            Dictionary of price history DataFrames, one for each ticker.
+
+        Returns
+        -------
+        IndicatorState
+            The state of each ticker.
+
+        """
+        ind = PanelIndicators
+        panel = PricePanel.from_ticker_dict(ticker_dict, columns=PRICE_COLUMNS)
+        state = cls(params=params, tickers=panel.tickers)
+        arrays = state.arrays
+
+        # Each ticker's bars are at the bottom of the packed columns, so the
+        # last row holds the latest value of each calculation
+        high = panel.pack(panel['High'])
+        low = panel.pack(panel['Low'])
+        close = panel.pack(panel['Close'])
+        arrays['high'] = high[-1]
+        arrays['low'] = low[-1]
+        arrays['close'] = close[-1]
+        arrays['date'] = np.array(
+            [ticker_dict[ticker].index[-1].value for ticker in state.tickers],
+            dtype=np.int64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fast, slow, signal = params['macd_params']
+            macd = ind.macd_components(
+                close=close, fast=fast, slow=slow, signal=signal)
+            arrays['macd_fast'] = macd['ema_fast'][-1]
+            arrays['macd_slow'] = macd['ema_slow'][-1]
+            arrays['macd_signal'] = macd['signal'][-1]
+            arrays['macd_hist'] = macd['histogram'][-1]
+
+            # The averages of each tenor are held as the columns of one
+            # ticker x tenor array, so every tenor is advanced at once
+            adx = [ind.adx_components(
+                high=high, low=low, close=close, time_period=tenor)
+                   for tenor in params['adx_list']]
+            for name in ('true_range', 'dm_plus', 'dm_minus', 'adx'):
+                arrays['adx_'+name] = np.column_stack(
+                    [components[name][-1] for components in adx])
+
+            rsi = [ind.rsi_components(close=close, time_period=tenor)
+                   for tenor in params['rsi_list']]
+            arrays['rsi_gain'] = np.column_stack(
+                [components['gain'][-1] for components in rsi])
+            arrays['rsi_loss'] = np.column_stack(
+                [components['loss'][-1] for components in rsi])
+
+            arrays['atr'] = np.column_stack(
+                [ind.ATR(high=high, low=low, close=close,
+                         time_period=tenor)[-1]
+                 for tenor in params['atr_list']])
+
+            # Windows of recent highs and lows for the breakouts
+            max_breakout = max(params['breakout_list'])
+            arrays['highs'] = cls._tail(high, max_breakout)
+            arrays['lows'] = cls._tail(low, max_breakout)
+            breakout = [ind.breakout(high=high, low=low, time_period=tenor)
+                        for tenor in params['breakout_list']]
+            for num, name in enumerate(('low', 'high', 'flag')):
+                arrays['breakout_'+name] = np.column_stack(
+                    [values[num][-1] for values in breakout])
+
+            # Range of the percentage change since the first close
+            first_close = PanelFields._first_valid(close, panel) # pylint: disable=protected-access
+            start_change_percent = (close - first_close) / first_close * 100
+            arrays['first_close'] = first_close
+            arrays['min_change'] = np.nanmin(start_change_percent, axis=0)
+            arrays['max_change'] = np.nanmax(start_change_percent, axis=0)
+
+        # Copy the last rows so the full arrays are not kept in memory
+        for name, values in arrays.items():
+            arrays[name] = np.array(values)
+        state._init_closes(ticker_dict)
+
+        return state
+
+
+    @staticmethod
+    def _tail(packed: np.ndarray, num_rows: int) -> np.ndarray:
+
+        # The last rows of each packed column as a ticker x row window,
+        # padded with NaN for short histories
+        window = np.full((packed.shape[1], num_rows), np.nan)
+        rows = min(num_rows, len(packed))
+        window[:, num_rows - rows:] = packed[len(packed) - rows:].T
+
+        return window
+
+
+    def _init_closes(self, ticker_dict: dict) -> None:
+
+        # Dates and closes within the longest moving average window, right
+        # aligned with empty slots holding the earliest possible date
+        max_days = max(self.params['ma_list']) * DAY
+        recent = []
+        for ticker in self.tickers:
+            frame = ticker_dict[ticker]
+            dates = frame.index.as_unit('ns').asi8
+            closes = frame['Close'].to_numpy(dtype=float)
+            keep = dates > dates[-1] - max_days
+            recent.append((dates[keep], closes[keep]))
+
+        width = max(len(dates) for dates, _ in recent) + 1
+        self.arrays['ma_dates'] = np.full(
+            (len(self.tickers), width), np.iinfo(np.int64).min)
+        self.arrays['ma_closes'] = np.full(
+            (len(self.tickers), width), np.nan)
+        for num, (dates, closes) in enumerate(recent):
+            self.arrays['ma_dates'][num, width - len(dates):] = dates
+            self.arrays['ma_closes'][num, width - len(closes):] = closes
+
+
+    def warm(self) -> np.ndarray:
+        """
+        Whether each ticker has enough history for every smoothed average to
+        be initialised, so that the next bar can be calculated from the
+        state alone.
+
+        Returns
+        -------
+        Array
+            Boolean array, one entry per ticker.
+
+        """
+        smoothed = [values for name, values in self.arrays.items()
+                    if name.startswith(('macd_', 'adx_', 'rsi_', 'atr'))]
+        smoothed.extend(
+            [self.arrays['high'], self.arrays['low'], self.arrays['close']])
+
+        return np.isfinite(np.column_stack(smoothed)).all(axis=1)
+
+
+    def replace(self, other: 'IndicatorState') -> None:
+        """
+        Replace the state of the tickers in another IndicatorState, eg one
+        calculated from the full history of those tickers.
+
+        Parameters
+        ----------
+        other : IndicatorState
+            State of some of the tickers.
+
+        Returns
+        -------
+        None.
+
+        """
+        rows = np.array(
+            [self.positions[ticker] for ticker in other.tickers], dtype=int)
+        for name, values in other.arrays.items():
+            current = self.arrays[name]
+
+            # Pad the shorter of the price windows on the left
+            if values.ndim == 2 and values.shape[1] != current.shape[1]:
+                width = max(values.shape[1], current.shape[1])
+                current = self._widen(current, width)
+                values = self._widen(values, width)
+                self.arrays[name] = current
+            current[rows] = values
+
+
+    @staticmethod
+    def _widen(window: np.ndarray, width: int) -> np.ndarray:
+
+        if window.shape[1] == width:
+            return window
+        fill = (np.iinfo(np.int64).min if window.dtype == np.int64
+                else np.nan)
+        padding = np.full((len(window), width - window.shape[1]), fill,
+                          dtype=window.dtype)
+
+        return np.hstack([padding, window])
+
+
+    def _tenors(self, key: str) -> np.ndarray:
+
+        return np.array(self.params[key], dtype=float)
+
+
+    @staticmethod
+    def _smooth(
+        prev: np.ndarray,
+        values: np.ndarray,
+        time_period: int | np.ndarray,
+        wilder: bool = False,
+        average: bool = True) -> np.ndarray:
+
+        # One step of PanelIndicators.EMA
+        if average:
+            if wilder:
+                return (values + prev * (time_period - 1)) / time_period
+            alpha = 2 / (time_period + 1)
+            return values * alpha + (prev * (1 - alpha))
+
+        return values + prev - (prev / time_period)
+
+
+    def _push(
+        self,
+        name: str,
+        rows: np.ndarray,
+        values: np.ndarray) -> None:
+
+        # Drop the oldest entry of each window and add the new value
+        window = self.arrays[name]
+        window[rows] = np.hstack([window[rows, 1:], values[:, None]])
+
+
+    def advance(
+        self,
+        rows: np.ndarray,
+        dates: np.ndarray,
+        bars: dict) -> dict:
+        """
+        Calculate the indicator fields of one new bar for each selected
+        ticker and advance their state.
+
+        Parameters
+        ----------
+        rows : Array
+            Positions of the tickers in the state, each at most once.
+        dates : Array
+            Date of each new bar as int64 nanoseconds.
+        bars : Dict
+            Arrays of the Open, High, Low and Close of each new bar.
+
+        Returns
+        -------
+        fields : Dict
+            Arrays of each field of Fields.generate_fields, one entry per
+            ticker.
+
+        """
+        params = self.params
+        arrays = self.arrays
+        high = bars['High']
+        low = bars['Low']
+        close = bars['Close']
+        prev_high = arrays['high'][rows]
+        prev_low = arrays['low'][rows]
+        prev_close = arrays['close'][rows]
+        fields = {column: bars[column] for column in PRICE_COLUMNS}
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+
+            # Moving averages over the closes within each calendar day
+            # window, growing the stored window if its oldest close is
+            # still needed
+            max_days = max(params['ma_list']) * DAY
+            if (arrays['ma_dates'][rows, 0] > dates - max_days).any():
+                for name in ('ma_dates', 'ma_closes'):
+                    arrays[name] = self._widen(
+                        arrays[name], 2 * arrays[name].shape[1])
+            self._push('ma_dates', rows, dates)
+            self._push('ma_closes', rows, close)
+            ma_closes = arrays['ma_closes'][rows][:, None, :]
+            starts = dates[:, None] - self._tenors('ma_list') * DAY
+            in_window = (
+                (arrays['ma_dates'][rows][:, None, :] > starts[:, :, None])
+                & ~np.isnan(ma_closes))
+            moving_avg = (np.where(in_window, ma_closes, 0).sum(axis=2)
+                          / in_window.sum(axis=2))
+            for num, tenor in enumerate(params['ma_list']):
+                fields['MA_'+str(tenor)] = moving_avg[:, num]
+
+            # Flag for price crossing moving average
+            for tenor in params['price_cross_list']:
+                fields['PX_MA_'+str(tenor)+'_flag'] = np.where(
+                    close > fields['MA_'+str(tenor)], 1, -1)
+
+            fast, slow, signal = params['macd_params']
+            ema_fast = self._smooth(arrays['macd_fast'][rows], close, fast)
+            ema_slow = self._smooth(arrays['macd_slow'][rows], close, slow)
+            macd = ema_fast - ema_slow
+            macd_signal = self._smooth(
+                arrays['macd_signal'][rows], macd, signal)
+            hist = macd - macd_signal
+            fields['MACD'] = macd
+            fields['MACD_SIGNAL'] = macd_signal
+            fields['MACD_HIST'] = hist
+            fields['MACD_flag'] = np.where(
+                hist - arrays['macd_hist'][rows] > 0, 1, -1)
+            arrays['macd_fast'][rows] = ema_fast
+            arrays['macd_slow'][rows] = ema_slow
+            arrays['macd_signal'][rows] = macd_signal
+            arrays['macd_hist'][rows] = hist
+
+            # True Range and Directional Movement
+            t_range = np.maximum(
+                np.maximum(high - low, np.abs(high - prev_close)),
+                np.abs(low - prev_close))[:, None]
+            high_diff = high - prev_high
+            low_diff = low - prev_low
+            pos_shift = np.where(high_diff > 0, high_diff, 0)
+            neg_shift = np.where(low_diff < 0, -low_diff, 0)
+            dm_plus = np.where(pos_shift > neg_shift, pos_shift, 0)[:, None]
+            dm_minus = np.where(pos_shift < neg_shift, neg_shift, 0)[:, None]
+
+            tenors = self._tenors('adx_list')
+            tr_period = self._smooth(
+                arrays['adx_true_range'][rows], t_range, tenors,
+                average=False)
+            dm_plus_period = self._smooth(
+                arrays['adx_dm_plus'][rows], dm_plus, tenors, average=False)
+            dm_minus_period = self._smooth(
+                arrays['adx_dm_minus'][rows], dm_minus, tenors,
+                average=False)
+            di_plus_period = (dm_plus_period / tr_period) * 100
+            di_minus_period = (dm_minus_period / tr_period) * 100
+            dir_index = (np.abs(di_plus_period - di_minus_period)
+                         / (di_plus_period + di_minus_period)) * 100
+            adx = self._smooth(
+                arrays['adx_adx'][rows], dir_index, tenors, wilder=True)
+            arrays['adx_true_range'][rows] = tr_period
+            arrays['adx_dm_plus'][rows] = dm_plus_period
+            arrays['adx_dm_minus'][rows] = dm_minus_period
+            arrays['adx_adx'][rows] = adx
+            for num, tenor in enumerate(params['adx_list']):
+                key = '_'+str(tenor)
+                fields['ADX'+key] = adx[:, num]
+                fields['ADX'+key+'_flag'] = np.where(
+                    adx[:, num] > 25, np.where(
+                        fields['PX_MA'+key+'_flag'] == 1, 1, -1), 0)
+
+            # Flag for fast moving average crossing slow moving average
+            for tenor_pair in params['ma_cross_list']:
+                fields['MA_'+str(tenor_pair[0])+'_'+str(
+                    tenor_pair[1])+'_flag'] = np.where(
+                        fields['MA_'+str(tenor_pair[0])] > fields[
+                            'MA_'+str(tenor_pair[1])], 1, -1)
+
+            change = close - prev_close
+            gain = np.where(change > 0, change, 0)[:, None]
+            loss = np.where(change < 0, -change, 0)[:, None]
+            tenors = self._tenors('rsi_list')
+            gain_avg = self._smooth(
+                arrays['rsi_gain'][rows], gain, tenors, wilder=True)
+            loss_avg = self._smooth(
+                arrays['rsi_loss'][rows], loss, tenors, wilder=True)
+            rsi = 100 - 100 / (1 + gain_avg / loss_avg)
+            rsi_flag = np.where(rsi > 70, 1, np.where(rsi < 30, -1, 0))
+            arrays['rsi_gain'][rows] = gain_avg
+            arrays['rsi_loss'][rows] = loss_avg
+            for num, tenor in enumerate(params['rsi_list']):
+                fields['RSI_'+str(tenor)] = rsi[:, num]
+                fields['RSI_'+str(tenor)+'_flag'] = rsi_flag[:, num]
+
+            # Breakouts compare the new bar with the previous n-day range
+            self._push('highs', rows, high)
+            self._push('lows', rows, low)
+            highs = arrays['highs'][rows]
+            lows = arrays['lows'][rows]
+            nd_low = np.column_stack(
+                [lows[:, -tenor:].min(axis=1)
+                 for tenor in params['breakout_list']])
+            nd_high = np.column_stack(
+                [highs[:, -tenor:].max(axis=1)
+                 for tenor in params['breakout_list']])
+            prev_nd_low = arrays['breakout_low'][rows]
+            prev_nd_high = arrays['breakout_high'][rows]
+            prev_flag = arrays['breakout_flag'][rows]
+            up_flag = (high[:, None] >= prev_nd_high) | (
+                (prev_flag == 1) & (low[:, None] > prev_nd_low))
+            down_flag = (low[:, None] <= prev_nd_low) | (
+                (prev_flag == -1) & (high[:, None] < prev_nd_high))
+            flag = np.where(down_flag, -1, np.where(up_flag, 1, 0))
+            arrays['breakout_low'][rows] = nd_low
+            arrays['breakout_high'][rows] = nd_high
+            arrays['breakout_flag'][rows] = flag
+            for num, tenor in enumerate(params['breakout_list']):
+                key = '_'+str(tenor)
+                fields['low'+key] = nd_low[:, num]
+                fields['high'+key] = nd_high[:, num]
+                fields['breakout'+key+'_flag'] = flag[:, num]
+
+            atr = self._smooth(
+                arrays['atr'][rows], t_range, self._tenors('atr_list'),
+                wilder=True)
+            arrays['atr'][rows] = atr
+            for num, tenor in enumerate(params['atr_list']):
+                fields['ATR_'+str(tenor)] = atr[:, num]
+
+            # Percentage change in closing price since the start
+            first_close = arrays['first_close'][rows]
+            fields['first_close'] = first_close
+            fields['start_change'] = close - first_close
+            fields['start_change_percent'] = (
+                fields['start_change'] / first_close * 100)
+            arrays['min_change'][rows] = np.fmin(
+                arrays['min_change'][rows], fields['start_change_percent'])
+            arrays['max_change'][rows] = np.fmax(
+                arrays['max_change'][rows], fields['start_change_percent'])
+
+        arrays['high'][rows] = high
+        arrays['low'][rows] = low
+        arrays['close'][rows] = close
+        arrays['date'][rows] = dates
+
+        return fields
+
+
+    def largest_change(self, tickers: list) -> np.ndarray:
+        """
+        Largest absolute percentage change since the first close of each
+        ticker, as in Fields.generate_trend_strength.
+
+        Parameters
+        ----------
+        tickers : List
+            List of tickers, represented as strings.
+
+        Returns
+        -------
+        Array
+            One entry per ticker.
+
+        """
+        rows = [self.positions[ticker] for ticker in tickers]
+
+        return np.maximum(np.abs(self.arrays['min_change'][rows]),
+                          self.arrays['max_change'][rows])
+
+
+class IncrementalUpdate():
+    """
+    Append new price bars to the key tables, calculating the fields of each
+    new bar from the indicator state and updating only the affected rows of
+    the Trend Strength table
+
+    """
+    @classmethod
+    def update(
+        cls,
+        params: dict,
+        tables: dict,
+        state: IndicatorState | None,
+        new_bars: dict) -> tuple[dict, IndicatorState]:
+        """
+        Add the new bars to raw_ticker_dict, ticker_dict, barometer,
+        rank_index, flag_tallies and sector_cube.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+        tables : Dict
+            Dictionary of key tables, with the barometer already calculated.
+        state : IndicatorState or None
+            The indicator state at the last bar of each ticker. If None it
+            is calculated from raw_ticker_dict.
+        new_bars : Dict
+            Dictionary of DataFrames of Open, High, Low and Close prices
+            indexed by date, one for each ticker to update.
+
+        Returns
+        -------
+        tables : Dict
+            Dictionary of key tables.
+        state : IndicatorState
+            The indicator state at the new last bar of each ticker.
+
+        """
+        if state is None:
+            state = IndicatorState.from_ticker_dict(
+                params=params, ticker_dict=tables['raw_ticker_dict'])
+
+        new_bars = cls._check_bars(state, new_bars)
+        if not new_bars:
+            return tables, state
+
+        # The fields of a panel are fixed in size, so hold the updated
+        # frames in a plain dictionary instead
+        if isinstance(tables['ticker_dict'], PanelDict):
+            tables['ticker_dict'] = dict(tables['ticker_dict'].items())
+            tables.pop('panel', None)
+
+        # The frames of a snapshot are read-only views of its files
+        for name in ('raw_ticker_dict', 'ticker_dict'):
+            if isinstance(tables[name], SnapshotDict):
+                tables[name] = dict(tables[name].items())
+
+        warm = state.warm()
+        warm_bars = {ticker: bars for ticker, bars in new_bars.items()
+                     if warm[state.positions[ticker]]}
+        cold_bars = {ticker: bars for ticker, bars in new_bars.items()
+                     if ticker not in warm_bars}
+
+        # Calculate the new rows from the state where it is initialised
+        appended = {}
+        latest = []
+        for tickers, rows in cls._advance(state, warm_bars):
+            for num, ticker in enumerate(tickers):
+                appended.setdefault(ticker, []).append(rows.iloc[num:num + 1])
+            latest.append(rows.set_axis(tickers))
+        for ticker, bars in warm_bars.items():
+            frame = tables['ticker_dict'][ticker]
+            new_rows = [row if row.columns.equals(frame.columns)
+                        else row[frame.columns] for row in appended[ticker]]
+            cls._append(tables, ticker, bars, pd.concat([frame] + new_rows))
+
+        # Otherwise recalculate the full history of the ticker
+        if cold_bars:
+            cls._recalculate(params, tables, state, cold_bars)
+            latest.extend(
+                [tables['ticker_dict'][ticker].iloc[-1:].set_axis([ticker])
+                 for ticker in cold_bars])
+
+        # Keep the last new row of each ticker
+        latest = pd.concat(latest)
+        latest = latest[~latest.index.duplicated(keep='last')]
+
+        tables['barometer'] = cls.update_barometer(
+            params=params, barometer=tables['barometer'], latest=latest,
+            largest_change=state.largest_change(list(latest.index)),
+            ticker_order=list(tables['ticker_dict']))
+        tables['rank_index'] = BarometerIndex(tables['barometer'])
+        tables['flag_tallies'] = FlagTallies(tables['barometer'])
+        tables['sector_cube'] = SectorCube(
+            tables['barometer'], SectorCube.sector_names(params))
+
+        return tables, state
+
+
+    @staticmethod
+    def _check_bars(
+        state: IndicatorState,
+        new_bars: dict) -> dict:
+
+        checked = {}
+        for ticker, bars in new_bars.items():
+            if ticker not in state.positions:
+                print("Ticker "+str(ticker)+" is not in the universe")
+                continue
+            if len(bars) == 0:
+                continue
+            bars = bars.sort_index()
+            bars.index = pd.DatetimeIndex(bars.index)
+            if bars.index[0].value <= state.arrays['date'][
+                state.positions[ticker]]:
+                raise ValueError(
+                    "New bars for "+str(ticker)+" must be after the last "
+                    "date held")
+            checked[ticker] = bars
+
+        return checked
+
+
+    @staticmethod
+    def _advance(
+        state: IndicatorState,
+        new_bars: dict) -> list:
+
+        # Step every ticker forward one bar at a time, so the nth bar of
+        # each ticker is calculated together
+        steps = []
+        num_steps = max((len(bars) for bars in new_bars.values()), default=0)
+        for step in range(num_steps):
+            tickers = [ticker for ticker, bars in new_bars.items()
+                       if len(bars) > step]
+            rows = np.array(
+                [state.positions[ticker] for ticker in tickers], dtype=int)
+            dates = pd.DatetimeIndex(
+                [new_bars[ticker].index[step] for ticker in tickers])
+            bars = {column: np.array(
+                [new_bars[ticker][column].iloc[step] for ticker in tickers],
+                dtype=float) for column in PRICE_COLUMNS}
+
+            fields = state.advance(
+                rows=rows, dates=dates.as_unit('ns').asi8, bars=bars)
+            steps.append((tickers, pd.DataFrame(fields, index=dates)))
+
+        return steps
+
+
+    @staticmethod
+    def _append(
+        tables: dict,
+        ticker: str,
+        bars: pd.DataFrame,
+        frame: pd.DataFrame) -> None:
+
+        # Fields.generate_fields adds the fields to the price DataFrames, so
+        # raw_ticker_dict may hold the same frames as ticker_dict
+        raw = tables['raw_ticker_dict'][ticker]
+        if raw is tables['ticker_dict'][ticker]:
+            tables['raw_ticker_dict'][ticker] = frame
+        else:
+            tables['raw_ticker_dict'][ticker] = pd.concat(
+                [raw, bars.reindex(columns=raw.columns)])
+        tables['ticker_dict'][ticker] = frame
+
+
+    @classmethod
+    def _recalculate(
+        cls,
+        params: dict,
+        tables: dict,
+        state: IndicatorState,
+        new_bars: dict) -> None:
+
+        raw_ticker_dict = {}
+        for ticker, bars in new_bars.items():
+            raw = tables['raw_ticker_dict'][ticker]
+            raw_ticker_dict[ticker] = pd.concat(
+                [raw[PRICE_COLUMNS], bars[PRICE_COLUMNS]])
+
+        panel = PanelFields.generate_fields(
+            params=params,
+            panel=PricePanel.from_ticker_dict(raw_ticker_dict))
+        for ticker, bars in new_bars.items():
+            cls._append(tables, ticker, bars, panel.frame(ticker))
+
+        state.replace(IndicatorState.from_ticker_dict(
+            params=params, ticker_dict=raw_ticker_dict))
+
+
+    @staticmethod
+    def update_barometer(
+        params: dict,
+        barometer: pd.DataFrame,
+        latest: pd.DataFrame,
+        largest_change: np.ndarray,
+        ticker_order: list) -> pd.DataFrame:
+        """
+        Update the rows of the Trend Strength table for the selected
+        tickers, keeping the order of Fields.generate_trend_strength.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker.
+        latest : DataFrame
+            The latest indicator fields of each updated ticker, indexed by
+            ticker. Missing trend flags are taken as 0.
+        largest_change : Array
+            Largest absolute percentage change since the first close of each
+            updated ticker, in the order of latest.
+        ticker_order : List
+            The order of the tickers in ticker_dict, which the full
+            calculation sorts from.
+
+        Returns
+        -------
+        barometer : DataFrame
+            The updated Trend Strength table.
+
+        """
+        trend_flags = params['trend_flags']
+        tickers = list(latest.index)
+        barometer = barometer.set_index('Ticker')
+
+        # Keep the dtype of the flags, which may have been compacted
+        barometer.loc[tickers, trend_flags] = latest.reindex(
+            columns=trend_flags, fill_value=0).to_numpy(
+                dtype=np.result_type(*barometer.dtypes[trend_flags]))
+        barometer.loc[tickers, 'largest_change'] = largest_change
+
+        # Sum the same columns as Fields.generate_trend_strength, the 29
+        # after the names, which take in largest_change with fewer flags
+        barometer['Trend Strength'] = barometer[
+            ['Long_name'] + trend_flags + ['largest_change']].iloc[
+                :, 1:30].sum(axis=1)
+        barometer['Absolute Trend Strength'] = np.abs(
+            barometer['Trend Strength'])
+        barometer['Trend Color'] = np.where(
+            barometer['Absolute Trend Strength'] < 5, 'red', np.where(
+                barometer['Absolute Trend Strength'] < 10, 'orange',
+                'green'))
+        barometer['Trend Strength %'] = (
+            barometer['Trend Strength'] / len(trend_flags))
+        barometer['Absolute Trend Strength %'] = (
+            barometer['Absolute Trend Strength'] / len(trend_flags))
+
+        # Sort from the ticker order of ticker_dict on the object column
+        # the full calculation sorts, so that ties keep the same order
+        barometer = barometer.reindex(
+            [ticker for ticker in ticker_order if ticker in barometer.index])
+        barometer = barometer.sort_values(
+            by=['Trend Strength'], ascending=False,
+            key=lambda column: column.astype(object))
+
+        return barometer.reset_index()
@@ -0,0 +1,220 @@
+"""
+Record the wall time, CPU time and memory used by each pipeline stage and
+chart
+
+"""
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Iterator
+try:
+    import resource
+except ImportError: # pragma: no cover - not available on Windows
+    resource = None
+
+
+class StageTimer():
+    """
+    Measure named blocks of work, storing the latest record of each stage
+    and chart type in timings, so that long-lived objects do not grow with
+    every chart drawn, and passing every record to an optional hook.
+
+    Parameters
+    ----------
+    trace_memory : Bool, optional
+        Whether to trace the peak Python memory allocated in each block
+        with tracemalloc, which slows the work measured. Blocks may be
+        nested or measured in several threads at once. As tracemalloc is
+        global to the process, the peak of a block includes the memory
+        allocated by other threads while it runs. The default is False.
+    hook : Callable, optional
+        Function called with the name and record of each block when it
+        finishes, eg to forward the timings to a metrics system. The
+        default is None.
+
+    """
+    def __init__(
+        self,
+        trace_memory: bool = False,
+        hook: Callable[[str, dict], None] | None = None) -> None:
+
+        self.trace_memory = trace_memory
+        self.hook = hook
+
+        # Latest record of each pipeline stage and chart type
+        self.timings = {'stages': {}, 'charts': {}}
+
+
+    @contextmanager
+    def measure(self, name: str, kind: str = 'stage') -> Iterator[dict]:
+        """
+        Measure the block of work in the context.
+
+        Parameters
+        ----------
+        name : Str
+            The name of the stage or chart type.
+        kind : Str, optional
+            'stage' or 'chart'. The default is 'stage'.
+
+        Yields
+        ------
+        record : Dict
+            name : Str
+                The name of the stage or chart type.
+            kind : Str
+                'stage' or 'chart'.
+            started : Float
+                Unix time the block started.
+            wall : Float
+                Elapsed seconds.
+            cpu : Float
+                CPU seconds used by the process.
+            peak_mb : Float or None
+                Peak traced memory in MB if trace_memory is selected.
+            max_rss_mb : Float or None
+                High water mark of the process resident memory in MB.
+            error : Str or None
+                The exception raised, if any.
+
+        """
+        record = {
+            'name': name,
+            'kind': kind,
+            'started': time.time(),
+            'wall': None,
+            'cpu': None,
+            'peak_mb': None,
+            'max_rss_mb': None,
+            'error': None
+            }
+
+        block = MemoryPeaks.open() if self.trace_memory else None
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        except BaseException as err:
+            record['error'] = repr(err)
+            raise
+        finally:
+            record['wall'] = time.perf_counter() - wall
+            record['cpu'] = time.process_time() - cpu
+            if block is not None:
+                record['peak_mb'] = MemoryPeaks.close(block) / 2**20
+            record['max_rss_mb'] = self.max_rss_mb()
+            self._store(name, kind, record)
+
+
+    def _store(self, name: str, kind: str, record: dict) -> None:
+
+        if kind == 'chart':
+            self.timings['charts'][name] = record
+        else:
+            self.timings['stages'][name] = record
+
+        if self.hook is not None:
+            self.hook(name, record)
+
+
+    @staticmethod
+    def max_rss_mb() -> float | None:
+        """
+        High water mark of the resident memory of the process.
+
+        Returns
+        -------
+        Float or None
+            Megabytes, or None where this is not available.
+
+        """
+        if resource is None:
+            return None
+
+        # Reported in bytes on macOS and kilobytes elsewhere
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            return max_rss / 2**20
+
+        return max_rss / 2**10
+
+
+class MemoryPeaks():
+    """
+    Peak traced memory of the blocks being measured, by any StageTimer in
+    any thread. Tracing starts when the first block opens and stops when
+    the last one closes, unless it was already started elsewhere. Before
+    the tracemalloc peak is reset for a new block, the peak reached so far
+    is kept for every open block.
+
+    """
+    _lock = threading.Lock()
+
+    # Peak of each open block, keyed by a token for the block
+    _open = {}
+
+    # Whether tracing was started here rather than by the caller
+    _started = False
+
+
+    @classmethod
+    def open(cls) -> object:
+        """
+        Start measuring the peak memory of a block.
+
+        Returns
+        -------
+        Object
+            Token for the block, passed to close.
+
+        """
+        block = object()
+        with cls._lock:
+            if not cls._open and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                cls._started = True
+            cls._record_peak()
+            tracemalloc.reset_peak()
+            cls._open[block] = 0
+
+        return block
+
+
+    @classmethod
+    def close(cls, block: object) -> int:
+        """
+        Finish measuring the peak memory of a block.
+
+        Parameters
+        ----------
+        block : Object
+            Token returned by open.
+
+        Returns
+        -------
+        Int
+            Peak traced memory in bytes while the block was open.
+
+        """
+        with cls._lock:
+            cls._record_peak()
+            peak = cls._open.pop(block)
+            if not cls._open and cls._started:
+                tracemalloc.stop()
+                cls._started = False
+
+        return peak
+
+
+    @classmethod
+    def _record_peak(cls) -> None:
+
+        # Tracing may have been stopped by the caller
+        if not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for block, block_peak in cls._open.items():
+            cls._open[block] = max(block_peak, peak)
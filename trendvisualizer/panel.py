@@ -0,0 +1,759 @@
+"""
+Aligned panel of prices and indicator fields for all tickers, with
+vectorized indicator calculations
+
+"""
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+
+class PricePanel():
+    """
+    Prices and indicator fields for every ticker held as one date x ticker
+    array per field, aligned on the union of all dates.
+
+    Parameters
+    ----------
+    dates : DatetimeIndex
+        The union of the dates of all tickers.
+    tickers : List
+        List of tickers, represented as strings.
+    fields : Dict
+        Dictionary of date x ticker arrays, one for each field.
+    mask : Array
+        Boolean date x ticker array, True where the ticker has a price bar.
+
+    """
+    def __init__(
+        self,
+        dates: pd.DatetimeIndex,
+        tickers: list,
+        fields: dict,
+        mask: np.ndarray) -> None:
+
+        self.dates = dates
+        self.tickers = list(tickers)
+        self.fields = fields
+        self.mask = mask
+        self._ticker_loc = {
+            ticker: num for num, ticker in enumerate(self.tickers)}
+
+        # Row order which moves each ticker's bars to the bottom of its
+        # column, used to pack the columns for recursive calculations
+        self._pack_order = np.argsort(mask, axis=0, kind='stable')
+
+
+    @classmethod
+    def from_ticker_dict(
+        cls,
+        ticker_dict: dict,
+        columns: list | None = None) -> 'PricePanel':
+        """
+        Create a panel from a dictionary of DataFrames.
+
+        Parameters
+        ----------
+        ticker_dict : Dict
+            Dictionary of price history DataFrames, one for each ticker.
+        columns : List, optional
+            The columns to include. The default is None which takes the
+            columns of the first DataFrame.
+
+        Returns
+        -------
+        PricePanel
+            The aligned panel.
+
+        """
+        tickers = list(ticker_dict)
+        if columns is None:
+            columns = list(ticker_dict[tickers[0]].columns)
+
+        # Union of all the dates
+        dates = ticker_dict[tickers[0]].index
+        for frame in ticker_dict.values():
+            if not frame.index.equals(dates):
+                dates = dates.union(frame.index)
+
+        fields = {column: np.full((len(dates), len(tickers)), np.nan)
+                  for column in columns}
+        mask = np.zeros((len(dates), len(tickers)), dtype=bool)
+
+        for num, ticker in enumerate(tickers):
+            frame = ticker_dict[ticker]
+            rows = dates.get_indexer(frame.index)
+            mask[rows, num] = True
+            for column in columns:
+                fields[column][rows, num] = frame[column].to_numpy(
+                    dtype=float)
+
+        return cls(dates=dates, tickers=tickers, fields=fields, mask=mask)
+
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.fields[field]
+
+
+    def __setitem__(self, field: str, values: np.ndarray) -> None:
+        self.fields[field] = values
+
+
+    @property
+    def columns(self) -> list:
+        """
+        List of the fields in the panel, in the order they were added.
+
+        """
+        return list(self.fields)
+
+
+    def wide(self, field: str) -> pd.DataFrame:
+        """
+        Date x ticker DataFrame of a single field.
+
+        Parameters
+        ----------
+        field : Str
+            The field, eg 'Close'.
+
+        Returns
+        -------
+        DataFrame
+            The field for every ticker, NaN where a ticker has no bar.
+
+        """
+        return pd.DataFrame(
+            self.fields[field], index=self.dates, columns=self.tickers)
+
+
+    def block(self, fields: list | None = None) -> np.ndarray:
+        """
+        Date x ticker x field array of the selected fields.
+
+        Parameters
+        ----------
+        fields : List, optional
+            The fields to include. The default is None which takes all of
+            them.
+
+        Returns
+        -------
+        Array
+            The stacked fields.
+
+        """
+        if fields is None:
+            fields = self.columns
+
+        return np.stack([self.fields[field] for field in fields], axis=2)
+
+
+    def pack(self, values: np.ndarray) -> np.ndarray:
+        """
+        Move each ticker's bars to the bottom of its column so that every
+        column is a gap free series preceded by NaN padding.
+
+        Parameters
+        ----------
+        values : Array
+            Date x ticker array.
+
+        Returns
+        -------
+        Array
+            The packed array.
+
+        """
+        packed = np.take_along_axis(values, self._pack_order, axis=0)
+        packed[~np.take_along_axis(self.mask, self._pack_order, axis=0)] = (
+            np.nan)
+
+        return packed
+
+
+    def unpack(self, packed: np.ndarray) -> np.ndarray:
+        """
+        Reverse pack, returning values to their dates. Dates without a bar
+        are set to NaN.
+
+        Parameters
+        ----------
+        packed : Array
+            Packed date x ticker array.
+
+        Returns
+        -------
+        Array
+            Date x ticker array aligned on the panel dates.
+
+        """
+        values = np.empty(packed.shape)
+        np.put_along_axis(values, self._pack_order, packed, axis=0)
+        values[~self.mask] = np.nan
+
+        return values
+
+
+    def frame(self, ticker: str) -> pd.DataFrame:
+        """
+        DataFrame of every field for a single ticker, in the layout of the
+        ticker_dict DataFrames.
+
+        Parameters
+        ----------
+        ticker : Str
+            The ticker.
+
+        Returns
+        -------
+        DataFrame
+            The fields for the dates on which the ticker has a bar.
+
+        """
+        num = self._ticker_loc[ticker]
+        rows = self.mask[:, num]
+        columns = self.columns
+
+        # Keep the dtype of each field if the panel has been compacted
+        if any(values.dtype != np.float64 for values in self.fields.values()):
+            return pd.DataFrame(
+                {field: self.fields[field][rows, num] for field in columns},
+                index=self.dates[rows])
+
+        values = np.column_stack(
+            [self.fields[field][rows, num] for field in columns])
+        frame = pd.DataFrame(values, index=self.dates[rows], columns=columns)
+
+        # Flags are integers in the per ticker calculation
+        flags = [num for num, field in enumerate(columns)
+                 if field.endswith('_flag')]
+        if flags:
+            flag_names = [columns[num] for num in flags]
+            frame = pd.concat(
+                [frame.drop(columns=flag_names),
+                 pd.DataFrame(values[:, flags].astype(np.int64),
+                              index=frame.index, columns=flag_names)],
+                axis=1)[columns]
+
+        return frame
+
+
+    def ticker_dict(self) -> 'PanelDict':
+        """
+        Dictionary style view of the panel, one DataFrame per ticker.
+
+        Returns
+        -------
+        PanelDict
+            Mapping of ticker to DataFrame.
+
+        """
+        return PanelDict(self)
+
+
+    def normalized(
+        self,
+        tickers: list,
+        days: int,
+        names: dict | None = None,
+        field: str = 'Close') -> pd.DataFrame:
+        """
+        Prices for the selected tickers over the last n days normalized to
+        start from 100, as Formatting.create_normalized_data. The dates are
+        those of the first ticker and gaps are forward filled.
+
+        Parameters
+        ----------
+        tickers : List
+            List of tickers, represented as strings.
+        days : Int
+            Number of days of history.
+        names : Dict, optional
+            Dictionary mapping ticker to the column label. The default is
+            None which uses the tickers.
+        field : Str, optional
+            The field to normalize. The default is 'Close'.
+
+        Returns
+        -------
+        tenor : DataFrame
+            DataFrame of normalized prices.
+
+        """
+        cols = [self._ticker_loc[ticker] for ticker in tickers]
+        rows = self.mask[:, cols[0]]
+        tenor = pd.DataFrame(
+            self.fields[field][rows][:, cols],
+            index=self.dates[rows],
+            columns=tickers)
+
+        if names is not None:
+            tenor = tenor.rename(columns=names)
+
+        tenor = tenor.ffill()[-days:]
+
+        return tenor.div(tenor.iloc[0]).mul(100)
+
+
+class PanelDict(Mapping):
+    """
+    Read-only dictionary of DataFrames, one for each ticker, built from a
+    PricePanel on first access
+
+    """
+    def __init__(self, panel: PricePanel) -> None:
+        self.panel = panel
+        self._frames = {}
+
+
+    def __getitem__(self, ticker: str) -> pd.DataFrame:
+        if ticker not in self._frames:
+            if ticker not in self.panel._ticker_loc: # pylint: disable=protected-access
+                raise KeyError(ticker)
+            self._frames[ticker] = self.panel.frame(ticker)
+
+        return self._frames[ticker]
+
+
+    def __iter__(self):
+        return iter(self.panel.tickers)
+
+
+    def __len__(self) -> int:
+        return len(self.panel.tickers)
+
+
+    def __getstate__(self) -> dict:
+
+        # The frames can be rebuilt from the panel, so are not pickled
+        return {'panel': self.panel, '_frames': {}}
+
+
+class PanelIndicators():
+    """
+    Technical indicators calculated for every column of a packed date x
+    ticker array at once. Each follows the same steps as the per series
+    versions in technicalmethods so the results match.
+
+    """
+    @staticmethod
+    def shift(values: np.ndarray) -> np.ndarray:
+        """
+        Shift each column down one row, as pandas Series.shift().
+
+        """
+        shifted = np.empty(values.shape)
+        shifted[0] = np.nan
+        shifted[1:] = values[:-1]
+
+        return shifted
+
+
+    @staticmethod
+    def EMA( # pylint: disable=invalid-name
+        input_series: np.ndarray,
+        time_period: int,
+        wilder: bool = False,
+        average: bool = True,
+        slow_macd: int | None = None) -> np.ndarray:
+        """
+        Exponentially Weighted Moving Average of each column, starting from
+        the first valid value in the column.
+
+        """
+        rows, cols = input_series.shape
+        valid = ~np.isnan(input_series)
+        has_data = valid.any(axis=0)
+        start = np.where(has_data, valid.argmax(axis=0), rows)
+
+        if slow_macd is not None:
+            start = start + slow_macd - time_period
+
+        # Row on which each column is initialised
+        init = start + time_period - 1
+        alpha = 2 / (time_period + 1)
+
+        output_series = np.full(input_series.shape, np.nan)
+
+        for col in np.flatnonzero(has_data & (init < rows)):
+            if average:
+                # Initialize with Simple Moving Average
+                output_series[init[col], col] = np.ascontiguousarray(
+                    input_series[start[col]:start[col] + time_period, col]
+                    ).mean()
+            else:
+                # Initialize with sum
+                window = np.ascontiguousarray(
+                    input_series[start[col]:init[col], col])
+                output_series[init[col], col] = (
+                    window.sum()
+                    - (window.sum() / time_period)
+                    + input_series[init[col], col])
+
+        if not (has_data & (init < rows)).any():
+            return output_series
+
+        for row in range(int(init[has_data & (init < rows)].min()) + 1, rows):
+            prev = output_series[row - 1]
+
+            if average:
+                if wilder:
+                    smoothed = (
+                        (input_series[row] + prev * (time_period - 1))
+                        / time_period)
+                else:
+                    smoothed = (
+                        input_series[row] * alpha + (prev * (1 - alpha)))
+            else:
+                smoothed = input_series[row] + prev - (prev / time_period)
+
+            # Keep the initial value on each column's initialisation row.
+            # Rows before this are NaN as the previous value is NaN.
+            output_series[row] = np.where(
+                init == row, output_series[row], smoothed)
+
+        return output_series
+
+
+    @classmethod
+    def true_range(
+        cls,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray) -> np.ndarray:
+        """
+        1 day True Range of each column.
+
+        """
+        prev_close = cls.shift(close)
+        high_low = high - low
+        high_close = np.abs(high - prev_close)
+        close_low = np.abs(low - prev_close)
+
+        # np.maximum propagates NaN as the maximum with skipna=False
+        return np.maximum(np.maximum(high_low, high_close), close_low)
+
+
+    @classmethod
+    def MACD( # pylint: disable=invalid-name
+        cls,
+        close: np.ndarray,
+        fast: int,
+        slow: int,
+        signal: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        MACD line, Signal line and Histogram of each column.
+
+        """
+        components = cls.macd_components(
+            close=close, fast=fast, slow=slow, signal=signal)
+
+        return (components['macd'], components['signal'],
+                components['histogram'])
+
+
+    @classmethod
+    def macd_components(
+        cls,
+        close: np.ndarray,
+        fast: int,
+        slow: int,
+        signal: int) -> dict:
+        """
+        Fast and slow EMAs, MACD line, Signal line and Histogram of each
+        column.
+
+        """
+        ema_fast = cls.EMA(
+            input_series=close, time_period=fast, slow_macd=slow)
+        ema_slow = cls.EMA(input_series=close, time_period=slow)
+        macd = ema_fast - ema_slow
+        signal_line = cls.EMA(macd, time_period=signal)
+        histogram = macd - signal_line
+
+        return {'ema_fast': ema_fast, 'ema_slow': ema_slow, 'macd': macd,
+                'signal': signal_line, 'histogram': histogram}
+
+
+    @classmethod
+    def RSI( # pylint: disable=invalid-name
+        cls,
+        close: np.ndarray,
+        time_period: int) -> np.ndarray:
+        """
+        Relative Strength Index of each column.
+
+        """
+        components = cls.rsi_components(close=close, time_period=time_period)
+
+        return components['rsi']
+
+
+    @classmethod
+    def rsi_components(
+        cls,
+        close: np.ndarray,
+        time_period: int) -> dict:
+        """
+        Average gain, average loss and Relative Strength Index of each
+        column.
+
+        """
+        change = close - cls.shift(close)
+        gain = np.where(
+            np.isnan(change), np.nan, np.where(change > 0, change, 0))
+        loss = np.where(
+            np.isnan(change), np.nan, np.where(change < 0, -change, 0))
+
+        gain_avg = cls.EMA(
+            input_series=gain, time_period=time_period, wilder=True)
+        loss_avg = cls.EMA(
+            input_series=loss, time_period=time_period, wilder=True)
+
+        relative_strength = gain_avg / loss_avg
+
+        return {'gain': gain_avg, 'loss': loss_avg,
+                'rsi': 100 - 100 / (1 + relative_strength)}
+
+
+    @classmethod
+    def ADX( # pylint: disable=invalid-name
+        cls,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        time_period: int) -> np.ndarray:
+        """
+        Average Directional Movement Index of each column.
+
+        """
+        components = cls.adx_components(
+            high=high, low=low, close=close, time_period=time_period)
+
+        return components['adx']
+
+
+    @classmethod
+    def adx_components(
+        cls,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        time_period: int) -> dict:
+        """
+        Smoothed true range, smoothed directional movements and Average
+        Directional Movement Index of each column.
+
+        """
+        t_range = cls.true_range(high, low, close)
+        tr_period = cls.EMA(
+            input_series=t_range, time_period=time_period,
+            wilder=True, average=False)
+
+        # Directional Movement
+        high_diff = high - cls.shift(high)
+        low_diff = low - cls.shift(low)
+        pos_shift = np.where(
+            high_diff > 0, high_diff,
+            np.where(np.isnan(high_diff), np.nan, 0))
+        neg_shift = np.where(
+            low_diff < 0, -low_diff,
+            np.where(np.isnan(low_diff), np.nan, 0))
+        dm_plus_1 = np.where(
+            np.isnan(pos_shift), np.nan,
+            np.where(pos_shift > neg_shift, pos_shift, 0))
+        dm_minus_1 = np.where(
+            np.isnan(neg_shift), np.nan,
+            np.where(pos_shift < neg_shift, neg_shift, 0))
+        dm_plus_period = cls.EMA(
+            input_series=dm_plus_1, time_period=time_period, wilder=True,
+            average=False)
+        dm_minus_period = cls.EMA(
+            input_series=dm_minus_1, time_period=time_period, wilder=True,
+            average=False)
+
+        di_plus_period = (dm_plus_period / tr_period) * 100
+        di_minus_period = (dm_minus_period / tr_period) * 100
+        di_diff = np.abs(di_plus_period - di_minus_period)
+        di_sum = di_plus_period + di_minus_period
+        dir_index = (di_diff / di_sum) * 100
+
+        return {'true_range': tr_period, 'dm_plus': dm_plus_period,
+                'dm_minus': dm_minus_period,
+                'adx': cls.EMA(input_series=dir_index,
+                               time_period=time_period, wilder=True)}
+
+
+    @classmethod
+    def ATR( # pylint: disable=invalid-name
+        cls,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        time_period: int) -> np.ndarray:
+        """
+        Average True Range of each column.
+
+        """
+        return cls.EMA(
+            input_series=cls.true_range(high, low, close),
+            time_period=time_period, wilder=True)
+
+
+    @staticmethod
+    def breakout(
+        high: np.ndarray,
+        low: np.ndarray,
+        time_period: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        n-day lows, highs and breakout flag of each column.
+
+        """
+        nd_low = pd.DataFrame(low).rolling(time_period).min().to_numpy()
+        nd_high = pd.DataFrame(high).rolling(time_period).max().to_numpy()
+
+        rows, _ = high.shape
+        valid = ~np.isnan(nd_high)
+        start = np.where(valid.any(axis=0), valid.argmax(axis=0), rows)
+
+        flag = np.zeros(high.shape)
+        for row in range(1, rows):
+            up_flag = (high[row] >= nd_high[row-1]) | (
+                (flag[row-1] == 1) & (low[row] > nd_low[row-1]))
+            down_flag = (low[row] <= nd_low[row-1]) | (
+                (flag[row-1] == -1) & (high[row] < nd_high[row-1]))
+            new_flag = np.where(down_flag, -1, np.where(up_flag, 1, 0))
+            flag[row] = np.where(row > start, new_flag, 0)
+
+        return nd_low, nd_high, flag
+
+
+class PanelFields():
+    """
+    Create the trend strength fields for every ticker in a PricePanel with
+    vectorized calculations
+
+    """
+    @classmethod
+    def generate_fields(
+        cls,
+        params: dict,
+        panel: PricePanel) -> PricePanel:
+        """
+        Add the same trend indicators as Fields.generate_fields to the panel,
+        in the same column order.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters, including the tenor lists
+            ma_list, price_cross_list, macd_params, adx_list, ma_cross_list,
+            rsi_list, breakout_list and atr_list.
+        panel : PricePanel
+            Panel of Open, High, Low and Close prices.
+
+        Returns
+        -------
+        panel : PricePanel
+            The panel updated with the indicator fields.
+
+        """
+        ind = PanelIndicators
+        close = panel['Close']
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+
+            # Moving averages use a calendar day window so are taken over
+            # the dates of the panel
+            for tenor in params['ma_list']:
+                panel['MA_'+str(tenor)] = np.where(
+                    panel.mask,
+                    panel.wide('Close').rolling(
+                        window=str(tenor)+'D').mean().to_numpy(),
+                    np.nan)
+
+            # Flag for price crossing moving average
+            for tenor in params['price_cross_list']:
+                panel['PX_MA_'+str(tenor)+'_flag'] = cls._masked(
+                    panel, np.where(close > panel['MA_'+str(tenor)], 1, -1))
+
+            # The remaining indicators are recursive over each ticker's bars
+            # so are calculated on the packed columns
+            high = panel.pack(panel['High'])
+            low = panel.pack(panel['Low'])
+            packed_close = panel.pack(close)
+
+            macd, signal, hist = ind.MACD(
+                close=packed_close,
+                fast=params['macd_params'][0],
+                slow=params['macd_params'][1],
+                signal=params['macd_params'][2])
+            panel['MACD'] = panel.unpack(macd)
+            panel['MACD_SIGNAL'] = panel.unpack(signal)
+            panel['MACD_HIST'] = panel.unpack(hist)
+            hist_diff = hist - ind.shift(hist)
+            panel['MACD_flag'] = panel.unpack(np.where(hist_diff > 0, 1, -1))
+
+            for tenor in params['adx_list']:
+                adx = panel.unpack(ind.ADX(
+                    high=high, low=low, close=packed_close,
+                    time_period=tenor))
+                panel['ADX_'+str(tenor)] = adx
+                panel['ADX_'+str(tenor)+'_flag'] = cls._masked(
+                    panel, np.where(adx > 25, np.where(
+                        panel['PX_MA_'+str(tenor)+'_flag'] == 1, 1, -1), 0))
+
+            # Flag for fast moving average crossing slow moving average
+            for tenor_pair in params['ma_cross_list']:
+                panel['MA_'+str(tenor_pair[0])+'_'+str(
+                    tenor_pair[1])+'_flag'] = cls._masked(
+                        panel, np.where(
+                            panel['MA_'+str(tenor_pair[0])] > panel[
+                                'MA_'+str(tenor_pair[1])], 1, -1))
+
+            for tenor in params['rsi_list']:
+                rsi = panel.unpack(ind.RSI(
+                    close=packed_close, time_period=tenor))
+                panel['RSI_'+str(tenor)] = rsi
+                panel['RSI_'+str(tenor)+'_flag'] = cls._masked(
+                    panel, np.where(rsi > 70, 1, np.where(rsi < 30, -1, 0)))
+
+            for tenor in params['breakout_list']:
+                nd_low, nd_high, flag = ind.breakout(
+                    high=high, low=low, time_period=tenor)
+                panel['low_'+str(tenor)] = panel.unpack(nd_low)
+                panel['high_'+str(tenor)] = panel.unpack(nd_high)
+                panel['breakout_'+str(tenor)+'_flag'] = panel.unpack(flag)
+
+            for tenor in params['atr_list']:
+                panel['ATR_'+str(tenor)] = panel.unpack(ind.ATR(
+                    high=high, low=low, close=packed_close,
+                    time_period=tenor))
+
+            # Percentage change in closing price since the start
+            first_close = panel.unpack(np.broadcast_to(
+                cls._first_valid(packed_close, panel), close.shape))
+            panel['first_close'] = first_close
+            panel['start_change'] = close - first_close
+            panel['start_change_percent'] = (
+                panel['start_change'] / first_close * 100)
+
+        return panel
+
+
+    @staticmethod
+    def _masked(panel: PricePanel, values: np.ndarray) -> np.ndarray:
+
+        # Set dates without a bar to NaN
+        return np.where(panel.mask, values, np.nan)
+
+
+    @staticmethod
+    def _first_valid(packed: np.ndarray, panel: PricePanel) -> np.ndarray:
+
+        # The first bar of each ticker in the packed layout
+        first_row = len(packed) - panel.mask.sum(axis=0)
+        first_row = np.minimum(first_row, len(packed) - 1)
+
+        return packed[first_row, np.arange(packed.shape[1])]
@@ -0,0 +1,134 @@
+"""
+Spread the calculation of technical indicator fields across processes
+
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+
+class ParallelFields():
+    """
+    Calculate the technical indicator fields for chunks of tickers in a pool
+    of processes
+
+    """
+    # Parameters used by Fields.generate_fields, the only ones sent to the
+    # worker processes
+    field_params = [
+        'ma_list',
+        'macd_params',
+        'adx_list',
+        'ma_cross_list',
+        'price_cross_list',
+        'rsi_list',
+        'breakout_list',
+        'atr_list'
+        ]
+
+    @classmethod
+    def generate_fields(
+        cls,
+        params: dict,
+        ticker_dict: dict,
+        n_jobs: int) -> dict:
+        """
+        Create and add various trend indicators to each DataFrame in the
+        dictionary of tickers, giving the same results as
+        Fields.generate_fields. On platforms which spawn rather than fork
+        worker processes, the calling script needs an
+        if __name__ == '__main__' guard.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+        ticker_dict : Dict
+            Dictionary of price history DataFrames, one for each ticker.
+        n_jobs : Int
+            Number of processes. -1 uses all available CPUs.
+
+        Returns
+        -------
+        ticker_dict : Dict
+            Dictionary of DataFrames of each ticker updated with additional
+            trend indicators.
+
+        """
+        from trendvisdata.trend_data import Fields # pylint: disable=import-outside-toplevel
+
+        n_jobs = cls.resolve_jobs(n_jobs)
+        if n_jobs == 1 or len(ticker_dict) < 2:
+            return Fields.generate_fields(params, ticker_dict)
+
+        field_params = {key: params[key] for key in cls.field_params}
+
+        # Use several chunks per process to balance the load
+        chunks = [
+            {ticker: ticker_dict[ticker] for ticker in chunk}
+            for chunk in chunk_list(list(ticker_dict), n_jobs * 4)]
+
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+
+            # Replace each frame with the one updated in the worker process,
+            # keeping the order of the tickers
+            for chunk in executor.map(
+                Fields.generate_fields, repeat(field_params), chunks):
+                ticker_dict.update(chunk)
+
+        return ticker_dict
+
+
+    @staticmethod
+    def resolve_jobs(n_jobs: int) -> int:
+        """
+        Convert the n_jobs parameter to a number of processes.
+
+        Parameters
+        ----------
+        n_jobs : Int
+            Number of processes. -1 uses all available CPUs.
+
+        Returns
+        -------
+        Int
+            Number of processes.
+
+        """
+        if n_jobs is None or n_jobs == 0:
+            return 1
+
+        if n_jobs < 0:
+            return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+
+        return n_jobs
+
+
+def chunk_list(items: list, num_chunks: int) -> list:
+    """
+    Split a list into consecutive chunks of near equal size.
+
+    Parameters
+    ----------
+    items : List
+        The list to split.
+    num_chunks : Int
+        The maximum number of chunks.
+
+    Returns
+    -------
+    List
+        List of non-empty lists.
+
+    """
+    num_chunks = max(1, min(num_chunks, len(items)))
+    size, extra = divmod(len(items), num_chunks)
+
+    chunks = []
+    start = 0
+    for num in range(num_chunks):
+        end = start + size + (1 if num < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+
+    return [chunk for chunk in chunks if chunk]
@@ -3,11 +3,12 @@ Display pie charts of trend strength
 
 """
 
-import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
 from matplotlib import axes
 from matplotlib import font_manager as fm
+from matplotlib.artist import setp
+from trendvisualizer.barometer import FlagTallies, SectorCube
+from trendvisualizer.figures import ChartFigure, ChartStyle
 # pylint: disable=consider-using-f-string
 
 class PieCharts():
@@ -18,7 +19,8 @@ class PieCharts():
     @staticmethod
     def pie_summary(
         params: dict,
-        barometer: pd.DataFrame) -> dict:
+        barometer: pd.DataFrame,
+        tallies: FlagTallies | None = None) -> dict:
         """
         Plot pie charts for each of the 6 tenors: 10D, 20D, 30D, 50D, 100D
         and 200D for the chosen trend indicator.
@@ -31,20 +33,30 @@ class PieCharts():
                 'price_cross', 'rsi', 'breakout'.
         barometer : DataFrame
             DataFrame showing trend strength for each ticker.
+        tallies : FlagTallies, optional
+            Proportions of long, short and neutral flags for each indicator.
+            The default is None which counts them from the barometer.
 
         Returns
         -------
         Summary graph of 6 pie charts.
 
         """
+        # Count the flags of every indicator in one pass
+        tallies = FlagTallies.for_barometer(barometer, tallies)
 
         # Dictionary to store piechart parameters
         params['pie_params'] = {}
 
-        # Set style
-        plt.style.use('seaborn-v0_8-darkgrid')
-        plt.rcParams.update(params['mpl_chart_params'])
-        plt.tight_layout()
+        params = PieCharts._draw_summary(params=params, tallies=tallies)
+
+        return params
+
+
+    @staticmethod
+    def _draw_summary(
+        params: dict,
+        tallies: FlagTallies) -> dict:
 
         # Extract the relevant column prefix from the dictionary of defaults
         params['pie_params']['indicator_type_ref'] = params[
@@ -55,7 +67,9 @@ class PieCharts():
             params['indicator_type']+'_list']
 
         # Initialize the graph object
-        fig, ax1 = plt.subplots(figsize=(10, 8))#, facecolor='mediumaquamarine')
+        style = ChartStyle(params['mpl_chart_params'])
+        fig = ChartFigure.new(params, style, figsize=(10, 8))#, facecolor='mediumaquamarine')
+        ax1 = fig.subplots()
         ax1.axis('off')
 
         #plt.figure(facecolor='grey')
@@ -81,25 +95,15 @@ class PieCharts():
                     +'_'
                     +str(tenor))
 
-            # Calculate the proportion of the indicator that are long, short
-            # or neutral across the whole range of assets
-            params['pie_params']['long'] = (
-                len(barometer[barometer[params['pie_params']['indicator']
-                                        +'_flag']==1])
-                / len(barometer))
-
-            params['pie_params']['short'] = (
-                len(barometer[barometer[params['pie_params']['indicator']
-                                        +'_flag']==-1])
-                / len(barometer))
-
-            params['pie_params']['neutral'] = (
-                len(barometer[barometer[params['pie_params']['indicator']
-                                        +'_flag']==0])
-                / len(barometer))
+            # Take the proportion of the indicator that are long, short or
+            # neutral across the whole range of assets
+            (params['pie_params']['long'],
+             params['pie_params']['short'],
+             params['pie_params']['neutral']) = tallies.direction(
+                 params['pie_params']['indicator'])
 
             # Find the right spot on the plot
-            ax1 = plt.subplot(2, 3, num+1)
+            ax1 = fig.add_subplot(2, 3, num+1)
             params['pie_params']['labels'] = 'Long', 'Short', 'Neutral'
             #colors = 'wheat', 'lavender', 'lightblue'
             params['pie_params']['sizes'] = [
@@ -136,8 +140,8 @@ class PieCharts():
             percprop.set_size('medium')
             percprop.set_weight('bold')
             dirprop.set_size('small')
-            plt.setp(autotexts, fontproperties=percprop)
-            plt.setp(texts, fontproperties=dirprop)
+            setp(autotexts, fontproperties=percprop)
+            setp(texts, fontproperties=dirprop)
             autotexts[0].set_color('red')
             autotexts[1].set_color('red')
             autotexts[2].set_color('red')
@@ -154,7 +158,8 @@ class PieCharts():
             ax1.axis('equal')
 
             # Set the individual chart title
-            ax1.set_title(
+            style.title(
+                ax1,
                 str(tenor)
                 +' day '
                 +params['pie_params']['indicator_type_ref'].upper(),
@@ -176,7 +181,7 @@ class PieCharts():
                      style='italic',
                      y=1)
 
-        return params
+        return ChartFigure.finish(params, fig)
 
 
     @classmethod
@@ -217,20 +222,35 @@ class PieCharts():
         tables : Dict
             barometer : DataFrame
                 DataFrame showing trend strength for each ticker.
+            sector_cube : SectorCube, optional
+                Flag counts of each sector, aggregated from the barometer
+                if not present.
 
         Returns
         -------
         Displays the chart.
 
         """
+        # Add the sector split to a copy of the tables so that the chart
+        # leaves them unchanged
+        tables = dict(tables)
+
+        params, tables = cls._draw_breakdown(params=params, tables=tables)
+
+        ChartFigure.show(params)
+
+        return params, tables
 
-        # Set style
-        plt.style.use('seaborn-v0_8-darkgrid')
-        plt.rcParams.update(params['mpl_chart_params'])
-        plt.tight_layout()
+
+    @classmethod
+    def _draw_breakdown(
+        cls,
+        params: dict,
+        tables: dict) -> tuple[dict, dict]:
 
         # make figure and assign axis objects
-        fig = plt.figure(figsize=(10, 5))
+        style = ChartStyle(params['mpl_chart_params'])
+        fig = ChartFigure.new(params, style, figsize=(10, 5))
         gridspec = fig.add_gridspec(16, 3)
         ax1 = fig.add_subplot(gridspec[:, 0])
         ax2 = fig.add_subplot(gridspec[3:14, 1])
@@ -238,7 +258,8 @@ class PieCharts():
 
         # pie chart parameters
         params = cls._init_pie_params(
-            params=params, barometer=tables['barometer'])
+            params=params, barometer=tables['barometer'],
+            tallies=tables.get('flag_tallies'))
 
         _, ax1_texts, ax1_autotexts = ax1.pie(
             params['pie_params']['ratios'],
@@ -248,6 +269,7 @@ class PieCharts():
             wedgeprops={'edgecolor':'black',
                         'linewidth':2,
                         'antialiased':True},
+            textprops=style.text_kwargs(),
             shadow=True,
             labeldistance=1.1,
             startangle=params['pie_params']['angle'])
@@ -258,14 +280,14 @@ class PieCharts():
         percprop.set_size(params['pie_params']['pie_perc_size'])
         percprop.set_weight('bold')
         dirprop.set_size('small')
-        plt.setp(ax1_autotexts, fontproperties=percprop)
-        plt.setp(ax1_texts, fontproperties=dirprop)
+        setp(ax1_autotexts, fontproperties=percprop)
+        setp(ax1_texts, fontproperties=dirprop)
         ax1_autotexts[0].set_color(params['pie_params']['pie_perc_color'])
         ax1_autotexts[1].set_color(params['pie_params']['pie_perc_color'])
         ax1_autotexts[2].set_color(params['pie_params']['pie_perc_color'])
 
         # Set piechart title
-        ax1.set_title('Market Direction Proportions', fontsize=10)
+        style.title(ax1, 'Market Direction Proportions', fontsize=10)
 
         # Set sector names when using Norgate futures data
         if params['asset_type'] == 'CTA':
@@ -282,11 +304,13 @@ class PieCharts():
 
         # Create long breakdown
         ax2 = cls._breakdown(
-            axx=ax2, params=params, direction='long', tables=tables)
+            axx=ax2, params=params, direction='long', tables=tables,
+            style=style)
 
         # Create short breakdown
         ax3 = cls._breakdown(
-            axx=ax3, params=params, direction='short', tables=tables)
+            axx=ax3, params=params, direction='short', tables=tables,
+            style=style)
 
         # Create chart title label
         params['charttitle'] = (
@@ -304,7 +328,7 @@ class PieCharts():
                      style='italic',
                      y=0.9)
 
-        plt.show()
+        params = ChartFigure.finish(params, fig)
 
         return params, tables
 
@@ -312,7 +336,8 @@ class PieCharts():
     @staticmethod
     def _init_pie_params(
         params: dict,
-        barometer: pd.DataFrame) -> dict:
+        barometer: pd.DataFrame,
+        tallies: FlagTallies | None = None) -> dict:
 
         # Dictionary to store piechart parameters
         params['pie_params'] = {}
@@ -333,13 +358,13 @@ class PieCharts():
                 +'_'
                 +str(params['pie_tenor']))
 
-        # Calculate the proportions that are long, short or neutral
-        params['pie_params']['long'] = len(barometer[barometer[
-            params['pie_params']['indicator']+'_flag']==1]) / len(barometer)
-        params['pie_params']['short'] = len(barometer[barometer[
-            params['pie_params']['indicator']+'_flag']==-1]) / len(barometer)
-        params['pie_params']['neutral'] = len(barometer[barometer[
-            params['pie_params']['indicator']+'_flag']==0]) / len(barometer)
+        # Take the proportions that are long, short or neutral from the
+        # flag tallies
+        tallies = FlagTallies.for_barometer(barometer, tallies)
+        (params['pie_params']['long'],
+         params['pie_params']['short'],
+         params['pie_params']['neutral']) = tallies.direction(
+             params['pie_params']['indicator'])
 
         params['pie_params']['labels'] = 'Long', 'Short', 'Neutral'
         params['pie_params']['ratios'] = [params['pie_params']['long'],
@@ -365,38 +390,29 @@ class PieCharts():
         params: dict,
         tables: dict) -> tuple[dict, dict]:
 
-        # Suppress SettingWithCopyWarning caused by slicing DataFrame
-        pd.options.mode.chained_assignment = None
-
-        tables['sector_split'] = pd.crosstab(
-            index=tables['barometer'][params['pie_params']['sector_name']],
-            columns=(tables['barometer'][
-                params['pie_params']['indicator']+'_flag']),
-            margins=True)
-
-        tables['sector_split'] = tables['sector_split'].rename(
-            columns={1:'long',
-                     0:'neutral',
-                     -1:'short'})
-
+        # Look up the number of markets in each sector with each flag value
+        # from the sector cube rather than cross tabulating the barometer
+        cube = SectorCube.for_barometer(
+            barometer=tables['barometer'],
+            sector_names=SectorCube.sector_names(params),
+            cube=tables.get('sector_cube'))
+        sector_split = cube.counts(
+            params['sector_level'], params['pie_params']['indicator'])[
+                ['short', 'neutral', 'long']]
+
+        # Add the totals of each direction and sector as the last row and
+        # column
+        sector_split.loc['All'] = sector_split.sum()
+        sector_split['All'] = sector_split.sum(axis=1)
+
+        # A direction with no markets takes a total of 1 so that its
+        # proportions are 0
         for column in ['long', 'neutral', 'short']:
-            if column not in tables['sector_split'].columns:
-                tables['sector_split'][column] = np.zeros(
-                    (len(tables['sector_split'])))
-
-                tables['sector_split'][column][-1] = 1
+            sector_split[column+' proportion'] = (
+                sector_split[column]
+                / max(sector_split[column].iloc[-1], 1))
 
-        tables['sector_split']['long proportion'] = (
-            tables['sector_split']['long']
-            / tables['sector_split']['long'].iloc[-1])
-
-        tables['sector_split']['neutral proportion'] = (
-            tables['sector_split']['neutral']
-            / tables['sector_split']['neutral'].iloc[-1])
-
-        tables['sector_split']['short proportion'] = (
-            tables['sector_split']['short']
-            / tables['sector_split']['short'].iloc[-1])
+        tables['sector_split'] = sector_split
 
         tables['non_zero_split_long'] = (
             tables['sector_split'][['long proportion']])
@@ -418,9 +434,6 @@ class PieCharts():
         params['pie_params']['ratios_short'] = list(
             tables['non_zero_split_short']['short proportion'][:-1])
 
-        # Suppress SettingWithCopyWarning caused by slicing DataFrame
-        pd.options.mode.chained_assignment = "warn"
-
         return params, tables
 
 
@@ -429,7 +442,8 @@ class PieCharts():
         axx: axes.Axes,
         params: dict,
         tables: dict,
-        direction: str) -> axes.Axes:
+        direction: str,
+        style: ChartStyle) -> axes.Axes:
 
         ratios = params['pie_params']['ratios_'+direction]
         for j, value in enumerate(ratios):
@@ -451,8 +465,8 @@ class PieCharts():
                      color=params['pie_params']['bar_perc_color'],
                      fontsize=params['pie_params']['bar_perc_size'])
 
-        axx.set_title('Sector Breakdown '+direction.title(), fontsize=10)
-        axx.legend((list(
+        style.title(axx, 'Sector Breakdown '+direction.title(), fontsize=10)
+        style.legend(axx, (list(
             tables['non_zero_split_'+direction].index[:-1])),
             bbox_to_anchor= (0.5, 1),
             fontsize=6)
@@ -0,0 +1,522 @@
+"""
+Local on-disk store of price histories, refreshed incrementally from
+Norgate Data or Yahoo Finance
+
+"""
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from urllib.parse import quote
+import pandas as pd
+from trendvisualizer.concurrent_fetch import ConcurrentFetch
+
+
+class PriceStore():
+    """
+    Store of daily price histories with one Parquet or Feather file for each
+    source and ticker, and a metadata file recording the date range each
+    file covers.
+
+    Several processes may read and refresh the same store. Files are written
+    under a temporary name and renamed into place, so readers never see a
+    partly written file, and the histories written by a refresh are moved
+    into place and merged into the metadata under a lock when it is saved,
+    keeping the entries of other refreshes.
+
+    Parameters
+    ----------
+    path : Str
+        Root directory of the store.
+    source : Str
+        The source of the market data. 'norgate' or 'yahoo'.
+    file_format : Str
+        'parquet' or 'feather'. The default is 'parquet'.
+
+    """
+    def __init__(
+        self,
+        path: str,
+        source: str,
+        file_format: str = 'parquet') -> None:
+
+        if file_format not in ('parquet', 'feather'):
+            raise ValueError("file_format must be 'parquet' or 'feather'")
+
+        self.path = os.path.join(os.path.expanduser(path), source)
+        self.file_format = file_format
+        os.makedirs(self.path, exist_ok=True)
+
+        # Metadata for each ticker: the requested start date and the end date
+        # the stored history has been checked up to, plus the security name
+        self.meta_path = os.path.join(self.path, 'metadata.json')
+        self.lock_path = os.path.join(self.path, 'metadata.lock')
+        self.meta = self._read_meta()
+
+        # Temporary files of the histories written since the last save
+        self._pending = {}
+
+
+    def _read_meta(self) -> dict:
+
+        if not os.path.exists(self.meta_path):
+            return {}
+        with open(self.meta_path, encoding='utf-8') as meta_file:
+            return json.load(meta_file)
+
+
+    @contextmanager
+    def _lock(self):
+
+        # Lock the store against other processes and threads updating the
+        # metadata
+        with open(self.lock_path, 'a+b') as lock_file:
+            if os.name == 'nt':
+                import msvcrt # pylint: disable=import-outside-toplevel,import-error
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl # pylint: disable=import-outside-toplevel
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+    def _file(self, ticker: str) -> str:
+
+        # Escape characters such as '&', '$' and '/' used in ticker codes
+        return os.path.join(
+            self.path, quote(ticker, safe='') + '.' + self.file_format)
+
+
+    def read(self, ticker: str) -> pd.DataFrame | None:
+        """
+        Read the stored price history of a ticker.
+
+        Parameters
+        ----------
+        ticker : Str
+            The ticker.
+
+        Returns
+        -------
+        frame : DataFrame or None
+            The stored prices, or None if the ticker is not in the store.
+
+        """
+        filename = self._pending.get(ticker, self._file(ticker))
+        if ticker not in self.meta or not os.path.exists(filename):
+            return None
+
+        if self.file_format == 'parquet':
+            frame = pd.read_parquet(filename)
+        else:
+            frame = pd.read_feather(filename).set_index('Date')
+
+        return frame
+
+
+    def write(
+        self,
+        ticker: str,
+        frame: pd.DataFrame,
+        start_date: str,
+        end_date: str,
+        name: str | None = None) -> None:
+        """
+        Write the price history of a ticker, replacing any stored history
+        once the store is saved.
+
+        Parameters
+        ----------
+        ticker : Str
+            The ticker.
+        frame : DataFrame
+            The prices, indexed by date.
+        start_date : Str
+            The start date the prices were requested from.
+        end_date : Str
+            The end date the prices were requested up to.
+        name : Str, optional
+            The security name. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        frame = frame.copy()
+        frame.index.name = 'Date'
+
+        # Write to a temporary file, which save moves into place
+        temp = self._file(ticker) + '.' + uuid.uuid4().hex + '.tmp'
+        if self.file_format == 'parquet':
+            frame.to_parquet(temp)
+        else:
+            frame.reset_index().to_feather(temp)
+        if ticker in self._pending:
+            os.remove(self._pending[ticker])
+        self._pending[ticker] = temp
+
+        entry = self.meta.get(ticker, {})
+        entry['start'] = start_date
+        entry['checked'] = end_date
+        if name is not None:
+            entry['name'] = name
+        self.meta[ticker] = entry
+
+
+    def append(
+        self,
+        ticker: str,
+        frame: pd.DataFrame,
+        end_date: str,
+        name: str | None = None) -> pd.DataFrame:
+        """
+        Add new bars to the stored price history of a ticker. Bars already in
+        the store are replaced by the newly fetched values.
+
+        Parameters
+        ----------
+        ticker : Str
+            The ticker.
+        frame : DataFrame
+            The new prices, indexed by date.
+        end_date : Str
+            The end date the new prices were requested up to.
+        name : Str, optional
+            The security name. The default is None.
+
+        Returns
+        -------
+        combined : DataFrame
+            The full stored history including the new bars.
+
+        """
+        stored = self.read(ticker)
+        combined = pd.concat([stored, frame[stored.columns]])
+        combined = combined[~combined.index.duplicated(keep='last')]
+        combined = combined.sort_index()
+
+        self.write(
+            ticker=ticker, frame=combined,
+            start_date=self.meta[ticker]['start'], end_date=end_date,
+            name=name)
+
+        return combined
+
+
+    def fetch_start(
+        self,
+        ticker: str,
+        start_date: str,
+        end_date: str) -> tuple[str | None, bool]:
+        """
+        Find the date from which prices need to be fetched to bring the
+        stored history of a ticker up to date.
+
+        Parameters
+        ----------
+        ticker : Str
+            The ticker.
+        start_date : Str
+            The requested start date.
+        end_date : Str
+            The requested end date.
+
+        Returns
+        -------
+        fetch_date : Str or None
+            The date to fetch from, or None if the store is up to date.
+        full : Bool
+            Whether the full history needs to be fetched.
+
+        """
+        entry = self.meta.get(ticker)
+
+        # Nothing stored or the request starts before the stored history
+        if (entry is None
+            or not os.path.exists(self._file(ticker))
+            or pd.Timestamp(start_date) < pd.Timestamp(entry['start'])):
+            return start_date, True
+
+        # Fetch from the last checked date so that a partial final bar is
+        # refreshed
+        if pd.Timestamp(end_date) > pd.Timestamp(entry['checked']):
+            return entry['checked'], False
+
+        return None, False
+
+
+    def save(self) -> None:
+        """
+        Move the histories written since the last save into place and merge
+        their metadata with that on disk, which other processes may have
+        updated. A history is discarded if another refresh has since stored
+        one covering the same and later dates.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._lock():
+            meta = self._read_meta()
+
+            for ticker, temp in self._pending.items():
+                entry = self.meta[ticker]
+                stored = meta.get(ticker)
+                if (stored is not None
+                    and os.path.exists(self._file(ticker))
+                    and self._covers(stored, entry)):
+                    os.remove(temp)
+                    continue
+                os.replace(temp, self._file(ticker))
+                meta[ticker] = entry
+
+            # Replace the metadata file so that readers never see it partly
+            # written
+            temp = self.meta_path + '.' + uuid.uuid4().hex + '.tmp'
+            with open(temp, 'w', encoding='utf-8') as meta_file:
+                json.dump(meta, meta_file, indent=1, sort_keys=True)
+            os.replace(temp, self.meta_path)
+
+        self.meta = meta
+        self._pending = {}
+
+
+    @staticmethod
+    def _covers(stored: dict, entry: dict) -> bool:
+
+        # Whether a stored history starts no later and has been checked to a
+        # later date
+        return (pd.Timestamp(stored['start']) <= pd.Timestamp(entry['start'])
+                and pd.Timestamp(stored['checked'])
+                > pd.Timestamp(entry['checked']))
+
+
+class StoredExtract():
+    """
+    Extract price histories through a local PriceStore, fetching only the
+    bars after the last stored date
+
+    """
+    @classmethod
+    def import_norgate(
+        cls,
+        params: dict,
+        tables: dict,
+        mappings: dict) -> tuple[dict, dict, dict]:
+        """
+        Return dictionary of price histories from the store, refreshed from
+        Norgate Data.
+
+        Parameters
+        ----------
+        params : Dict
+            price_store : Str
+                Root directory of the price store.
+            price_store_format : Str
+                'parquet' or 'feather'.
+        tables : Dict
+            Dictionary of key tables.
+        mappings : Dict
+            Dictionary of sector mappings.
+
+        Returns
+        -------
+        params : Dict
+            Dictionary of key parameters.
+        tables : Dict
+            Dictionary of key tables.
+        mappings : Dict
+            Dictionary of sector mappings.
+
+        """
+        from trendvisdata.market_data import NorgateExtract # pylint: disable=import-outside-toplevel
+
+        store = PriceStore(
+            path=params['price_store'], source='norgate',
+            file_format=params['price_store_format'])
+
+        # Map each Norgate ticker to its lowercase key, eg '&ES' to 'c_es'
+        ticker_keys = {
+            ticker: (params['ticker_types'][ticker[0]]+ticker[1:]).lower()
+            for ticker in params['tickers'][:params['ticker_limit']]}
+
+        def fetch(sub_params: dict) -> tuple[dict, dict]:
+            sub_tables = {}
+            sub_params, sub_tables, _ = NorgateExtract.import_norgate(
+                params=sub_params, tables=sub_tables, mappings=mappings)
+            return sub_params, sub_tables['raw_ticker_dict']
+
+        params, tables = cls._import_stored(
+            params=params, tables=tables, store=store,
+            ticker_keys=ticker_keys, fetch=fetch, inclusive_end=True)
+
+        # Take the security names from the store metadata and truncate these
+        # to improve charting legibility
+        params['ticker_name_dict'] = {}
+        params['ticker_short_name_dict'] = {}
+        for key in tables['raw_ticker_dict']:
+            name = store.meta[key].get('name', key)
+            params['ticker_name_dict'][key] = name
+            params['ticker_short_name_dict'][key] = name.partition(
+                " Continuous")[0]
+
+        # Create sector mappings DataFrame
+        mappings['sector_mappings_df'] = (
+            NorgateExtract._commodity_sector_mappings( # pylint: disable=protected-access
+                params, mappings))
+
+        return params, tables, mappings
+
+
+    @classmethod
+    def import_yahoo(
+        cls,
+        params: dict,
+        tables: dict) -> tuple[dict, dict]:
+        """
+        Return dictionary of price histories from the store, refreshed from
+        Yahoo Finance.
+
+        Parameters
+        ----------
+        params : Dict
+            price_store : Str
+                Root directory of the price store.
+            price_store_format : Str
+                'parquet' or 'feather'.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        params : Dict
+            Dictionary of key parameters.
+        tables : Dict
+            Dictionary of key tables.
+
+        """
+        from trendvisdata.market_data import YahooExtract # pylint: disable=import-outside-toplevel
+
+        store = PriceStore(
+            path=params['price_store'], source='yahoo',
+            file_format=params['price_store_format'])
+
+        ticker_keys = {
+            ticker: ticker
+            for ticker in params['tickers'][:params['ticker_limit']]}
+
+        params['exceptions'] = []
+
+        def fetch(sub_params: dict) -> tuple[dict, dict]:
+            sub_tables = {}
+            if sub_params['max_workers'] is not None:
+                sub_params, sub_tables = ConcurrentFetch.import_yahoo(
+                    sub_params, sub_tables)
+                params.setdefault('download_report', {}).update(
+                    sub_params['download_report'])
+            else:
+                sub_params, sub_tables = YahooExtract.import_yahoo(
+                    sub_params, sub_tables)
+            params['exceptions'].extend(sub_params['exceptions'])
+            return sub_params, sub_tables['raw_ticker_dict']
+
+        # Yahoo Finance excludes the end date from the history returned
+        params, tables = cls._import_stored(
+            params=params, tables=tables, store=store,
+            ticker_keys=ticker_keys, fetch=fetch, inclusive_end=False)
+
+        return params, tables
+
+
+    @staticmethod
+    def _import_stored(
+        params: dict,
+        tables: dict,
+        store: PriceStore,
+        ticker_keys: dict,
+        fetch,
+        inclusive_end: bool) -> tuple[dict, dict]:
+
+        tables['raw_ticker_dict'] = {}
+
+        # Group the tickers by the date prices need to be fetched from
+        groups = {}
+        for ticker, key in ticker_keys.items():
+            fetch_date, full = store.fetch_start(
+                ticker=key, start_date=params['start_date'],
+                end_date=params['end_date'])
+            if fetch_date is not None:
+                groups.setdefault((fetch_date, full), []).append(ticker)
+
+        # Fetch each group with a copy of params covering only its tickers
+        # and dates. The window is fixed so it is not set from a partial
+        # history. The histories written are saved even if a later group
+        # fails.
+        fetched = {}
+        names = {}
+        try:
+            for (fetch_date, full), group in groups.items():
+                sub_params = dict(params)
+                sub_params.update({
+                    'tickers': group,
+                    'ticker_limit': None,
+                    'start_date': fetch_date,
+                    'window': 0})
+                sub_params, frames = fetch(sub_params)
+
+                names.update(sub_params.get('ticker_name_dict', {}))
+                for ticker in group:
+                    key = ticker_keys[ticker]
+                    if key not in frames:
+                        continue
+                    name = names.get(key)
+                    if full:
+                        store.write(
+                            ticker=key, frame=frames[key],
+                            start_date=params['start_date'],
+                            end_date=params['end_date'], name=name)
+                        fetched[key] = frames[key]
+                    else:
+                        fetched[key] = store.append(
+                            ticker=key, frame=frames[key],
+                            end_date=params['end_date'], name=name)
+        finally:
+            store.save()
+
+        from trendvisdata.market_data import MktUtils # pylint: disable=import-outside-toplevel
+
+        start = pd.Timestamp(params['start_date'])
+        end = pd.Timestamp(params['end_date'])
+
+        for key in ticker_keys.values():
+            frame = fetched.get(key)
+            if frame is None:
+                frame = store.read(key)
+            if frame is None:
+                continue
+
+            # Select the requested date range
+            if inclusive_end:
+                frame = frame[(frame.index >= start) & (frame.index <= end)]
+            else:
+                frame = frame[(frame.index >= start) & (frame.index < end)]
+            if len(frame) == 0:
+                continue
+            tables['raw_ticker_dict'][key] = frame
+
+            # Set the proper length of DataFrame to help filter out missing
+            # data
+            params = MktUtils.window_set(frame=frame, params=params)
+
+        return params, tables
@@ -0,0 +1,168 @@
+"""
+Render batches of charts to image files or bytes without displaying them
+
+"""
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from trendvisualizer.parallel import ParallelFields
+
+# TrendStrength object used by each worker process, set by the initializer
+_WORKER_TREND = None
+
+
+class ChartRenderer():
+    """
+    Render chart specs as standalone figures, which are not managed by
+    pyplot, saving each figure as PNG or SVG.
+
+    Parameters
+    ----------
+    trend : TrendStrength
+        The object whose charts are rendered.
+    image_format : Str, optional
+        'png' or 'svg'. The default is 'png'.
+    dpi : Int, optional
+        Resolution of PNG images. The default is None which uses the
+        matplotlib default.
+    n_jobs : Int, optional
+        Number of processes or threads to render in. -1 uses all available
+        CPUs. The default is 1.
+    threads : Bool, optional
+        Whether to render in a pool of threads sharing the object rather
+        than in processes which each receive a copy. The default is False.
+
+    """
+    def __init__(
+        self,
+        trend,
+        image_format: str = 'png',
+        dpi: int | None = None,
+        n_jobs: int = 1,
+        threads: bool = False) -> None:
+
+        if image_format not in ('png', 'svg'):
+            raise ValueError("image_format must be 'png' or 'svg'")
+
+        self.trend = trend
+        self.image_format = image_format
+        self.dpi = dpi
+        self.n_jobs = ParallelFields.resolve_jobs(n_jobs)
+        self.threads = threads
+
+
+    def render(self, specs: list) -> list:
+        """
+        Render each chart spec.
+
+        Parameters
+        ----------
+        specs : List
+            List of dictionaries, each with the keys:
+                chart_type : Str
+                    The type of chart, as for TrendStrength.chart.
+                kwargs : Dict, optional
+                    Parameters supplied to override the defaults.
+                path : Str, optional
+                    File to save the image to. If not supplied the image
+                    is returned as bytes.
+                image_format : Str, optional
+                    'png' or 'svg', overriding the renderer format.
+
+        Returns
+        -------
+        results : List
+            List of dictionaries in the order of the specs, each with the
+            chart_type, image_format, the image bytes or None if saved to
+            path, the path and any error raised.
+
+        """
+        specs = [self._spec_defaults(spec) for spec in specs]
+
+        # Every chart needs the Trend Strength table, so calculate it once
+        # before the object is copied to any worker processes
+        self.trend.run_stage('barometer')
+
+        if self.n_jobs == 1 or len(specs) < 2:
+            return [render_spec(self.trend, spec) for spec in specs]
+
+        if self.threads:
+            with ThreadPoolExecutor(
+                max_workers=min(self.n_jobs, len(specs))) as executor:
+                results = list(executor.map(
+                    lambda spec: render_spec(self.trend, spec), specs))
+
+            return results
+
+        with ProcessPoolExecutor(
+            max_workers=min(self.n_jobs, len(specs)),
+            initializer=_init_worker,
+            initargs=(self.trend,)) as executor:
+            results = list(executor.map(_render_worker, specs))
+
+        return results
+
+
+    def _spec_defaults(self, spec: dict) -> dict:
+
+        spec = dict(spec)
+        spec.setdefault('kwargs', {})
+        spec.setdefault('path', None)
+        spec.setdefault('image_format', self.image_format)
+        spec.setdefault('dpi', self.dpi)
+
+        return spec
+
+
+def render_spec(trend, spec: dict) -> dict:
+    """
+    Render a single chart spec in the current thread.
+
+    Parameters
+    ----------
+    trend : TrendStrength
+        The object whose chart is rendered.
+    spec : Dict
+        The chart spec, as for ChartRenderer.render, with every key set.
+
+    Returns
+    -------
+    result : Dict
+        The chart_type, image_format, image bytes, path and error.
+
+    """
+    result = {
+        'chart_type': spec['chart_type'],
+        'image_format': spec['image_format'],
+        'data': None,
+        'path': spec['path'],
+        'error': None
+        }
+
+    try:
+        figure = trend.chart_figure(spec['chart_type'], **spec['kwargs'])
+        if spec['path'] is not None:
+            figure.savefig(
+                spec['path'], format=spec['image_format'], dpi=spec['dpi'],
+                bbox_inches='tight')
+        else:
+            buffer = io.BytesIO()
+            figure.savefig(
+                buffer, format=spec['image_format'], dpi=spec['dpi'],
+                bbox_inches='tight')
+            result['data'] = buffer.getvalue()
+
+    except Exception as err: # pylint: disable=broad-except
+        result['error'] = repr(err)
+
+    return result
+
+
+def _init_worker(trend) -> None:
+
+    global _WORKER_TREND # pylint: disable=global-statement
+    _WORKER_TREND = trend
+
+
+def _render_worker(spec: dict) -> dict:
+
+    return render_spec(_WORKER_TREND, spec)
@@ -0,0 +1,268 @@
+"""
+On-disk cache of TrendStrength results keyed by the parameters and the date
+of the market data
+
+"""
+import hashlib
+import json
+import os
+import pickle
+import uuid
+import warnings
+import pandas as pd
+
+# Parameters which change how the results are produced but not the results
+RUNTIME_KEYS = [
+    'chart_template', 'lazy', 'max_retries', 'max_workers', 'n_jobs',
+    'panel', 'price_store', 'price_store_format', 'pyplot', 'result_cache',
+    'result_cache_max_mb', 'retry_backoff', 'timing_hook', 'trace_memory']
+
+
+class ResultCache():
+    """
+    Cache of the tables, top trends and chart data of TrendStrength runs,
+    with one pickle file per run named by a hash of the parameters and the
+    start and end dates of the data. The least recently used files are
+    removed once the cache exceeds its size limit.
+
+    Parameters
+    ----------
+    path : Str
+        Directory of the cache.
+    max_mb : Float, optional
+        Maximum total size of the cache in MB. The default is 2048.
+
+    """
+    def __init__(
+        self,
+        path: str,
+        max_mb: float = 2048) -> None:
+
+        self.path = os.path.expanduser(path)
+        self.max_mb = max_mb
+        os.makedirs(self.path, exist_ok=True)
+
+
+    @staticmethod
+    def key(params: dict) -> str:
+        """
+        Hash of the parameters which determine the results.
+
+        The start and end dates are resolved as the prices stage does, so
+        that without an end date the key changes with each business day.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters, as returned by
+            TrendStrength._init_params.
+
+        Returns
+        -------
+        Str
+            Hexadecimal SHA-256 digest.
+
+        """
+        from trendvisdata.market_data import MktUtils # pylint: disable=import-outside-toplevel
+
+        params = MktUtils.date_set(dict(params))
+        canonical = {key: value for key, value in params.items()
+                     if key not in RUNTIME_KEYS}
+
+        # Sort the keys so that the hash does not depend on their order
+        text = json.dumps(canonical, sort_keys=True, default=repr)
+
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+    def _file(self, key: str) -> str:
+
+        return os.path.join(self.path, key + '.pkl')
+
+
+    def get(self, key: str) -> dict | None:
+        """
+        Read a cached result, marking it as recently used.
+
+        Parameters
+        ----------
+        key : Str
+            The key of the result.
+
+        Returns
+        -------
+        Dict or None
+            The cached result, or None if there is no valid entry. An
+            entry which cannot be read is removed with a RuntimeWarning.
+
+        """
+        filename = self._file(key)
+        try:
+            with open(filename, 'rb') as cache_file:
+                entry = pickle.load(cache_file)
+            os.utime(filename)
+        except FileNotFoundError:
+            return None
+
+        # Discard entries which can no longer be read, eg after a library
+        # upgrade
+        except (pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError, TypeError, ValueError) as err:
+            warnings.warn("Removing unreadable cache entry "+key+": "
+                          +repr(err), RuntimeWarning, stacklevel=2)
+            self.remove(key)
+            return None
+
+        return entry
+
+
+    def put(self, key: str, entry: dict) -> None:
+        """
+        Store a result, then evict the least recently used results if the
+        cache is over its size limit.
+
+        Parameters
+        ----------
+        key : Str
+            The key of the result.
+        entry : Dict
+            The result to store.
+
+        Returns
+        -------
+        None.
+
+        """
+        # Write to a temporary file first so that other processes never
+        # read a partly written entry
+        temp = self._file(key) + '.' + uuid.uuid4().hex + '.tmp'
+        with open(temp, 'wb') as cache_file:
+            pickle.dump(entry, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self._file(key))
+
+        self.evict()
+
+
+    def remove(self, key: str) -> None:
+        """
+        Remove a result from the cache.
+
+        Parameters
+        ----------
+        key : Str
+            The key of the result.
+
+        Returns
+        -------
+        None.
+
+        """
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used results until the cache is within its
+        size limit.
+
+        Returns
+        -------
+        None.
+
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_mb * 2**20:
+                break
+            self.remove(name[:-len('.pkl')])
+            total -= size
+
+
+    @staticmethod
+    def last_trading_day(params: dict) -> pd.Timestamp:
+        """
+        The last date the prices can include, which is the last trading day
+        on or before the end date, or before it for Yahoo Finance, whose
+        history excludes the end date. Trading days skip weekends and the
+        New York exchange holidays.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters, with the end date set.
+
+        Returns
+        -------
+        Timestamp
+            The last trading day.
+
+        """
+        # pylint: disable=import-outside-toplevel
+        from pandas.tseries.holiday import (
+            AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay,
+            USMartinLutherKingJr, USMemorialDay, USPresidentsDay,
+            USThanksgivingDay, nearest_workday)
+
+        end_date = pd.Timestamp(params['end_date']).normalize()
+        if params['source'] == 'yahoo':
+            end_date = end_date - pd.Timedelta(days=1)
+
+        calendar = AbstractHolidayCalendar(rules=[
+            Holiday('New Years Day', month=1, day=1,
+                    observance=nearest_workday),
+            USMartinLutherKingJr, USPresidentsDay, GoodFriday,
+            USMemorialDay,
+            Holiday('Juneteenth', month=6, day=19,
+                    start_date='2022-01-01', observance=nearest_workday),
+            Holiday('Independence Day', month=7, day=4,
+                    observance=nearest_workday),
+            USLaborDay, USThanksgivingDay,
+            Holiday('Christmas', month=12, day=25,
+                    observance=nearest_workday)])
+
+        # Roll back over weekends and the holidays of the last few weeks
+        holidays = calendar.holidays(
+            start=end_date - pd.Timedelta(days=28), end=end_date)
+
+        return pd.offsets.CustomBusinessDay(
+            holidays=holidays).rollback(end_date)
+
+
+    @classmethod
+    def complete(cls, params: dict, tables: dict) -> bool:
+        """
+        Whether the prices include a bar on the last trading day they can
+        cover. Results calculated before the prices for that day are
+        available are not cached, so that they are recalculated once the
+        data arrives.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters, with the end date set.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        Bool
+            True if the results can be cached.
+
+        """
+        last_date = cls.last_trading_day(params).date()
+
+        return any(len(frame) > 0 and frame.index[-1].date() >= last_date
+                   for frame in tables['raw_ticker_dict'].values())
@@ -0,0 +1,403 @@
+"""
+Columnar snapshot of a computed TrendStrength, memory mapped back without
+recalculating
+
+"""
+import json
+import os
+from collections.abc import Mapping
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+from trendvisualizer.panel import PricePanel, PanelDict
+
+# Version of the snapshot layout, checked on load
+SNAPSHOT_VERSION = 1
+
+# Name of the file describing the snapshot, written last
+MANIFEST = 'snapshot.json'
+
+# Stages whose tables are saved, in pipeline order. The chart data is
+# regenerated when first accessed.
+SNAPSHOT_STAGES = ['prices', 'fields', 'barometer', 'top_trends']
+
+# Tables of each ticker's DataFrame
+FRAME_DICTS = ['raw_ticker_dict', 'ticker_dict', 'futures_ticker_dict']
+
+
+class Snapshot():
+    """
+    Save the tables, parameters, sector mappings and top trends of a
+    TrendStrength to a directory of uncompressed Arrow IPC (Feather) files
+    and NumPy arrays, and load them back memory mapped. Loading only reads
+    the barometers; each ticker's DataFrame is mapped when first accessed,
+    and processes opening the same snapshot share its pages.
+
+    Float columns are written with NaN as a value rather than a null so
+    that they are read without copying.
+
+    """
+    @classmethod
+    def save(
+        cls,
+        path: str,
+        params: dict,
+        mappings: dict,
+        tables: dict,
+        top_trends: dict | None,
+        stages: list) -> str:
+        """
+        Write a snapshot. Each file is written under a temporary name and
+        then renamed, so processes mapping an earlier snapshot at the same
+        path keep reading it.
+
+        Parameters
+        ----------
+        path : Str
+            Directory of the snapshot, created if needed.
+        params : Dict
+            Dictionary of key parameters.
+        mappings : Dict
+            Dictionary of sector mappings.
+        tables : Dict
+            Dictionary of key tables.
+        top_trends : Dict or None
+            The top trends, if generated.
+        stages : List
+            The completed pipeline stages.
+
+        Returns
+        -------
+        path : Str
+            The snapshot directory.
+
+        """
+        path = os.path.expanduser(path)
+        os.makedirs(path, exist_ok=True)
+        stages = [stage for stage in SNAPSHOT_STAGES if stage in stages]
+
+        # Write each DataFrame once, however many tables hold it, eg the
+        # fields are added to the frames of raw_ticker_dict
+        written = {}
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'stages': stages,
+            'params': cls._encode(
+                dict(params, timing_hook=None), path, written),
+            'mappings': cls._encode(mappings, path, written),
+            'top_trends': cls._encode(top_trends, path, written),
+            'tables': {},
+            }
+
+        for name, table in dict.items(tables):
+            if isinstance(table, PricePanel):
+                manifest['tables'][name] = cls._write_panel(
+                    path, name, table)
+
+            elif isinstance(table, PanelDict):
+                manifest['tables'][name] = {'kind': 'panel_view'}
+
+            elif isinstance(table, pd.DataFrame):
+                manifest['tables'][name] = {
+                    'kind': 'frame',
+                    'file': cls._write_frame(path, 'tables', name, table)}
+
+            elif name in FRAME_DICTS or name == 'sectors':
+                files = {}
+                for key, frame in table.items():
+                    if id(frame) not in written:
+                        written[id(frame)] = cls._write_frame(
+                            path, name, key, frame)
+                    files[key] = written[id(frame)]
+                manifest['tables'][name] = {'kind': 'frames', 'files': files}
+
+        # The manifest is written last so that an interrupted save does not
+        # leave a snapshot which can be loaded
+        cls._replace(
+            os.path.join(path, MANIFEST), cls._write_json, manifest)
+
+        return path
+
+
+    @classmethod
+    def load(cls, path: str) -> dict:
+        """
+        Read a snapshot.
+
+        Parameters
+        ----------
+        path : Str
+            Directory of the snapshot.
+
+        Returns
+        -------
+        Dict
+            params : Dict
+                Dictionary of key parameters.
+            mappings : Dict
+                Dictionary of sector mappings.
+            tables : Dict
+                Dictionary of key tables, with the per ticker tables as
+                read-only dictionaries which map each DataFrame when first
+                accessed.
+            top_trends : Dict or None
+                The top trends, if saved.
+            stages : List
+                The pipeline stages the tables cover.
+
+        """
+        path = os.path.expanduser(path)
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as file:
+            manifest = json.load(file)
+        if manifest['version'] != SNAPSHOT_VERSION:
+            raise ValueError("Snapshot version "+str(manifest['version'])
+                             +" is not supported")
+
+        # The per ticker tables share the frames mapped from each file, so
+        # that a DataFrame held by several tables is still the same object.
+        # The panel views are created once the panel is loaded.
+        tables = {}
+        views = []
+        frames = {}
+        for name, entry in manifest['tables'].items():
+            if entry['kind'] == 'frame':
+                tables[name] = cls.read_frame(
+                    os.path.join(path, entry['file']))
+            elif entry['kind'] == 'frames':
+                tables[name] = SnapshotDict(path, entry['files'], frames)
+            elif entry['kind'] == 'panel':
+                tables[name] = cls._read_panel(path, entry)
+            else:
+                views.append(name)
+        for name in views:
+            tables[name] = PanelDict(tables['panel'])
+
+        return {
+            'params': cls._decode(manifest['params'], path),
+            'mappings': cls._decode(manifest['mappings'], path),
+            'tables': tables,
+            'top_trends': cls._decode(manifest['top_trends'], path),
+            'stages': manifest['stages'],
+            }
+
+
+    @staticmethod
+    def read_frame(filename: str) -> pd.DataFrame:
+        """
+        Read a DataFrame written by the snapshot, memory mapped.
+
+        Parameters
+        ----------
+        filename : Str
+            Path of the Arrow IPC file.
+
+        Returns
+        -------
+        DataFrame
+            The DataFrame with its index and dtypes restored. Float columns
+            are read-only views of the mapped file.
+
+        """
+        from pyarrow import feather # pylint: disable=import-outside-toplevel
+
+        table = feather.read_table(filename, memory_map=True)
+
+        return table.to_pandas(split_blocks=True)
+
+
+    @classmethod
+    def _write_frame(
+        cls,
+        path: str,
+        folder: str,
+        key: str,
+        frame: pd.DataFrame) -> str:
+
+        try:
+            # pylint: disable=import-outside-toplevel
+            import pyarrow as pa
+            from pyarrow import feather
+        except ImportError as err:
+            raise ImportError(
+                "Snapshots require pyarrow, eg "
+                "pip install trendvisualizer[store]") from err
+
+        table = pa.Table.from_pandas(frame)
+
+        # Keep NaN as a float value, as columns with nulls are copied when
+        # read back
+        for num, field in enumerate(table.schema):
+            if (pa.types.is_floating(field.type)
+                and field.name in frame.columns
+                and frame.columns.is_unique):
+                table = table.set_column(num, field, pa.array(
+                    frame[field.name].to_numpy(), type=field.type))
+
+        # Escape characters such as '&', '$' and '/' used in ticker codes
+        os.makedirs(os.path.join(path, folder), exist_ok=True)
+        relative = os.path.join(folder, quote(str(key), safe='') + '.arrow')
+        cls._replace(os.path.join(path, relative), lambda filename: (
+            feather.write_feather(
+                table, filename, compression='uncompressed')))
+
+        return relative
+
+
+    @classmethod
+    def _write_panel(
+        cls,
+        path: str,
+        name: str,
+        panel: PricePanel) -> dict:
+
+        # One array file for each field, which np.load maps
+        os.makedirs(os.path.join(path, name), exist_ok=True)
+        files = {}
+        arrays = dict(panel.fields, __mask__=panel.mask,
+                      __dates__=panel.dates.to_numpy())
+        for field, values in arrays.items():
+            files[field] = os.path.join(
+                name, quote(field, safe='') + '.npy')
+            cls._replace(
+                os.path.join(path, files[field]), cls._save_array, values)
+
+        return {'kind': 'panel', 'tickers': panel.tickers, 'files': files}
+
+
+    @staticmethod
+    def _read_panel(path: str, entry: dict) -> PricePanel:
+
+        arrays = {field: np.load(os.path.join(path, filename),
+                                 mmap_mode='r')
+                  for field, filename in entry['files'].items()}
+        mask = np.asarray(arrays.pop('__mask__'))
+        dates = pd.DatetimeIndex(arrays.pop('__dates__'))
+
+        return PricePanel(
+            dates=dates, tickers=entry['tickers'], fields=arrays, mask=mask)
+
+
+    @staticmethod
+    def _save_array(filename: str, values: np.ndarray) -> None:
+
+        with open(filename, 'wb') as file:
+            np.save(file, values)
+
+
+    @staticmethod
+    def _write_json(filename: str, value: dict) -> None:
+
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(value, file)
+
+
+    @staticmethod
+    def _replace(filename: str, write, *args) -> None:
+
+        # Write to a new file and rename it over the old one, which leaves
+        # any mapping of the old file intact
+        temp = filename + '.tmp'
+        write(temp, *args)
+        os.replace(temp, filename)
+
+
+    @classmethod
+    def _encode(cls, value, path: str, written: dict):
+
+        # JSON has no tuples, which are used for tenor pairs and chart
+        # dimensions, or non-string keys, so mark them to be restored on
+        # load. DataFrames, eg the prices of the top trends, are written to
+        # their own files.
+        if isinstance(value, pd.DataFrame):
+            if id(value) not in written:
+                written[id(value)] = cls._write_frame(
+                    path, 'objects', str(len(written)), value)
+            return {'__frame__': written[id(value)]}
+        if isinstance(value, tuple):
+            return {'__tuple__': [cls._encode(item, path, written)
+                                  for item in value]}
+        if isinstance(value, Mapping):
+            if all(isinstance(key, str) for key in value):
+                return {key: cls._encode(item, path, written)
+                        for key, item in value.items()}
+            return {'__items__': [
+                [cls._encode(key, path, written),
+                 cls._encode(item, path, written)]
+                for key, item in value.items()]}
+        if isinstance(value, list):
+            return [cls._encode(item, path, written) for item in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        if callable(value):
+            return None
+
+        return value
+
+
+    @classmethod
+    def _decode(cls, value, path: str):
+
+        if isinstance(value, dict):
+            if list(value) == ['__frame__']:
+                return cls.read_frame(os.path.join(path, value['__frame__']))
+            if list(value) == ['__tuple__']:
+                return tuple(cls._decode(item, path)
+                             for item in value['__tuple__'])
+            if list(value) == ['__items__']:
+                return {cls._decode(key, path): cls._decode(item, path)
+                        for key, item in value['__items__']}
+            return {key: cls._decode(item, path)
+                    for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls._decode(item, path) for item in value]
+
+        return value
+
+
+class SnapshotDict(Mapping):
+    """
+    Read-only dictionary of DataFrames, one for each ticker, mapped from
+    the files of a snapshot on first access
+
+    Parameters
+    ----------
+    path : Str
+        Directory of the snapshot.
+    files : Dict
+        Dictionary of the file of each ticker, relative to path.
+    frames : Dict, optional
+        Dictionary of the frames already mapped, keyed by file and shared
+        between the tables of a snapshot. The default is None.
+
+    """
+    def __init__(
+        self,
+        path: str,
+        files: dict,
+        frames: dict | None = None) -> None:
+        self.path = path
+        self.files = files
+        self._frames = {} if frames is None else frames
+
+
+    def __getitem__(self, ticker: str) -> pd.DataFrame:
+        filename = self.files[ticker]
+        if filename not in self._frames:
+            self._frames[filename] = Snapshot.read_frame(
+                os.path.join(self.path, filename))
+
+        return self._frames[filename]
+
+
+    def __iter__(self):
+        return iter(self.files)
+
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+
+    def __getstate__(self) -> dict:
+
+        # The frames are mapped again by each process, so are not pickled
+        return {'path': self.path, 'files': self.files, '_frames': {}}
@@ -0,0 +1,316 @@
+"""
+Maintain the Trend Strength table from a feed of price bars, publishing the
+change to each ticker's row as each bar arrives
+
+"""
+import copy
+from collections.abc import AsyncIterable, Iterable, Iterator, Mapping
+from typing import Callable
+import numpy as np
+import pandas as pd
+from trendvisualizer.incremental import (
+    IncrementalUpdate, IndicatorState, PRICE_COLUMNS)
+from trendvisualizer.panel import PanelFields, PricePanel
+
+
+class TrendStream():
+    """
+    Streaming Trend Strength, seeded from the history of a TrendStrength
+    object. Each (ticker, bar) event advances the rolling indicator state of
+    that ticker and the latest trend flags, held in arrays with one row per
+    ticker, and any change to the ticker's barometer row is passed to the
+    subscribers. The full barometer table is only built when requested.
+
+    Parameters
+    ----------
+    trend : TrendStrength
+        The object whose price history, parameters and barometer seed the
+        stream. It is not changed by the stream.
+
+    """
+    def __init__(self, trend) -> None:
+
+        trend.run_stage('barometer')
+        self.params = trend.params
+        self.trend_flags = list(self.params['trend_flags'])
+
+        # Start from a copy of the trend object's state if it has one
+        state = trend._indicator_state # pylint: disable=protected-access
+        if state is not None:
+            self.state = copy.deepcopy(state)
+        else:
+            self.state = IndicatorState.from_ticker_dict(
+                params=self.params,
+                ticker_dict=trend.tables['raw_ticker_dict'])
+
+        # Price history of each ticker, only extended for tickers which are
+        # recalculated in full
+        self._history = dict(trend.tables['raw_ticker_dict'])
+
+        # Latest trend flags of each ticker, in the order of the state
+        barometer = trend.tables['barometer']
+        self._barometer = barometer
+        self.flags = barometer.set_index('Ticker').loc[
+            self.state.tickers, self.trend_flags].to_numpy(dtype=np.int64)
+
+        # Whether each ticker's averages are initialised
+        self._warm = self.state.warm()
+
+        # Rows changed since the barometer table was last built
+        self._changed = set()
+        self._subscribers = []
+        self.processed = 0
+        self.skipped = 0
+
+
+    def subscribe(
+        self,
+        callback: Callable[[dict], None]) -> Callable[[], None]:
+        """
+        Call a function with each barometer delta.
+
+        Parameters
+        ----------
+        callback : Callable
+            Function taking the delta dictionary described in process().
+
+        Returns
+        -------
+        Callable
+            Function which removes the subscription.
+
+        """
+        self._subscribers.append(callback)
+
+        return lambda: self._subscribers.remove(callback)
+
+
+    def process(
+        self,
+        ticker: str,
+        bar: Mapping) -> dict | None:
+        """
+        Advance the stream by one bar.
+
+        Parameters
+        ----------
+        ticker : Str
+            The ticker of the bar.
+        bar : Mapping
+            The Open, High, Low and Close prices and the timestamp of the
+            bar under 'Date'.
+
+        Returns
+        -------
+        delta : Dict or None
+            None if the ticker's barometer row is unchanged, or if the bar
+            is skipped as the ticker is not in the universe or the bar is
+            not after the last bar held. Otherwise:
+                ticker : Str
+                    The ticker.
+                date : Timestamp
+                    The timestamp of the bar.
+                trend_strength : Int
+                    The new Trend Strength, a Float with fewer than 29
+                    trend flags as largest_change is then summed too.
+                previous_trend_strength : Int
+                    The Trend Strength before the bar.
+                flags : Dict
+                    The new value of each trend flag which changed.
+                largest_change : Float
+                    Largest absolute percentage change since the first
+                    close.
+
+        """
+        row = self.state.positions.get(ticker)
+        date = pd.Timestamp(bar['Date'])
+        if row is None or date.value <= self.state.arrays['date'][row]:
+            self.skipped += 1
+            return None
+
+        rows = np.array([row])
+        prices = {column: np.array([bar[column]], dtype=float)
+                  for column in PRICE_COLUMNS}
+        previous_change = self.state.largest_change([ticker])[0]
+
+        # Calculate the new flags from the state where it is initialised,
+        # otherwise recalculate the full history of the ticker
+        if self._warm[row]:
+            fields = self.state.advance(
+                rows=rows, dates=np.array([date.value]), bars=prices)
+            flags = [fields[flag][0] if flag in fields else 0
+                     for flag in self.trend_flags]
+        else:
+            flags = self._recalculate(ticker, date, bar)
+            self._warm[row] = self.state.warm()[row]
+        self.processed += 1
+
+        flags = np.array(flags, dtype=np.int64)
+        largest_change = self.state.largest_change([ticker])[0]
+        changed = np.flatnonzero(flags != self.flags[row])
+        if len(changed) == 0 and largest_change == previous_change:
+            return None
+
+        delta = {
+            'ticker': ticker,
+            'date': date,
+            'trend_strength': self._trend_strength(flags, largest_change),
+            'previous_trend_strength': self._trend_strength(
+                self.flags[row], previous_change),
+            'flags': {self.trend_flags[num]: int(flags[num])
+                      for num in changed},
+            'largest_change': float(largest_change),
+            }
+        self.flags[row] = flags
+        self._changed.add(row)
+
+        for callback in list(self._subscribers):
+            callback(delta)
+
+        return delta
+
+
+    @staticmethod
+    def _trend_strength(
+        flags: np.ndarray,
+        largest_change: float) -> int | float:
+
+        # Sum the same columns as Fields.generate_trend_strength, which
+        # take in largest_change with fewer than 29 flags
+        if len(flags) < 29:
+            return float(flags.sum() + np.nan_to_num(largest_change))
+
+        return int(flags[:29].sum())
+
+
+    def _recalculate(
+        self,
+        ticker: str,
+        date: pd.Timestamp,
+        bar: Mapping) -> list:
+
+        history = pd.concat([
+            self._history[ticker][PRICE_COLUMNS],
+            pd.DataFrame({column: [float(bar[column])]
+                          for column in PRICE_COLUMNS}, index=[date])])
+        self._history[ticker] = history
+
+        panel = PanelFields.generate_fields(
+            params=self.params,
+            panel=PricePanel.from_ticker_dict({ticker: history}))
+        self.state.replace(IndicatorState.from_ticker_dict(
+            params=self.params, ticker_dict={ticker: history}))
+        last_row = panel.frame(ticker).iloc[-1]
+
+        return [last_row.get(flag, 0) for flag in self.trend_flags]
+
+
+    def run(self, events: Iterable) -> int:
+        """
+        Process each (ticker, bar) event of an iterable, eg a feed or a
+        replay from csv_events().
+
+        Parameters
+        ----------
+        events : Iterable
+            Tuples of ticker and bar, as for process().
+
+        Returns
+        -------
+        Int
+            Number of events processed.
+
+        """
+        count = 0
+        for ticker, bar in events:
+            self.process(ticker, bar)
+            count += 1
+
+        return count
+
+
+    async def arun(self, events: AsyncIterable | Iterable) -> int:
+        """
+        Process each (ticker, bar) event of an asynchronous iterable.
+
+        Parameters
+        ----------
+        events : AsyncIterable
+            Tuples of ticker and bar, as for process(). A synchronous
+            iterable is also accepted.
+
+        Returns
+        -------
+        Int
+            Number of events processed.
+
+        """
+        if not isinstance(events, AsyncIterable):
+            return self.run(events)
+
+        count = 0
+        async for ticker, bar in events:
+            self.process(ticker, bar)
+            count += 1
+
+        return count
+
+
+    def barometer(self) -> pd.DataFrame:
+        """
+        The Trend Strength table at the latest bars, in the same layout and
+        order as Fields.generate_trend_strength.
+
+        Returns
+        -------
+        DataFrame
+            DataFrame showing trend strength for each ticker.
+
+        """
+        if self._changed:
+            rows = sorted(self._changed)
+            tickers = [self.state.tickers[row] for row in rows]
+            self._barometer = IncrementalUpdate.update_barometer(
+                params=self.params, barometer=self._barometer,
+                latest=pd.DataFrame(
+                    self.flags[rows], index=tickers,
+                    columns=self.trend_flags),
+                largest_change=self.state.largest_change(tickers),
+                ticker_order=self.state.tickers)
+            self._changed = set()
+
+        return self._barometer
+
+
+    @staticmethod
+    def csv_events(
+        path: str,
+        ticker_column: str = 'Ticker',
+        date_column: str = 'Date') -> Iterator[tuple[str, dict]]:
+        """
+        Replay the bars of a csv file, one row per bar in the order of the
+        file.
+
+        Parameters
+        ----------
+        path : Str
+            The csv file, with columns for the ticker, timestamp and Open,
+            High, Low and Close prices.
+        ticker_column : Str, optional
+            The ticker column. The default is 'Ticker'.
+        date_column : Str, optional
+            The timestamp column, which becomes the 'Date' of each bar. The
+            default is 'Date'.
+
+        Yields
+        ------
+        Tuple
+            The ticker and a dictionary of the bar.
+
+        """
+        frame = pd.read_csv(path, parse_dates=[date_column])
+        for row in frame.itertuples(index=False):
+            row = row._asdict()
+            bar = {column: row[column] for column in PRICE_COLUMNS}
+            bar['Date'] = row[date_column]
+            yield row[ticker_column], bar
@@ -0,0 +1,539 @@
+"""
+Barometers for a grid of indicator tenors and trend thresholds, calculating
+each indicator once per tenor and evaluating every combination from the
+cached values
+
+"""
+import itertools
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from trendvisualizer.compact import CompactTables
+from trendvisualizer.incremental import IncrementalUpdate
+from trendvisualizer.panel import PricePanel, PanelIndicators
+from trendvisualizer.parallel import ParallelFields
+
+# Tenor lists which select the trend flags of a combination
+TENOR_PARAMS = [
+    'ma_cross_list', 'price_cross_list', 'adx_list', 'rsi_list',
+    'breakout_list', 'macd_params']
+
+# Thresholds of the flags, with the values used by Fields.generate_fields
+THRESHOLDS = {
+    'adx_threshold': 25,
+    'rsi_overbought': 70,
+    'rsi_oversold': 30,
+    }
+
+# Every parameter a grid can vary
+SWEEP_PARAMS = TENOR_PARAMS + ['trend_flags'] + list(THRESHOLDS)
+
+# Trend flag names and the indicator each is taken from
+FLAG_PATTERNS = [
+    ('price_cross', re.compile(r'^PX_MA_(\d+)_flag$')),
+    ('ma_cross', re.compile(r'^MA_(\d+)_(\d+)_flag$')),
+    ('adx', re.compile(r'^ADX_(\d+)_flag$')),
+    ('rsi', re.compile(r'^RSI_(\d+)_flag$')),
+    ('breakout', re.compile(r'^breakout_(\d+)_flag$')),
+    ('macd', re.compile(r'^MACD_flag$')),
+    ]
+
+# Packed prices of the worker processes, set once when each starts
+_WORKER_ARRAYS = {}
+
+
+class IndicatorCache():
+    """
+    Last value of each indicator for every ticker, calculated once for each
+    tenor. The indicators are calculated over the full history on the
+    packed columns of a price panel, as in PanelFields.generate_fields, and
+    only the value on each ticker's last bar is kept.
+
+    Parameters
+    ----------
+    panel : PricePanel
+        Panel of High, Low and Close prices.
+
+    """
+    def __init__(self, panel: PricePanel) -> None:
+
+        self.tickers = panel.tickers
+        self.arrays = {
+            'high': panel.pack(panel['High']),
+            'low': panel.pack(panel['Low']),
+            'close': panel.pack(panel['Close']),
+            'wide_close': panel['Close'],
+            'dates': panel.dates,
+            }
+
+        # The last row of the panel holding a bar for each ticker, used for
+        # the moving averages which are taken over the panel dates
+        rows = len(panel.dates)
+        self.arrays['last_rows'] = rows - 1 - np.argmax(
+            panel.mask[::-1], axis=0)
+
+        self.values = {('Close',): self.arrays['close'][-1]}
+
+
+    def __getitem__(self, key: tuple) -> np.ndarray:
+        return self.values[key]
+
+
+    def calculate(self, keys: list, n_jobs: int = 1) -> None:
+        """
+        Calculate the indicators not already cached.
+
+        Parameters
+        ----------
+        keys : List
+            Indicator keys, eg ('ADX', 20) or ('MACD', 12, 26, 9).
+        n_jobs : Int, optional
+            Number of processes, each calculating some of the indicators.
+            -1 uses all available CPUs. The default is 1.
+
+        Returns
+        -------
+        None.
+
+        """
+        missing = [key for key in dict.fromkeys(keys)
+                   if key not in self.values]
+        n_jobs = min(ParallelFields.resolve_jobs(n_jobs), len(missing))
+
+        if n_jobs <= 1:
+            for key in missing:
+                self.values[key] = self.indicator(self.arrays, key)
+            return
+
+        # Send the packed prices to each process once rather than with
+        # every indicator
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker,
+            initargs=(self.arrays,)) as executor:
+            for key, values in zip(
+                missing, executor.map(_worker_indicator, missing)):
+                self.values[key] = values
+
+
+    @staticmethod
+    def indicator(arrays: dict, key: tuple) -> np.ndarray:
+        """
+        Value of an indicator on the last bar of each ticker.
+
+        Parameters
+        ----------
+        arrays : Dict
+            Packed prices of the panel.
+        key : Tuple
+            The indicator name followed by its tenors.
+
+        Returns
+        -------
+        Array
+            One value for each ticker.
+
+        """
+        ind = PanelIndicators
+        name = key[0]
+        high = arrays['high']
+        low = arrays['low']
+        close = arrays['close']
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+
+            # Moving averages use a calendar day window over the panel dates
+            if name == 'MA':
+                moving_average = pd.DataFrame(
+                    arrays['wide_close'], index=arrays['dates']).rolling(
+                        window=str(key[1])+'D').mean().to_numpy()
+                return moving_average[
+                    arrays['last_rows'], np.arange(close.shape[1])]
+
+            if name == 'ADX':
+                return ind.ADX(
+                    high=high, low=low, close=close, time_period=key[1])[-1]
+
+            if name == 'RSI':
+                return ind.RSI(close=close, time_period=key[1])[-1]
+
+            if name == 'breakout':
+                return ind.breakout(
+                    high=high, low=low, time_period=key[1])[2][-1]
+
+            if name == 'MACD':
+                _, _, hist = ind.MACD(
+                    close=close, fast=key[1], slow=key[2], signal=key[3])
+                return (hist - ind.shift(hist))[-1]
+
+        raise ValueError("Unknown indicator: "+str(name))
+
+
+class ParameterSweep():
+    """
+    Barometers for a grid of parameter combinations, sharing one
+    TrendStrength's prices, names and sectors. Each moving average, ADX,
+    RSI, breakout and MACD is calculated once for each tenor used anywhere
+    in the grid, so the cost grows with the number of distinct tenors
+    rather than the number of combinations.
+
+    Parameters
+    ----------
+    trend : TrendStrength
+        The object whose prices are swept. Its parameters are the base
+        which each combination overrides.
+
+    """
+    def __init__(self, trend) -> None:
+
+        trend.run_stage('barometer')
+        self.trend = trend
+        self.params = trend.params
+        ticker_dict = trend.tables['ticker_dict']
+        self.ticker_order = list(ticker_dict)
+
+        # Only the prices are needed, from before the fields were added
+        raw_ticker_dict = trend.tables['raw_ticker_dict']
+        self.cache = IndicatorCache(PricePanel.from_ticker_dict(
+            {ticker: raw_ticker_dict[ticker] for ticker in ticker_dict},
+            columns=['High', 'Low', 'Close']))
+
+        # Names, sectors and largest change of each ticker do not depend on
+        # the parameters, so are taken from the barometer
+        base = trend.tables['barometer']
+        self.base = base[[column for column in base.columns
+                          if not column.endswith('_flag')]]
+
+
+    def run(self, grid: dict | list, n_jobs: int = 1) -> list:
+        """
+        Calculate the barometer of each combination in the grid.
+
+        Parameters
+        ----------
+        grid : Dict or List
+            Dictionary of parameter names and lists of values, of which
+            every combination is taken, or a list of dictionaries, one for
+            each combination. See expand.
+        n_jobs : Int, optional
+            Number of processes used to calculate the indicators. -1 uses
+            all available CPUs. The default is 1.
+
+        Returns
+        -------
+        results : List
+            A dictionary for each combination, in the order of the grid:
+                params : Dict
+                    The parameters varied by the combination.
+                trend_flags : List
+                    The trend flags of the combination.
+                barometer : DataFrame
+                    DataFrame showing trend strength for each ticker, the
+                    same as that of a full run with the combination's
+                    parameters. As there, Trend Strength sums the first 29
+                    trend flags, or with fewer flags all of them and the
+                    largest_change column, while Trend Strength % divides
+                    by the number of flags.
+
+        """
+        combinations = self.expand(grid)
+        flag_lists = [self.trend_flags(self.params, combination)
+                      for combination in combinations]
+
+        # Calculate each indicator used by any combination once
+        keys = []
+        for combination, trend_flags in zip(combinations, flag_lists):
+            macd_params = combination.get(
+                'macd_params', self.params['macd_params'])
+            for flag in trend_flags:
+                keys.extend(self.indicator_keys(flag, macd_params))
+        self.cache.calculate(keys, n_jobs=n_jobs)
+
+        results = []
+        for combination, trend_flags in zip(combinations, flag_lists):
+            results.append({
+                'params': combination,
+                'trend_flags': trend_flags,
+                'barometer': self.barometer(combination, trend_flags),
+                })
+
+        return results
+
+
+    def barometer(
+        self,
+        combination: dict,
+        trend_flags: list) -> pd.DataFrame:
+        """
+        Trend Strength table of one combination, from the cached indicators.
+
+        Parameters
+        ----------
+        combination : Dict
+            The parameters varied by the combination.
+        trend_flags : List
+            The trend flags of the combination.
+
+        Returns
+        -------
+        barometer : DataFrame
+            DataFrame showing trend strength for each ticker, in the layout
+            and order of Fields.generate_trend_strength, and with the same
+            Trend Strength as a full run with the combination's parameters.
+
+        """
+        params = dict(THRESHOLDS, **self.params)
+        params.update(combination, trend_flags=trend_flags)
+
+        latest = pd.DataFrame(
+            {flag: self.flag_values(params, flag) for flag in trend_flags},
+            index=self.cache.tickers)
+
+        # Place the flags after the names as in the full calculation, then
+        # recalculate the trend strength columns
+        template = pd.concat([
+            self.base[['Ticker', 'Long_name']],
+            pd.DataFrame(0, index=self.base.index, columns=trend_flags),
+            self.base.drop(columns=['Ticker', 'Long_name'])], axis=1)
+        largest_change = self.base.set_index('Ticker')[
+            'largest_change'].reindex(latest.index).to_numpy()
+
+        barometer = IncrementalUpdate.update_barometer(
+            params=params, barometer=template, latest=latest,
+            largest_change=largest_change, ticker_order=self.ticker_order)
+
+        if self.params['compact_tables']:
+            barometer = CompactTables.barometer(barometer, params)
+
+        return barometer
+
+
+    def flag_values(self, params: dict, flag: str) -> np.ndarray:
+        """
+        Value of a trend flag on the last bar of each ticker, following the
+        rules of PanelFields.generate_fields.
+
+        Parameters
+        ----------
+        params : Dict
+            The base parameters updated with those of the combination.
+        flag : Str
+            The trend flag, eg 'ADX_20_flag'.
+
+        Returns
+        -------
+        Array
+            One int64 value for each ticker.
+
+        """
+        kind, tenors = self.parse_flag(flag)
+        cache = self.cache
+
+        with np.errstate(invalid='ignore'):
+            if kind == 'price_cross':
+                values = np.where(
+                    cache[('Close',)] > cache[('MA', tenors[0])], 1, -1)
+
+            elif kind == 'ma_cross':
+                values = np.where(
+                    cache[('MA', tenors[0])] > cache[('MA', tenors[1])],
+                    1, -1)
+
+            # ADX gives the strength of the trend and the price cross its
+            # direction
+            elif kind == 'adx':
+                values = np.where(
+                    cache[('ADX', tenors[0])] > params['adx_threshold'],
+                    np.where(cache[('Close',)] > cache[('MA', tenors[0])],
+                             1, -1), 0)
+
+            elif kind == 'rsi':
+                rsi = cache[('RSI', tenors[0])]
+                values = np.where(
+                    rsi > params['rsi_overbought'], 1, np.where(
+                        rsi < params['rsi_oversold'], -1, 0))
+
+            elif kind == 'breakout':
+                values = cache[('breakout', tenors[0])]
+
+            else:
+                values = np.where(cache[
+                    ('MACD',) + tuple(params['macd_params'])] > 0, 1, -1)
+
+        return values.astype(np.int64)
+
+
+    @classmethod
+    def indicator_keys(cls, flag: str, macd_params: tuple) -> list:
+        """
+        Keys of the cached indicators a trend flag is taken from.
+
+        Parameters
+        ----------
+        flag : Str
+            The trend flag, eg 'ADX_20_flag'.
+        macd_params : Tuple
+            Fast, slow and signal periods of the MACD.
+
+        Returns
+        -------
+        List
+            The indicator keys.
+
+        """
+        kind, tenors = cls.parse_flag(flag)
+        if kind == 'price_cross':
+            return [('MA', tenors[0])]
+        if kind == 'ma_cross':
+            return [('MA', tenors[0]), ('MA', tenors[1])]
+        if kind == 'adx':
+            return [('ADX', tenors[0]), ('MA', tenors[0])]
+        if kind == 'rsi':
+            return [('RSI', tenors[0])]
+        if kind == 'breakout':
+            return [('breakout', tenors[0])]
+
+        return [('MACD',) + tuple(macd_params)]
+
+
+    @staticmethod
+    def parse_flag(flag: str) -> tuple[str, tuple]:
+        """
+        Indicator type and tenors of a trend flag.
+
+        Parameters
+        ----------
+        flag : Str
+            The trend flag, eg 'MA_10_30_flag'.
+
+        Returns
+        -------
+        Tuple
+            The indicator type, eg 'ma_cross', and a tuple of Int tenors.
+
+        """
+        for kind, pattern in FLAG_PATTERNS:
+            match = pattern.match(flag)
+            if match:
+                return kind, tuple(int(tenor) for tenor in match.groups())
+
+        raise ValueError("Please select trend flags from the price cross, "
+                         "MA cross, ADX, RSI, breakout and MACD flags, not "
+                         + str(flag))
+
+
+    @staticmethod
+    def expand(grid: dict | list) -> list:
+        """
+        List the parameter combinations of a grid.
+
+        Parameters
+        ----------
+        grid : Dict or List
+            Dictionary of parameter names and lists of values, of which
+            every combination is taken, eg {'adx_list': [[10, 20], [14]],
+            'adx_threshold': [20, 25, 30]} gives 6 combinations. Or a list
+            of dictionaries, one for each combination. Parameters may be
+            any of TENOR_PARAMS, trend_flags and the THRESHOLDS.
+
+        Returns
+        -------
+        combinations : List
+            Dictionary of the parameters of each combination.
+
+        """
+        if isinstance(grid, dict):
+            names = list(grid)
+            combinations = [dict(zip(names, values)) for values in
+                            itertools.product(*grid.values())]
+        else:
+            combinations = [dict(combination) for combination in grid]
+
+        for combination in combinations:
+            for name in combination:
+                if name not in SWEEP_PARAMS:
+                    raise ValueError("Please select sweep parameters from "
+                                     + ", ".join(SWEEP_PARAMS))
+
+        return combinations
+
+
+    @staticmethod
+    def trend_flags(params: dict, combination: dict) -> list:
+        """
+        Trend flags of a combination. Unless set by the combination, these
+        are the flags of the base parameters whose tenors remain in the
+        combination's tenor lists, followed by the flags of any new tenors.
+        As in the full calculation, only the first 29 flags are summed into
+        Trend Strength, so new flags beyond these only count towards the
+        number of flags which Trend Strength % divides by.
+
+        Parameters
+        ----------
+        params : Dict
+            The base parameters.
+        combination : Dict
+            The parameters varied by the combination.
+
+        Returns
+        -------
+        List
+            The trend flags.
+
+        """
+        if 'trend_flags' in combination:
+            return list(combination['trend_flags'])
+
+        if not any(name in combination for name in TENOR_PARAMS):
+            return list(params['trend_flags'])
+
+        lists = {name: combination.get(name, params[name])
+                 for name in TENOR_PARAMS}
+        available = (
+            ['MA_'+str(pair[0])+'_'+str(pair[1])+'_flag'
+             for pair in lists['ma_cross_list']]
+            + ['PX_MA_'+str(tenor)+'_flag'
+               for tenor in lists['price_cross_list']]
+            + ['ADX_'+str(tenor)+'_flag' for tenor in lists['adx_list']]
+            + ['RSI_'+str(tenor)+'_flag' for tenor in lists['rsi_list']]
+            + ['breakout_'+str(tenor)+'_flag'
+               for tenor in lists['breakout_list']]
+            + ['MACD_flag'])
+
+        trend_flags = [flag for flag in params['trend_flags']
+                       if flag in available]
+
+        return trend_flags + [flag for flag in available
+                              if flag not in trend_flags]
+
+
+    @staticmethod
+    def trend_strength(results: list) -> pd.DataFrame:
+        """
+        Trend Strength of each ticker under each combination.
+
+        Parameters
+        ----------
+        results : List
+            The results returned by run.
+
+        Returns
+        -------
+        DataFrame
+            Tickers x combinations, numbered in the order of the grid.
+
+        """
+        return pd.DataFrame({
+            num: result['barometer'].set_index('Ticker')['Trend Strength']
+            for num, result in enumerate(results)})
+
+
+def _init_worker(arrays: dict) -> None:
+
+    # Keep the packed prices for every indicator this process calculates
+    _WORKER_ARRAYS.update(arrays)
+
+
+def _worker_indicator(key: tuple) -> np.ndarray:
+
+    return IndicatorCache.indicator(_WORKER_ARRAYS, key)
@@ -0,0 +1,213 @@
+"""
+Figure templates which are built once and updated in place on each render
+
+"""
+import matplotlib
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FixedLocator
+from trendvisdata.chart_prep import Formatting
+from trendvisualizer.figures import ChartFigure, ChartStyle
+
+
+class MarketChartTemplate():
+    """
+    Grid of market subplots, with the lines, titles, tick locators and
+    styling created once for a given chart_dimensions and number of days.
+    Each render only replaces the line data and titles.
+
+    Parameters
+    ----------
+    params : Dict
+        chart_dimensions : Tuple
+            Number of tickers to chart expressed as a Tuple, n * m.
+        days : Int
+            Number of days of history.
+        mpl_chart_params : Dict
+            Matplotlib rcParams used for the chart.
+
+    """
+    def __init__(self, params: dict) -> None:
+
+        self.chart_dimensions = tuple(params['chart_dimensions'])
+        self.days = params['days']
+        self.style = ChartStyle(params['mpl_chart_params'])
+        self._build(params)
+
+
+    def _build(self, params: dict) -> None:
+
+        # Import here to avoid a circular import
+        from trendvisualizer.chart_display import Graphs # pylint: disable=import-outside-toplevel,cyclic-import
+
+        rows, cols = self.chart_dimensions
+        num_charts = rows * cols
+
+        # create a color palette
+        palette = matplotlib.colormaps['tab20']
+
+        # Initialize the figure
+        self.figure = ChartFigure.new(
+            {'pyplot': True}, self.style,
+            figsize=(int(cols*3), int(rows*2)))
+        self.figure.subplots()
+        self.figure.subplots_adjust(top=0.85)
+        self.figure.tight_layout()
+
+        self.lines = []
+        self.titles = []
+
+        # The date locator of each subplot and the x axis range its ticks
+        # were last calculated for
+        self.date_locators = []
+        self.xlims = []
+        for num in range(1, num_charts + 1):
+            if num < 21:
+                colr = num
+            else:
+                colr = num - 20
+
+            ax1 = self.figure.add_subplot(rows, cols, num)
+            ax1.xaxis_date()
+
+            line, = ax1.plot([], [],
+                             marker='',
+                             color=palette(colr),
+                             linewidth=1.9,
+                             alpha=0.9)
+            self.lines.append(line)
+
+            # xticks only on bottom graphs
+            if num in range(num_charts - cols + 1):
+                ax1.tick_params(labelbottom=False)
+
+            # Add title, fixing it at the top of the axes as the subplots
+            # have no labels above them. This skips the search for
+            # overlapping artists on each draw.
+            self.titles.append(self.style.title(ax1,
+                                                '',
+                                                loc='left',
+                                                fontsize=10,
+                                                fontweight=0,
+                                                color='black',
+                                                y=1.0))
+
+            # axis formatting
+            ax1 = Graphs._set_market_ticks(ax1, params) # pylint: disable=protected-access
+            self.date_locators.append(ax1.xaxis.get_major_locator())
+            self.xlims.append(None)
+
+            # Set xtick labels at 70 degrees
+            ax1.tick_params(axis='x', labelrotation=70)
+
+        # general title
+        self.suptitle = self.figure.suptitle('',
+                                             fontsize=20,
+                                             fontweight=0,
+                                             color='black',
+                                             style='italic',
+                                             y=1.05)
+
+
+    def matches(self, params: dict) -> bool:
+        """
+        Whether the template can be used for the selected parameters and its
+        figure is still open.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+
+        Returns
+        -------
+        Bool
+            True if the template can be reused.
+
+        """
+        return (tuple(params['chart_dimensions']) == self.chart_dimensions
+                and params['days'] == self.days
+                and plt.fignum_exists(self.figure.number))
+
+
+    def update(
+        self,
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Update the lines and titles with the latest data and make the figure
+        the current pyplot figure.
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters, as for Graphs.market_chart.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        params : Dict
+            Dictionary of key parameters with the chart title.
+
+        """
+        data_list = Formatting.create_data_list(
+            params=params, barometer=tables['barometer'], market_chart=True,
+            num_charts=params['num_charts'])
+
+        params = self._update_lines(params, tables, data_list)
+
+        plt.figure(self.figure.number)
+
+        return params
+
+
+    def _update_lines(
+        self,
+        params: dict,
+        tables: dict,
+        data_list: list) -> dict:
+
+        for num, line in enumerate(self.lines):
+            ax1 = line.axes
+
+            # Hide any subplots not needed
+            if num >= len(data_list):
+                ax1.set_visible(False)
+                continue
+
+            ticker = data_list[num]
+            frame = tables['ticker_dict'][ticker]
+            closes = frame['Close'].to_numpy()[-params['days']:]
+            if params['norm']:
+                closes = closes / closes[0] * 100
+
+            line.set_data(
+                mdates.date2num(frame.index[-params['days']:]), closes)
+            line.set_label(params['ticker_short_name_dict'][ticker])
+            self.titles[num].set_text(
+                params['ticker_short_name_dict'][ticker])
+
+            ax1.set_visible(True)
+            ax1.relim()
+            ax1.autoscale_view()
+            self._fix_ticks(num)
+
+        # Create chart title label
+        params['chart_title'] = Formatting.get_chart_title(params=params)
+        self.suptitle.set_text(params['chart_title'])
+
+        return ChartFigure.finish(params, self.figure)
+
+
+    def _fix_ticks(self, num: int) -> None:
+
+        # Date locators are slow and are called several times on each draw,
+        # so calculate the major ticks once for each x axis range
+        ax1 = self.lines[num].axes
+        xlim = ax1.get_xlim()
+        if xlim != self.xlims[num]:
+            ticks = self.date_locators[num].tick_values(
+                *mdates.num2date(xlim))
+            ax1.xaxis.set_major_locator(FixedLocator(ticks))
+            self.xlims[num] = xlim
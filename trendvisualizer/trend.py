@@ -3,14 +3,55 @@ Calculate Trend Strength across various markets / asset classes and graph
 results
 
 """
-import copy
-from trendvisdata.chart_data import Data
-from trendvisdata.sector_mappings import sectmap
-from trendvisdata.trend_data import Fields, TrendRank
-from trendvisdata.trend_params import trend_params_dict
-from trendvisdata.market_data import NorgateExtract, YahooExtract, MktUtils
-from trendvisualizer.chart_display import Graphs
-from trendvisualizer.pie_charts import PieCharts
+import threading
+from typing import TYPE_CHECKING
+import pandas as pd
+from trendvisualizer.barometer import (
+    BarometerIndex, FlagTallies, SectorCube)
+from trendvisualizer.chart_api import ChartData
+from trendvisualizer.compact import CompactTables
+from trendvisualizer.concurrent_fetch import ConcurrentFetch
+from trendvisualizer.defaults import (
+    DEFAULT_DICT, DEFAULT_MAPPINGS, DEFAULT_PARAMS)
+from trendvisualizer.history import BarometerHistory
+from trendvisualizer.incremental import IncrementalUpdate
+from trendvisualizer.instrument import StageTimer
+from trendvisualizer.panel import PricePanel, PanelFields
+from trendvisualizer.parallel import ParallelFields
+from trendvisualizer.price_store import StoredExtract
+from trendvisualizer.result_cache import ResultCache, RUNTIME_KEYS
+from trendvisualizer.snapshot import Snapshot
+from trendvisualizer.sweep import ParameterSweep
+
+# The data sources, indicator calculations and plotting modules are
+# imported when first used, so that importing TrendStrength only loads what
+# the selected source and chart types need. Norgate Data and Yahoo Finance
+# are loaded by the prices stage, technicalmethods and scipy by the fields
+# and barometer stages, and matplotlib and seaborn when a chart is first
+# drawn, so the data-only chart API never loads them
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+class LazyTables(dict):
+    """
+    Dictionary of key tables which runs the pipeline stage that creates a
+    table the first time that table is requested
+
+    """
+    def __init__(self, loader) -> None:
+        super().__init__()
+
+        # Function taking a table name and returning True if it ran the
+        # stage which creates that table
+        self._loader = loader
+
+
+    def __missing__(self, key):
+        if not self._loader(key):
+            raise KeyError(key)
+
+        return self[key]
 
 
 class TrendStrength():
@@ -23,6 +64,17 @@ class TrendStrength():
         Tuple of height, width for market chart.
     chart_mkts : Int
         Number of markets for market chart.
+    chart_template : Bool
+        Whether the market chart keeps its figure, subplots, lines and tick
+        locators in a template for each chart_dimensions and days, so that
+        later renders only update the line data and titles. The default is
+        False which draws a new figure each time.
+    compact_tables : Bool
+        Whether to store the indicator flags as int8, the other indicator
+        fields as float32 and the sector, short name and trend columns of
+        the barometer as categoricals, reducing the memory held by the
+        tables. Prices are
+        kept as float64. The default is False.
     days : Int
         The number of days price history.
     end_date : Str
@@ -31,18 +83,63 @@ class TrendStrength():
     indicator_type : Str
         The indicator to plot. Choose from 'adx', 'ma_cross',
         'price_cross', 'rsi', 'breakout'.
+    lazy : Bool
+        Whether to defer each stage of the pipeline (prices, indicator
+        fields, barometer, top trends and chart data) until its output is
+        first accessed. The default is False which runs every stage on
+        initialisation.
     lookback : Int
         Number of days history if dates are not specified
+    max_retries : Int
+        Number of times a failed concurrent download is retried. The default
+        is 3.
+    max_workers : Int
+        Maximum number of concurrent Yahoo Finance downloads. A timing and
+        outcome report for each ticker is stored in
+        params['download_report']. The default is None which downloads the
+        tickers one at a time.
     mkts : Int
         Number of markets for barchart or linegraph.
+    n_jobs : Int
+        Number of processes used to calculate the indicator fields, with the
+        tickers split into chunks. -1 uses all available CPUs. The default
+        is 1.
     norm : Bool
         Whether the prices have been normalised.
+    panel : Bool
+        Whether to hold the prices and indicator fields of all tickers in an
+        aligned PricePanel (tables['panel']) and calculate the indicators
+        with vectorized operations across tickers. tables['ticker_dict']
+        is then a read-only view over the panel. The default is False.
     pie_tenor : Int / Tuple
         The time period of the indicator. For the Moving Average
         crossover this is a tuple from the following pairs: (5, 200),
         (10, 30), (10, 50), (20, 50), (30, 100), (50, 200). For the
         other indicators this is an integer from the list: 10, 20, 30,
         50, 100, 200.
+    price_store : Str
+        Directory of a local store of price histories. Only the bars after
+        the last stored date are downloaded and added to the store. The
+        default is None which downloads the full history each time.
+    price_store_format : Str
+        File format of the price store, 'parquet' or 'feather'. The default
+        is 'parquet'.
+    pyplot : Bool
+        Whether charts are created and shown with pyplot. chart_figure()
+        sets it to False for each chart, creating standalone figures. The
+        default is True.
+    result_cache : Str
+        Directory of a cache of results. A TrendStrength created with the
+        same parameters, after resolving the default start and end dates,
+        reuses the tables, top trends and chart data of the earlier run.
+        Results are only stored once the prices include a bar on the end
+        date. The default is None which does not cache results.
+    result_cache_max_mb : Float
+        Maximum size of the result cache in MB, above which the least
+        recently used results are removed. The default is 2048.
+    retry_backoff : Float
+        Seconds to wait before the first retry of a failed concurrent
+        download, doubling with each further retry. The default is 0.5.
     sector_level : Int
         The level of granularity of the assets.
         For Commodities the choices are:
@@ -68,6 +165,17 @@ class TrendStrength():
     ticker_limit : Int
         Flag to select only the first n markets. The default
         is None.
+    timing_hook : Callable
+        Function called with the name and record of each pipeline stage
+        and chart when it finishes, eg to forward them to a metrics system.
+        The latest record of each stage and chart type is also stored in
+        the timings attribute. The default is None.
+    trace_memory : Bool
+        Whether to trace the peak Python memory allocated by each stage and
+        chart with tracemalloc, which slows the pipeline. tracemalloc is
+        global to the process, so the peak of a stage or chart includes
+        the memory allocated by other threads drawing charts at the same
+        time. The default is False.
     trend : Str
         Flag to select most or least trending markets.
         Select from: 'up' - strongly trending upwards,
@@ -83,13 +191,27 @@ class TrendStrength():
     None.
 
     """
+    # Pipeline stages in the order they are run, mapped to the tables each
+    # stage adds
+    STAGES = {
+        'prices': ('raw_ticker_dict',),
+        'fields': ('ticker_dict', 'panel'),
+        'barometer': ('barometer', 'rank_index', 'flag_tallies',
+                      'sector_cube'),
+        'top_trends': ('filtered_barometer', 'futures_ticker_dict',
+                       'futures_barometer', 'sectors', 'return_barometer'),
+        'chart_data': (),
+        }
+
     def __init__(self, **kwargs) -> None:
 
-        # Import dictionary of default parameters
-        self.default_dict = copy.deepcopy(trend_params_dict)
+        # Dictionary of default parameters, shared and read-only
+        self.default_dict = DEFAULT_DICT
 
-        # Import dictionary of sector mappings
-        mappings = copy.deepcopy(sectmap)
+        # Dictionary of sector mappings. The nested mappings are shared and
+        # read-only, so only the outer dictionary, which the data prep adds
+        # to, is copied
+        self.mappings = dict(DEFAULT_MAPPINGS)
 
         # Store initial inputs
         inputs = {}
@@ -97,34 +219,586 @@ class TrendStrength():
             inputs[key] = value
 
         # Initialise system parameters
-        params = self._init_params(inputs)
+        self.params = self._init_params(inputs)
+
+        # Dictionary to store data tables, populated stage by stage
+        self.tables = LazyTables(loader=self._load_table)
+        self._top_trends = None
+        self._data_dict = None
+
+        # Lists of completed and currently running stages, and a lock so
+        # that threads sharing the object run each stage once
+        self._completed = []
+        self._running = []
+        self._stage_lock = threading.RLock()
+
+        # Figure templates reused by repeated chart renders
+        self.templates = {}
+
+        # Rolling indicator state used to add new bars, created by the first
+        # update
+        self._indicator_state = None
+
+        # Record the time and memory used by each stage and chart
+        self._timer = StageTimer(
+            trace_memory=self.params['trace_memory'],
+            hook=self.params['timing_hook'])
+        self.timings = self._timer.timings
+
+        # Reuse the results of an earlier run with the same parameters and
+        # dates if a result cache is selected
+        self._result_cache = None
+        self._cache_key = None
+        if self.params['result_cache'] is not None:
+            self._result_cache = ResultCache(
+                path=self.params['result_cache'],
+                max_mb=self.params['result_cache_max_mb'])
+            self._cache_key = ResultCache.key(self.params)
+            self._load_result()
+
+        # Unless lazy evaluation is selected, run every stage now
+        if not self.params['lazy']:
+            self.run_stage('chart_data')
+
+
+    def __getstate__(self) -> dict:
+
+        # Pickle the tables as a plain dictionary and leave out the timing
+        # hook, which may not be picklable
+        state = self.__dict__.copy()
+        state['tables'] = dict(self.tables)
+        state['params'] = dict(self.params, timing_hook=None)
+        state['templates'] = {}
+        del state['_timer']
+        del state['_stage_lock']
+
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+
+        tables = state.pop('tables')
+        self.__dict__.update(state)
+        self.tables = LazyTables(loader=self._load_table)
+        self.tables.update(tables)
+        self._stage_lock = threading.RLock()
+        self._timer = StageTimer(
+            trace_memory=self.params['trace_memory'], hook=None)
+        self._timer.timings = self.timings
+
+
+    def memory_usage(self) -> pd.DataFrame:
+        """
+        Memory held by each of the tables created so far, without running
+        any further stages.
+
+        Returns
+        -------
+        DataFrame
+            Number of DataFrames and size in MB of each table, with a total
+            row which counts DataFrames shared between tables, eg
+            raw_ticker_dict and ticker_dict, once.
+
+        """
+        return CompactTables.memory_usage(self.tables)
+
+
+    @property
+    def top_trends(self) -> dict:
+        """
+        Dictionary of the top trending securities, generated on first
+        access.
+
+        """
+        self.run_stage('top_trends')
+
+        return self._top_trends
+
+
+    @property
+    def data_dict(self) -> dict:
+        """
+        Data dictionary for graphing via API, generated on first access.
+
+        """
+        self.run_stage('chart_data')
+
+        return self._data_dict
+
+
+    def run_stage(self, stage: str) -> None:
+        """
+        Run the pipeline up to and including the selected stage, skipping
+        any stages that have already been completed.
+
+        Parameters
+        ----------
+        stage : Str
+            The pipeline stage. Choose from 'prices', 'fields',
+            'barometer', 'top_trends', 'chart_data'.
+
+        Returns
+        -------
+        None.
+
+        """
+        if stage not in self.STAGES:
+            raise ValueError(
+                "Please select a valid stage from "
+                + ", ".join(self.STAGES))
+
+        with self._stage_lock:
+            self._run_stages(stage)
+
+
+    def _run_stages(self, stage: str) -> None:
+
+        for name in self.STAGES:
+            if name not in self._completed:
+                self._running.append(name)
+                try:
+                    with self._timer.measure(name):
+                        getattr(self, '_stage_'+name)()
+                finally:
+                    self._running.remove(name)
+                self._completed.append(name)
+                if name == 'chart_data':
+                    self._store_result()
+
+            if name == stage:
+                break
+
+
+    def _load_result(self) -> None:
+
+        entry = self._result_cache.get(self._cache_key)
+        if entry is None:
+            return
+
+        # Keep the runtime parameters supplied to this object
+        self.params = dict(entry['params'], **{
+            key: self.params[key] for key in RUNTIME_KEYS})
+        self.mappings = entry['mappings']
+        self.tables.update(entry['tables'])
+        self._top_trends = entry['top_trends']
+        self._data_dict = entry['data_dict']
+        self._completed = list(self.STAGES)
+
+
+    def _store_result(self) -> None:
+
+        if self._cache_key is None:
+            return
+
+        if not ResultCache.complete(self.params, self.tables):
+            print("Results not cached as the prices do not include "
+                  + str(ResultCache.last_trading_day(self.params).date()))
+            return
+
+        self._result_cache.put(self._cache_key, {
+            'params': dict(self.params, timing_hook=None),
+            'mappings': self.mappings,
+            'tables': dict(self.tables),
+            'top_trends': self._top_trends,
+            'data_dict': self._data_dict,
+            })
+
+
+    def _load_table(self, key: str) -> bool:
+
+        with self._stage_lock:
+
+            # Another thread may have added the table while this one waited
+            if key in self.tables:
+                return True
+
+            # Find the stage which creates the table and run it if it has
+            # not already been run or started
+            for stage, table_names in self.STAGES.items():
+                if key in table_names:
+                    if stage in self._completed or stage in self._running:
+                        return False
+                    self.run_stage(stage)
+                    return True
+
+        return False
+
+
+    def _stage_prices(self) -> None:
 
         # Import the data from Norgate Data
-        if params['source'] == 'norgate':
-            params, tables, mappings = self.prep_norgate(
-                 params=params, mappings=mappings)
+        if self.params['source'] == 'norgate':
+            self.params, tables, self.mappings = self.prep_norgate(
+                 params=self.params, mappings=self.mappings)
 
         # Or from Yahoo Finance
-        elif params['source'] == 'yahoo':
-            params, tables, mappings = self.prep_yahoo(
-                params=params, mappings=mappings)
+        elif self.params['source'] == 'yahoo':
+            self.params, tables, self.mappings = self.prep_yahoo(
+                params=self.params, mappings=self.mappings)
+
+        self.tables.update(tables)
+
+
+    def _stage_fields(self) -> None:
+
+        # Calculate the technical indicator fields
+        self.field_calc(params=self.params, tables=self.tables)
+
+
+    def _stage_barometer(self) -> None:
+
+        # Calculate the Trend Strength table
+        self.barometer_calc(
+            params=self.params, tables=self.tables, mappings=self.mappings)
 
-        # Calculate the technical indicator fields and Trend Strength table
-        tables = self.trend_calc(
-            params=params, tables=tables, mappings=mappings)
+
+    def _stage_top_trends(self) -> None:
 
         # Generate list of top trending securities
-        top_trends, tables = self.top_trend_tickers(
-            params=params, tables=tables)
+        self._top_trends, tables = self.top_trend_tickers(
+            params=self.params, tables=self.tables)
+        self.tables.update(tables)
+
+
+    def _stage_chart_data(self) -> None:
 
         # Generate data dictionary for graphing via API
-        data_dict = Data.get_all_data(params=params, tables=tables)
+        from trendvisdata.chart_data import Data # pylint: disable=import-outside-toplevel
+        self._data_dict = Data.get_all_data(
+            params=self.params, tables=self.tables)
+
+
+    def update(self, new_bars: dict) -> None:
+        """
+        Add one or more new price bars for some or all of the tickers,
+        calculating the indicator fields of each new bar from the rolling
+        state of the indicators rather than the full history. Only the rows
+        of the barometer for the updated tickers are recalculated, then the
+        top trends are refreshed if they have been generated and the chart
+        data is regenerated when next accessed.
+
+        Tickers with too little history for every indicator to be
+        initialised are recalculated in full.
+
+        Parameters
+        ----------
+        new_bars : Dict
+            Dictionary of DataFrames of Open, High, Low and Close prices
+            indexed by date, one for each ticker to update. The dates must
+            be after the last date held for the ticker.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.run_stage('barometer')
+
+        # The results no longer match the parameters they were cached under
+        self._cache_key = None
+
+        with self._timer.measure('update'):
+            self.tables, self._indicator_state = IncrementalUpdate.update(
+                params=self.params, tables=self.tables,
+                state=self._indicator_state, new_bars=new_bars)
+
+            # The new rows are calculated at full precision
+            if self.params['compact_tables']:
+                self.tables = CompactTables.compact(
+                    self.tables, self.params)
+
+            # Refresh the tables which depend on the barometer
+            if 'top_trends' in self._completed:
+                self._top_trends, tables = self.top_trend_tickers(
+                    params=self.params, tables=self.tables)
+                self.tables.update(tables)
+
+            if 'chart_data' in self._completed:
+                self._completed.remove('chart_data')
+                self._data_dict = None
+
+
+    def history(
+        self,
+        flags: bool = False,
+        chunk_days: int | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None) -> dict:
+        """
+        Trend Strength of every ticker on every date of the price history,
+        calculated from the indicator fields in one pass. Each date matches
+        the barometer of a run ending on that date with the same start date.
+
+        Parameters
+        ----------
+        flags : Bool, optional
+            Whether to include a date x ticker table of each trend flag.
+            The default is False.
+        chunk_days : Int, optional
+            Number of dates calculated at a time. The default is None which
+            calculates every date at once.
+        start_date : Str, optional
+            First date of the history, in the format 'YYYY-MM-DD'. The
+            default is None which starts from the first price bar.
+        end_date : Str, optional
+            Last date of the history, in the format 'YYYY-MM-DD'. The
+            default is None which ends at the last price bar.
+
+        Returns
+        -------
+        Dict
+            trend_strength : DataFrame
+                Sum of the trend flags, dates x tickers, NaN where a ticker
+                has no bar.
+            flags : Dict
+                Dictionary of date x ticker DataFrames, one for each trend
+                flag, if selected.
+
+        """
+        self.run_stage('fields')
+
+        with self._timer.measure('history'):
+            return BarometerHistory.calculate(
+                params=self.params, tables=self.tables, flags=flags,
+                chunk_days=chunk_days, start_date=start_date,
+                end_date=end_date)
+
+
+    def sector_history(
+        self,
+        sector_level: int | None = None,
+        absolute: bool = False,
+        **kwargs) -> pd.DataFrame:
+        """
+        Average Trend Strength % of each sector on every date of the price
+        history.
+
+        Parameters
+        ----------
+        sector_level : Int, optional
+            Level of sector grouping, 1 being the broadest. The default is
+            None which uses the sector_level parameter.
+        absolute : Bool, optional
+            Whether to average the absolute Trend Strength % rather than
+            netting up and down trends. The default is False.
+        **kwargs : Dict
+            Arguments passed to history, eg start_date.
+
+        Returns
+        -------
+        DataFrame
+            Dates x sectors.
+
+        """
+        history = self.history(**kwargs)
+
+        return BarometerHistory.sectors(
+            params=self.params, history=history,
+            barometer=self.tables['barometer'], sector_level=sector_level,
+            absolute=absolute)
+
+
+    def sector_breakdown(
+        self,
+        indicator: str | None = None,
+        sector_level: int | None = None) -> pd.DataFrame:
+        """
+        Flag counts or mean Trend Strength of each sector, looked up from
+        the sector cube built with the barometer.
+
+        Parameters
+        ----------
+        indicator : Str, optional
+            The indicator and tenor, eg 'ADX_20' or 'MA_10_30'. The default
+            is None which returns the mean Trend Strength of each sector.
+        sector_level : Int, optional
+            Level of sector grouping, 1 being the broadest. The default is
+            None which uses the sector_level parameter.
+
+        Returns
+        -------
+        DataFrame
+            Sectors x 'long', 'neutral' and 'short' counts of the
+            indicator, or sectors x 'markets', 'Trend Strength %' and
+            'Absolute Trend Strength %'.
+
+        """
+        if sector_level is None:
+            sector_level = self.params['sector_level']
+        cube = self.tables['sector_cube']
+
+        if indicator is None:
+            return cube.strength(sector_level)
+
+        return cube.counts(sector_level, indicator)
+
+
+    def subset(self, tickers: list, **kwargs) -> 'TrendStrength':
+        """
+        New TrendStrength for some of the tickers of this one, sharing its
+        price histories and indicator fields rather than loading and
+        calculating them again. Only the barometer, top trends and chart
+        data are calculated for the subset.
+
+        Parameters
+        ----------
+        tickers : List
+            The tickers, as keys of ticker_dict, eg 'c_es_ccb'. Tickers
+            which are not in ticker_dict, eg those removed for a short
+            history, are left out.
+        **kwargs : Dict
+            Parameters supplied to override those of this object, eg lazy
+            or the chart parameters. Parameters which change the prices or
+            indicator fields have no effect, as these are shared. A
+            result_cache is ignored, as the subset's results are not keyed
+            by the parameters it was created with.
+
+        Returns
+        -------
+        TrendStrength
+            The subset, without a result cache.
+
+        """
+        self.run_stage('fields')
+        ticker_dict = self.tables['ticker_dict']
+        for ticker in tickers:
+            if ticker not in ticker_dict:
+                print("Ticker "+str(ticker)+" is not in the universe")
+        tickers = [ticker for ticker in dict.fromkeys(tickers)
+                   if ticker in ticker_dict]
+
+        # Create the object without running any stages, then take the
+        # prices and fields of the selected tickers from this one
+        params = {**self.params, **kwargs, 'result_cache': None}
+        trend = TrendStrength(**dict(params, lazy=True))
+        trend.params = dict(params, tickers=tickers, ticker_limit=None)
+        trend.mappings = dict(self.mappings)
+        trend.tables.update({
+            'raw_ticker_dict': {
+                ticker: self.tables['raw_ticker_dict'][ticker]
+                for ticker in tickers},
+            'ticker_dict': {
+                ticker: ticker_dict[ticker] for ticker in tickers},
+            })
+        trend._completed = ['prices', 'fields'] # pylint: disable=protected-access
+
+        if not trend.params['lazy']:
+            trend.run_stage('chart_data')
+
+        return trend
+
+
+    def save(self, path: str) -> str:
+        """
+        Save the tables, parameters, sector mappings and top trends of the
+        completed stages to a directory of Arrow IPC files, which load
+        memory maps back without recalculating. Requires pyarrow.
+
+        Parameters
+        ----------
+        path : Str
+            Directory of the snapshot, created if needed. An earlier
+            snapshot in the directory is replaced.
+
+        Returns
+        -------
+        Str
+            The snapshot directory.
+
+        """
+        with self._timer.measure('save'):
+            return Snapshot.save(
+                path=path, params=self.params, mappings=self.mappings,
+                tables=self.tables, top_trends=self._top_trends,
+                stages=self._completed)
+
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'TrendStrength':
+        """
+        Open a snapshot written by save. Only the barometers are read; the
+        DataFrame of each ticker is memory mapped when first accessed, so
+        processes opening the same snapshot share its pages. The chart data
+        is regenerated when first needed.
+
+        Parameters
+        ----------
+        path : Str
+            Directory of the snapshot.
+        **kwargs : Dict
+            Parameters supplied to override those saved, eg the chart
+            parameters. Parameters which change the prices or indicator
+            fields have no effect. Lazy evaluation is selected unless lazy
+            is set to False, and no result cache is used unless
+            result_cache is given.
 
-        self.top_trends = top_trends
-        self.tables = tables
-        self.params = params
-        self.mappings = mappings
-        self.data_dict = data_dict
+        Returns
+        -------
+        TrendStrength
+            The saved object.
+
+        """
+        snapshot = Snapshot.load(path)
+        params = {**snapshot['params'], 'lazy': True, 'result_cache': None,
+                  **kwargs}
+
+        # Create the object without running any stages, then take the
+        # tables of the saved stages from the snapshot
+        trend = cls(**dict(params, lazy=True))
+        trend.params = params
+        trend.mappings = dict(trend.mappings, **snapshot['mappings'])
+        trend.tables.update(snapshot['tables'])
+        trend._top_trends = snapshot['top_trends'] # pylint: disable=protected-access
+        trend._completed = list(snapshot['stages']) # pylint: disable=protected-access
+
+        # Rank and count the barometer again rather than storing the results
+        if 'barometer' in snapshot['stages']:
+            barometer = trend.tables['barometer']
+            trend.tables.update({
+                'rank_index': BarometerIndex(barometer),
+                'flag_tallies': FlagTallies(barometer),
+                'sector_cube': SectorCube(
+                    barometer, SectorCube.sector_names(params)),
+                })
+
+        if not trend.params['lazy']:
+            trend.run_stage('chart_data')
+
+        return trend
+
+
+    def sweep(self, grid: dict | list, n_jobs: int = 1) -> list:
+        """
+        Barometers for a grid of indicator tenors and trend thresholds,
+        calculating each indicator once for each tenor used in the grid
+        rather than once for each combination.
+
+        Parameters
+        ----------
+        grid : Dict or List
+            Dictionary of parameter names and lists of values, of which
+            every combination is taken, or a list of dictionaries, one for
+            each combination. The parameters may be ma_cross_list,
+            price_cross_list, adx_list, rsi_list, breakout_list,
+            macd_params, trend_flags, adx_threshold (default 25),
+            rsi_overbought (default 70) and rsi_oversold (default 30).
+        n_jobs : Int, optional
+            Number of processes used to calculate the indicators. -1 uses
+            all available CPUs. The default is 1.
+
+        Returns
+        -------
+        List
+            A dictionary for each combination with the params varied, the
+            trend_flags and the barometer, which is the same as that of a
+            full run with the combination's parameters. See
+            ParameterSweep.run.
+
+        """
+        sweep = ParameterSweep(self)
+
+        with self._timer.measure('sweep'):
+            return sweep.run(grid, n_jobs=n_jobs)
 
 
     @staticmethod
@@ -141,8 +815,9 @@ class TrendStrength():
         params : Dict
             Dictionary of parameters.
         """
-        # Copy the default parameters
-        params = copy.deepcopy(trend_params_dict['df_params'])
+        # Copy the default parameters. Nested defaults such as lists of
+        # tenors and rcParams are read-only and shared rather than copied.
+        params = dict(DEFAULT_PARAMS)
 
         # For all the supplied arguments
         for key, value in inputs.items():
@@ -178,6 +853,8 @@ class TrendStrength():
 
         """
 
+        from trendvisdata.market_data import NorgateExtract, MktUtils # pylint: disable=import-outside-toplevel
+
         # Set the asset type to 'CTA'
         params['asset_type'] = 'CTA'
 
@@ -192,9 +869,14 @@ class TrendStrength():
         # Dictionary to store data tables
         tables = {}
 
-        # Create dictionaries of DataFrames of prices and ticker names
-        params, tables, mappings = NorgateExtract.import_norgate(
-            params=params, tables=tables, mappings=mappings)
+        # Create dictionaries of DataFrames of prices and ticker names,
+        # reading from the local price store if one is selected
+        if params['price_store'] is not None:
+            params, tables, mappings = StoredExtract.import_norgate(
+                params=params, tables=tables, mappings=mappings)
+        else:
+            params, tables, mappings = NorgateExtract.import_norgate(
+                params=params, tables=tables, mappings=mappings)
 
         # Remove tickers with short history
         tables = MktUtils.ticker_clean(params=params, tables=tables)
@@ -227,6 +909,8 @@ class TrendStrength():
 
         """
 
+        from trendvisdata.market_data import YahooExtract, MktUtils # pylint: disable=import-outside-toplevel
+
         # Create list of tickers, dictionary of ticker names from
         # Wikipedia
         params, mappings = YahooExtract.ticker_extract(
@@ -244,8 +928,17 @@ class TrendStrength():
         # Dictionary to store data tables
         tables = {}
 
-        # Create dictionaries of DataFrames of prices and ticker names
-        params, tables = YahooExtract.import_yahoo(params, tables)
+        # Create dictionaries of DataFrames of prices and ticker names,
+        # reading from the local price store if one is selected
+        if params['price_store'] is not None:
+            params, tables = StoredExtract.import_yahoo(params, tables)
+
+        # Download the tickers concurrently if a limit is supplied
+        elif params['max_workers'] is not None:
+            params, tables = ConcurrentFetch.import_yahoo(params, tables)
+
+        else:
+            params, tables = YahooExtract.import_yahoo(params, tables)
 
         # Remove tickers with short history
         tables = MktUtils.ticker_clean(params=params, tables=tables)
@@ -253,8 +946,9 @@ class TrendStrength():
         return params, tables, mappings
 
 
-    @staticmethod
+    @classmethod
     def trend_calc(
+        cls,
         params: dict,
         tables: dict,
         mappings: dict) -> dict:
@@ -277,13 +971,98 @@ class TrendStrength():
 
         """
         # Calculate the technical indicator fields
-        tables['ticker_dict'] = Fields.generate_fields(
-            params, tables['raw_ticker_dict'])
+        tables = cls.field_calc(params=params, tables=tables)
+
+        # Calculate the Trend Strength table
+        tables = cls.barometer_calc(
+            params=params, tables=tables, mappings=mappings)
+
+        return tables
+
+
+    @staticmethod
+    def field_calc(
+        params: dict,
+        tables: dict) -> dict:
+        """
+        Calculate the technical indicator fields
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+        tables : Dict
+            Dictionary of key tables.
+
+        Returns
+        -------
+        tables : Dict
+            Dictionary of key tables.
+
+        """
+        # Calculate the technical indicator fields for all tickers at once on
+        # an aligned panel, with ticker_dict as a view over the panel
+        if params['panel']:
+            tables['panel'] = PanelFields.generate_fields(
+                params=params,
+                panel=PricePanel.from_ticker_dict(tables['raw_ticker_dict']))
+            tables['ticker_dict'] = tables['panel'].ticker_dict()
+
+        # Or in a pool of processes if more than one job is selected
+        elif ParallelFields.resolve_jobs(params['n_jobs']) > 1:
+            tables['ticker_dict'] = ParallelFields.generate_fields(
+                params, tables['raw_ticker_dict'], n_jobs=params['n_jobs'])
+        else:
+            from trendvisdata.trend_data import Fields # pylint: disable=import-outside-toplevel
+            tables['ticker_dict'] = Fields.generate_fields(
+                params, tables['raw_ticker_dict'])
+
+        # Store the fields in smaller dtypes if selected
+        if params['compact_tables']:
+            tables = CompactTables.compact(tables, params)
+
+        return tables
+
+
+    @staticmethod
+    def barometer_calc(
+        params: dict,
+        tables: dict,
+        mappings: dict) -> dict:
+        """
+        Calculate the Trend Strength table
+
+        Parameters
+        ----------
+        params : Dict
+            Dictionary of key parameters.
+        tables : Dict
+            Dictionary of key tables.
+        mappings : Dict
+            Dictionary of sector mappings.
+
+        Returns
+        -------
+        tables : Dict
+            Dictionary of key tables.
+
+        """
+        from trendvisdata.trend_data import Fields # pylint: disable=import-outside-toplevel
 
         # Calculate the Trend Strength table
         tables['barometer'] = Fields.generate_trend_strength(
             params=params, ticker_dict=tables['ticker_dict'],
             sector_mappings_df=mappings['sector_mappings_df'])
+        if params['compact_tables']:
+            tables['barometer'] = CompactTables.barometer(
+                tables['barometer'], params)
+
+        # Rank the table once for the bar charts and count the flags once
+        # for the pie charts, in total and by sector
+        tables['rank_index'] = BarometerIndex(tables['barometer'])
+        tables['flag_tallies'] = FlagTallies(tables['barometer'])
+        tables['sector_cube'] = SectorCube(
+            tables['barometer'], SectorCube.sector_names(params))
 
         return tables
 
@@ -310,6 +1089,8 @@ class TrendStrength():
             Dictionary of key tables.
 
         """
+        from trendvisdata.trend_data import TrendRank # pylint: disable=import-outside-toplevel
+
         # Generate list of top trending securities
         top_trends, tables = TrendRank.top_trend_calc(
             tables, params)
@@ -326,42 +1107,180 @@ class TrendStrength():
         chart_type : Str
             The typr of chart to display.
         **kwargs : Dict
-            Parameters supplied to override the defaults.
+            Parameters supplied to override the defaults for this chart
+            only.
 
         Returns
         -------
         Displays the selected chart.
 
         """
-        # Update params with the specified parameters
-        for key, value in kwargs.items():
+        self._draw_chart(chart_type=chart_type, kwargs=kwargs)
 
-            # Replace the default parameter with that provided
-            self.params[key] = value
 
-        if chart_type == 'bar':
-            Graphs.trend_barchart(
-                params=self.params, barometer=self.tables['barometer'])
+    def chart_figure(self, chart_type: str, **kwargs) -> 'Figure':
+        """
+        Create the selected chart as a standalone figure, which is not
+        managed or shown by pyplot. Neither the parameters nor the tables
+        are changed, so charts can be created from one object in many
+        threads at once, eg to serve them from a web application.
 
-        elif chart_type == 'returns':
-            Graphs.returns_graph(params=self.params, tables=self.tables)
+        Parameters
+        ----------
+        chart_type : Str
+            The type of chart, as for chart().
+        **kwargs : Dict
+            Parameters supplied to override the defaults for this chart
+            only.
 
-        elif chart_type == 'market':
-            self.params = Graphs.market_chart(
-                params=self.params, tables=self.tables)
+        Returns
+        -------
+        Figure
+            The chart, which can be saved with savefig() in any thread. It
+            is released once no longer referenced, without needing to be
+            closed.
 
-        elif chart_type == 'summary':
-            self.params, self.tables = Graphs.summary_plot(
-                params=self.params, tables=self.tables)
+        """
+        params = self._draw_chart(
+            chart_type=chart_type, kwargs=dict(kwargs, pyplot=False))
+        if 'figure' not in params:
+            raise ValueError("No figure was created for "+str(chart_type))
 
-        elif chart_type == 'pie_summary':
-            self.params = PieCharts.pie_summary(
-                params=self.params, barometer=self.tables['barometer'])
+        return params['figure']
 
-        elif chart_type == 'pie_breakdown':
-            self.params, self.tables = PieCharts.pie_breakdown(
-                params=self.params, tables=self.tables)
 
-        else:
-            print("Please select a valid graph from 'bar', 'returns', \
-                  'market', 'pie_summary', 'pie_breakdown' and 'summary'")
+    def chart_dict(self, chart_type: str, **kwargs) -> dict:
+        """
+        The data behind the selected chart as plain lists and dictionaries,
+        for a frontend to draw. Matplotlib is not imported, and neither the
+        parameters nor the tables are changed.
+
+        Parameters
+        ----------
+        chart_type : Str
+            The type of chart, as for chart().
+        **kwargs : Dict
+            Parameters supplied to override the defaults for this chart
+            only.
+
+        Returns
+        -------
+        Dict
+            The chart dictionary described in ChartData, which
+            ChartData.to_json and ChartData.to_arrow serialize.
+
+        """
+        # Every chart requires the Trend Strength table. The stages are
+        # measured on their own, before the chart.
+        self.run_stage('barometer')
+
+        with self._timer.measure(chart_type+'_data', kind='chart'):
+            return ChartData.chart_dict(
+                chart_type=chart_type, params=dict(self.params, **kwargs),
+                tables=self.tables)
+
+
+    def _draw_chart(self, chart_type: str, kwargs: dict) -> dict:
+
+        from trendvisualizer.chart_display import Graphs # pylint: disable=import-outside-toplevel
+        from trendvisualizer.pie_charts import PieCharts # pylint: disable=import-outside-toplevel
+
+        # Every chart requires the Trend Strength table. The stages are
+        # measured on their own, before the chart.
+        self.run_stage('barometer')
+
+        with self._timer.measure(chart_type, kind='chart'):
+
+            # Apply the specified parameters to this chart only, once the
+            # earlier stages have set the dates. The chart functions add
+            # their own keys to the copy, so self.params is left unchanged
+            # and repeated or concurrent calls start from the same
+            # parameters.
+            params = dict(self.params, **kwargs)
+
+            if chart_type == 'bar':
+                Graphs.trend_barchart(
+                    params=params, barometer=self.tables['barometer'],
+                    rank_index=self.tables['rank_index'])
+
+            elif chart_type == 'returns':
+                Graphs.returns_graph(params=params, tables=self.tables)
+
+            elif chart_type == 'market':
+                params = Graphs.market_chart(
+                    params=params, tables=self.tables,
+                    templates=(self.templates
+                               if params['chart_template'] else None))
+
+            elif chart_type == 'summary':
+                params, _ = Graphs.summary_plot(
+                    params=params, tables=self.tables)
+
+            elif chart_type == 'pie_summary':
+                params = PieCharts.pie_summary(
+                    params=params, barometer=self.tables['barometer'],
+                    tallies=self.tables['flag_tallies'])
+
+            elif chart_type == 'pie_breakdown':
+                params, _ = PieCharts.pie_breakdown(
+                    params=params, tables=self.tables)
+
+            else:
+                print("Please select a valid graph from 'bar', 'returns', \
+                      'market', 'pie_summary', 'pie_breakdown' and 'summary'")
+
+        return params
+
+
+    def render(
+        self,
+        specs: list,
+        image_format: str = 'png',
+        dpi: int | None = None,
+        n_jobs: int = 1,
+        threads: bool = False) -> list:
+        """
+        Render a batch of charts as standalone figures, as created by
+        chart_figure(), to image bytes or files.
+
+        Parameters
+        ----------
+        specs : List
+            List of dictionaries, each with the keys:
+                chart_type : Str
+                    The type of chart, as for chart().
+                kwargs : Dict, optional
+                    Parameters supplied to override the defaults for this
+                    chart only.
+                path : Str, optional
+                    File to save the image to. If not supplied the image
+                    is returned as bytes.
+                image_format : Str, optional
+                    'png' or 'svg', overriding image_format.
+        image_format : Str, optional
+            'png' or 'svg'. The default is 'png'.
+        dpi : Int, optional
+            Resolution of PNG images. The default is None which uses the
+            matplotlib default.
+        n_jobs : Int, optional
+            Number of processes or threads to render in. -1 uses all
+            available CPUs. The default is 1.
+        threads : Bool, optional
+            Whether to render in a pool of threads sharing this object
+            rather than in processes. The default is False.
+
+        Returns
+        -------
+        List
+            List of dictionaries in the order of the specs, each with the
+            chart_type, image_format, data (image bytes, or None if saved
+            to path), path and error (None if the chart rendered).
+
+        """
+        from trendvisualizer.render import ChartRenderer # pylint: disable=import-outside-toplevel
+
+        renderer = ChartRenderer(
+            trend=self, image_format=image_format, dpi=dpi, n_jobs=n_jobs,
+            threads=threads)
+
+        return renderer.render(specs)
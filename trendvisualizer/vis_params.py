@@ -0,0 +1,24 @@
+"""
+Default parameters used by trendvisualizer in addition to those supplied
+by trendvisdata
+
+"""
+
+# Dictionary containing the additional default parameters
+vis_params_dict = {
+    'lazy':False,
+    'price_store':None,
+    'price_store_format':'parquet',
+    'max_workers':None,
+    'max_retries':3,
+    'retry_backoff':0.5,
+    'n_jobs':1,
+    'panel':False,
+    'timing_hook':None,
+    'trace_memory':False,
+    'chart_template':False,
+    'pyplot':True,
+    'result_cache':None,
+    'result_cache_max_mb':2048,
+    'compact_tables':False,
+    }